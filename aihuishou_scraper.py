@@ -4,38 +4,56 @@ Nhap link san pham de lay thong tin chi tiet va gia dinh gia.
 
 Usage:
     python aihuishou_scraper.py [URL]
+    python aihuishou_scraper.py --batch=FILE [--concurrency=N] [--xlsx|--csv|--json]
     
 Example:
     python aihuishou_scraper.py "https://m.aihuishou.com/n/#/inquiry?productId=43510"
+    python aihuishou_scraper.py --batch=test_products.csv --concurrency=16 --csv
+    cat ids.txt | python aihuishou_scraper.py --batch=- --json
 """
 
 import re
 import sys
+import csv
 import json
 import io
-import requests
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
 from urllib.parse import urlparse, parse_qs
-from typing import Optional, Dict, Any
-from config import BASE_URL, DEFAULT_CITY_ID, HEADERS
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
+from config import API_CLIENT, API_PATHS, DEFAULT_CITY_ID, CITY_NAMES, get_cookies, get_headers
+from api_client import ApiError, SyncApiClient
+from pagination import paginate, split_page
+from scraper_browser import parse_product_data
 
 # Fix Windows console encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 class AihuishouScraper:
     """Scraper de lay thong tin san pham tu m.aihuishou.com"""
     
-    def __init__(self, city_id: int = DEFAULT_CITY_ID, city_name: str = "上海市"):
+    def __init__(self, city_id: int = DEFAULT_CITY_ID, city_name: Optional[str] = None, broker=None,
+                 max_concurrent: int = API_CLIENT["max_concurrent"]):
+        """
+        broker: optional SessionBroker - use a browser-harvested session for the HTTP calls
+        max_concurrent: size of the client's connection pool (requests in flight)
+        """
         self.city_id = city_id
-        self.city_name = city_name
-        self.session = requests.Session()
-        self.session.headers.update(HEADERS)
-        self.session.headers["x-city-id"] = str(city_id)
-        
-        # Import and set cookies
-        from config import get_cookies
-        self.session.cookies.update(get_cookies(city_id, city_name))
+        self.city_name = city_name or CITY_NAMES.get(city_id, "上海市")
+        self.client = SyncApiClient(
+            city_id=city_id,
+            headers=get_headers(city_id),
+            cookies=get_cookies(city_id, self.city_name),
+            broker=broker,
+            max_concurrent=max_concurrent,
+        )
+    
+    def close(self):
+        self.client.close()
     
     def extract_product_id(self, url: str) -> Optional[int]:
         """Trích xuất productId từ URL"""
@@ -58,102 +76,69 @@ class AihuishouScraper:
     
     def get_product_detail(self, product_id: int) -> Dict[str, Any]:
         """Lấy thông tin chi tiết sản phẩm và câu hỏi định giá"""
-        url = f"{BASE_URL}/recycle-products/quick-inquiry/{product_id}"
+        return self.client.run(self.fetch_product_detail(product_id))
+    
+    async def fetch_product_detail(self, product_id: int) -> Dict[str, Any]:
+        """Async get_product_detail - runs on the client's event loop"""
         params = {
             "cityId": self.city_id,
             "queryType": 1
         }
         
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == 0:
-                return self._parse_product_data(data.get("data", {}))
-            else:
-                return {"error": data.get("resultMessage", "Unknown error")}
-        except requests.RequestException as e:
-            return {"error": f"Request failed: {str(e)}"}
-    
-    def _parse_product_data(self, data: Dict) -> Dict[str, Any]:
-        """Parse và format dữ liệu sản phẩm"""
-        product = data.get("product", {})
-        ppvs = data.get("ppvs", [])  # Property-value pairs (câu hỏi định giá)
-        
-        result = {
-            "id": product.get("id"),
-            "name": product.get("name"),
-            "brand": product.get("brandName"),
-            "category": product.get("categoryName"),
-            "imageUrl": product.get("imageUrl"),
-            "maxPrice": product.get("maxPrice"),
-            "minPrice": product.get("minPrice"),
-            "questions": []
-        }
-        
-        # Parse câu hỏi định giá
-        for ppv in ppvs:
-            question = {
-                "name": ppv.get("propertyName"),
-                "options": []
-            }
-            for value in ppv.get("propertyValues", []):
-                question["options"].append({
-                    "id": value.get("id"),
-                    "name": value.get("valueName"),
-                    "imageUrl": value.get("imageUrl")
-                })
-            result["questions"].append(question)
-        
-        return result
+            data = await self.client.client.call("GET", API_PATHS["quick_inquiry"].format(product_id=product_id),
+                                                 params=params)
+            return parse_product_data(data or {})  # flat quick-inquiry payload, same parser as enrich.py
+        except ApiError as e:
+            return {"error": str(e) if e.code is not None else f"Request failed: {e}"}
     
     def get_brands(self, category_id: int = 6) -> list:
         """Lấy danh sách brands theo category"""
-        url = f"{BASE_URL}/front-category/brands-v2"
         payload = {
             "frontCategoryId": category_id,
             "cityId": self.city_id
         }
         
         try:
-            response = self.session.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == 0:
-                brands = data.get("data", {}).get("brands", [])
-                return [{"id": b.get("id"), "name": b.get("name")} for b in brands]
-            return []
-        except requests.RequestException:
+            data = self.client.call("POST", API_PATHS["brands"], json=payload) or {}
+            brands = data.get("brands", []) if isinstance(data, dict) else data
+            return [{"id": b.get("id"), "name": b.get("name")} for b in brands if isinstance(b, dict)]
+        except ApiError:
             return []
     
     def search_products(self, brand_id: int, page: int = 0, page_size: int = 20) -> list:
-        """Tìm sản phẩm theo brand"""
-        url = f"{BASE_URL}/recycle-products/search-by-category"
+        """Tìm sản phẩm theo brand (một trang - xem iter_search_products cho tất cả các trang)"""
+        try:
+            products, _ = self.client.run(self._fetch_search_page(brand_id, page, page_size))
+            return products
+        except ApiError:
+            return []
+    
+    def iter_search_products(self, brand_id: int, page_size: int = 20, concurrency: int = 4,
+                             max_pages: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Tất cả sản phẩm của brand - pages fetched concurrently, products yielded lazily in page order"""
+        async def fetch(page):
+            return await self._fetch_search_page(brand_id, page, page_size)
+        
+        pages = paginate(fetch, page_size, concurrency=concurrency, max_pages=max_pages)
+        for products in self.client.iterate(pages):
+            yield from products
+    
+    async def _fetch_search_page(self, brand_id: int, page: int, page_size: int) -> Tuple[list, Optional[int]]:
         payload = {
             "brandId": brand_id,
             "cityId": self.city_id,
             "pageIndex": page,
             "pageSize": page_size
         }
-        
-        try:
-            response = self.session.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == 0:
-                products = data.get("data", {}).get("products", [])
-                return [{
-                    "id": p.get("id"),
-                    "name": p.get("name"),
-                    "maxPrice": p.get("maxPrice"),
-                    "imageUrl": p.get("imageUrl")
-                } for p in products]
-            return []
-        except requests.RequestException:
-            return []
+        data = await self.client.client.call("POST", API_PATHS["search"], json=payload)
+        products, total = split_page(data)
+        return [{
+            "id": p.get("id"),
+            "name": p.get("name"),
+            "maxPrice": p.get("maxPrice"),
+            "imageUrl": p.get("imageUrl")
+        } for p in products], total
     
     def lookup(self, url_or_id: str) -> Dict[str, Any]:
         """
@@ -171,12 +156,74 @@ class AihuishouScraper:
             return {"error": "Không thể trích xuất product ID từ URL"}
         
         return self.get_product_detail(product_id)
+    
+    async def _lookup_async(self, url_or_id: str) -> Dict[str, Any]:
+        product_id = self.extract_product_id(str(url_or_id).strip())
+        if product_id is None:
+            return {"error": "Không thể trích xuất product ID từ URL"}
+        return await self.fetch_product_detail(product_id)
+    
+    def lookup_many(self, ids_or_urls: Iterable[str], concurrency: int = 8) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Tra cứu nhiều sản phẩm song song
+        
+        Yields (input, result) as each lookup completes (not in input order).
+        A failed item yields a result with "error" and never stops the batch.
+        At most `concurrency` lookups are in flight; the shared rate limit
+        (config.RATE_LIMITS) still applies on top.
+        """
+        items = iter(ids_or_urls)
+        pending = {}
+        exhausted = False
+        
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                item = next(items, _END)
+                if item is _END:
+                    exhausted = True
+                    break
+                pending[self.client.submit(self._lookup_async(item))] = item
+            
+            if not pending:
+                return
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": f"Lookup failed: {e}"}
+                yield item, result
+
+
+_END = object()
+
+
+def read_product_ids(source) -> List[str]:
+    """
+    Product IDs / URLs from a file object: a CSV with a 产品ID (or productId / id)
+    column, e.g. test_products.csv, or one ID / URL per line.
+    """
+    lines = [line.strip().lstrip("\ufeff") for line in source if line.strip()]
+    if not lines:
+        return []
+    
+    header = next(csv.reader([lines[0]]))
+    for column in ("产品ID", "productId", "id", "ID"):
+        if column in header:
+            index = header.index(column)
+            rows = csv.reader(lines[1:])
+            return [row[index].strip() for row in rows if len(row) > index and row[index].strip()]
+    
+    return [line.split(",")[0].strip() for line in lines]
 
 
 def print_product_info(data: Dict):
     """In thong tin san pham ra console"""
-    if "error" in data:
-        print(f"[ERROR] Loi: {data['error']}")
+    error = lookup_error(data)
+    if error:
+        print(f"[ERROR] Loi: {error}")
         return
     
     print("\n" + "="*60)
@@ -185,7 +232,7 @@ def print_product_info(data: Dict):
     print(f"   ID:       {data.get('id')}")
     print(f"   Brand:    {data.get('brand')}")
     print(f"   Category: {data.get('category')}")
-    print(f"   [PRICE]   {data.get('minPrice', 0)} - {data.get('maxPrice', 0)} CNY")
+    print(f"   [PRICE]   {data.get('couponPrice', 'N/A')} CNY")
     print(f"   [IMAGE]   {data.get('imageUrl')}")
     
     if data.get("questions"):
@@ -200,6 +247,15 @@ def print_product_info(data: Dict):
     print("\n" + "="*60)
 
 
+def lookup_error(result: Dict) -> Optional[str]:
+    """Why a lookup result is unusable (an error, or a payload without a product id), else None"""
+    if "error" in result:
+        return result["error"]
+    if result.get("id") is None:
+        return "No product in response"
+    return None
+
+
 def export_to_excel(data_list: list, filename: str = None):
     """Export data list to Excel"""
     import pandas as pd
@@ -220,6 +276,8 @@ def export_to_excel(data_list: list, filename: str = None):
             "Name": item.get("name"),
             "Brand": item.get("brand") or item.get("brandName"),
             "Category": item.get("category") or item.get("categoryName"),
+            "Coupon Price": item.get("couponPrice"),
+            "Template": item.get("templateType"),
             "Max Price": item.get("maxPrice"),
             "Min Price": item.get("minPrice"),
             "Image URL": item.get("imageUrl"),
@@ -251,6 +309,8 @@ def export_to_csv(data_list: list, filename: str = None):
             "Name": item.get("name"),
             "Brand": item.get("brand") or item.get("brandName"),
             "Category": item.get("category") or item.get("categoryName"),
+            "Coupon Price": item.get("couponPrice"),
+            "Template": item.get("templateType"),
             "Max Price": item.get("maxPrice"),
             "Min Price": item.get("minPrice"),
             "Image URL": item.get("imageUrl"),
@@ -280,8 +340,6 @@ def export_to_json(data: Any, filename: str = None):
 def main():
     import sys
     
-    scraper = AihuishouScraper()
-    
     # Check for --export flag
     export_format = None
     if "--xlsx" in sys.argv or "--excel" in sys.argv:
@@ -294,7 +352,53 @@ def main():
         export_format = "json"
         sys.argv = [a for a in sys.argv if a != "--json"]
     
-    if len(sys.argv) > 1:
+    batch = None
+    concurrency = 8
+    for arg in list(sys.argv[1:]):
+        if arg.startswith("--batch="):
+            batch = arg.split("=", 1)[1]
+            sys.argv.remove(arg)
+        elif arg.startswith("--concurrency="):
+            concurrency = int(arg.split("=", 1)[1])
+            sys.argv.remove(arg)
+    
+    scraper = AihuishouScraper(max_concurrent=max(concurrency, 1))
+    
+    if batch:
+        # Tra cuu hang loat tu file / stdin
+        if batch == "-":
+            ids = read_product_ids(sys.stdin)
+        else:
+            with open(batch, "r", encoding="utf-8-sig") as f:
+                ids = read_product_ids(f)
+        
+        print(f"[BATCH] {len(ids)} products, concurrency {concurrency}")
+        
+        results, failures = [], []
+        start = time.time()
+        for i, (item, result) in enumerate(scraper.lookup_many(ids, concurrency=concurrency), 1):
+            error = lookup_error(result)
+            if error:
+                failures.append({"input": item, "error": error})
+                print(f"[{i}/{len(ids)}] [FAIL] {item}: {error}")
+            else:
+                results.append(result)
+                print(f"[{i}/{len(ids)}] [OK] {result.get('id')} | {result.get('name')} | "
+                      f"{result.get('couponPrice')} CNY")
+        
+        elapsed = time.time() - start
+        print(f"\n[DONE] {len(results)} ok, {len(failures)} failed in {elapsed:.1f}s "
+              f"({len(ids) / elapsed if elapsed else 0:.1f} items/s)")
+        
+        if export_format == "xlsx":
+            export_to_excel(results)
+        elif export_format == "csv":
+            export_to_csv(results)
+        elif export_format == "json":
+            export_to_json(results)
+        if failures:
+            export_to_json(failures, f"aihuishou_failures_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    elif len(sys.argv) > 1:
         # Lay URL tu command line
         url = sys.argv[1]
         print(f"[SEARCH] Dang tra cuu: {url}")
@@ -302,7 +406,7 @@ def main():
         print_product_info(result)
         
         # Export if requested
-        if export_format and "error" not in result:
+        if export_format and not lookup_error(result):
             if export_format == "xlsx":
                 export_to_excel([result])
             elif export_format == "csv":
@@ -346,13 +450,15 @@ def main():
                 result = scraper.lookup(url)
                 print_product_info(result)
                 
-                if "error" not in result:
+                if not lookup_error(result):
                     results.append(result)
                     print(f"[INFO] Da luu {len(results)} san pham. Nhap 'export' de xuat file.")
                 
             except KeyboardInterrupt:
                 print("\n[BYE] Tam biet!")
                 break
+    
+    scraper.close()
 
 
 if __name__ == "__main__":
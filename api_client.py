@@ -0,0 +1,283 @@
+"""
+AIHUISHOU API CLIENT
+One async HTTP client for every direct API call (gateway + trade-front).
+
+- Pooled keep-alive connections (aiohttp), shared rate limiter
+- Per-call timeouts, retries with exponential backoff + jitter
+- Concurrency limit (semaphore)
+- Optional SessionBroker: browser-harvested cookies/headers, refreshed on challenge
+- On-disk response cache (response_cache.py) with TTLs, revalidation and offline mode
+- Hedged requests past the endpoint's p95 + per-endpoint circuit breaker (resilience.py)
+- SyncApiClient: blocking facade for sync callers (runs on a background loop thread)
+
+Usage:
+    async with ApiClient(city_id=1) as client:
+        data = await client.call("POST", API_PATHS["brands"], json={"frontCategoryId": 6})
+
+    client = SyncApiClient(city_id=1)
+    body = client.get(url, params={...})
+    future = client.submit(client.client.get(url))   # concurrent.futures.Future
+    for page in client.iterate(async_generator): ...  # lazy, one page per next()
+"""
+
+import json
+import random
+import asyncio
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import aiohttp
+
+from config import BASE_URL, DEFAULT_CITY_ID, API_CLIENT, get_cookies, get_headers
+from rate_limiter import get_limiter
+from session_broker import is_challenge
+from response_cache import ResponseCache, get_response_cache
+from resilience import CircuitOpen, endpoint_of, get_resilience
+from loop_thread import get_loop_thread
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class ApiError(Exception):
+    """A call failed after retries (HTTP error, bad JSON, or gateway code != 0)"""
+
+    def __init__(self, message: str, status: Optional[int] = None, code: Any = None, url: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.url = url
+
+
+class ApiClient:
+    """Async client - create one per city and reuse it for many calls"""
+
+    def __init__(self, city_id: int = DEFAULT_CITY_ID, headers: Optional[Dict] = None,
+                 cookies: Optional[Dict] = None, broker=None,
+                 max_concurrent: int = API_CLIENT["max_concurrent"],
+                 timeout: float = API_CLIENT["timeout"],
+                 retries: int = API_CLIENT["retries"],
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True):
+        self.city_id = city_id
+        self.headers = headers if headers is not None else get_headers(city_id)
+        self.cookies = cookies if cookies is not None else get_cookies(city_id)
+        self.broker = broker
+        self.broker_session = None
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.retries = retries
+        self.limiter = get_limiter()
+        self.cache = (cache or get_response_cache()) if use_cache else None
+        self.resilience = get_resilience()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "session_refreshes": 0, "shed": 0}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrent, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.headers, cookies=self.cookies)
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self.broker is not None and self.broker_session is None:
+            await self._apply_broker_session()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _apply_broker_session(self):
+        self.broker_session = await self.broker.get(self.city_id)
+        self.session.headers.update(self.broker_session.headers)
+        self.session.cookie_jar.update_cookies(self.broker_session.cookies)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, API_CLIENT["backoff"] * (2 ** attempt))
+
+    async def _send(self, method: str, url: str, params, json_body, headers: Dict, timeout):
+        """One HTTP exchange -> (status, text, (etag, last_modified)); the caller takes the rate-limit token"""
+        self.stats["requests"] += 1
+        async with self._semaphore:
+            async with self.session.request(method, url, params=params, json=json_body,
+                                            headers=headers, timeout=timeout) as resp:
+                text = await resp.text()
+                return resp.status, text, (resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+
+    async def request(self, method: str, url: str, params: Optional[Dict] = None, json_body: Any = None,
+                      timeout: Optional[float] = None, retries: Optional[int] = None) -> Any:
+        """Raw call -> parsed JSON body. Raises ApiError once retries are used up."""
+        cache, key, entry = self.cache, None, None
+        if cache is not None:
+            if cache.ttl_for(url):
+                key = cache.make_key(method, url, params, json_body, self.city_id)
+                entry = cache.get(key)
+                if entry and (entry["fresh"] or cache.offline):
+                    cache.stats["hits"] += 1
+                    return json.loads(entry["body"])
+            if cache.offline:
+                cache.stats["offline_misses"] += 1
+                raise ApiError(f"Offline mode: {url} is not cached", url=url)
+            if key:
+                cache.stats["misses"] += 1
+
+        # Stale entry - let the server answer 304 if it has not changed
+        conditional = {}
+        if entry and entry["etag"]:
+            conditional["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            conditional["If-Modified-Since"] = entry["last_modified"]
+
+        await self.open()
+        retries = self.retries if retries is None else retries
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        endpoint = endpoint_of(method, url)
+        refreshed = False
+        attempt = 0
+
+        while True:
+            await self.limiter.acquire_async(url)
+            error = None
+
+            def send():
+                return self._send(method, url, params, json_body, conditional, client_timeout)
+
+            async def hedge():
+                # The duplicate takes its own token - hedging never exceeds the rate limit
+                await self.limiter.acquire_async(url)
+                return await send()
+
+            try:
+                status, text, validators = await self.resilience.run(
+                    endpoint, send, failed=lambda response: response[0] in RETRY_STATUS, hedge_factory=hedge)
+            except CircuitOpen as e:
+                # Endpoint is failing - shed the call instead of piling on
+                self.stats["shed"] += 1
+                self.stats["errors"] += 1
+                raise ApiError(str(e), url=url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, text, error = None, "", f"{type(e).__name__}: {e}"
+
+            if status is not None:
+                if self.broker is not None and not refreshed and is_challenge(status, text):
+                    # Session went stale - refresh it through the broker and try again
+                    refreshed = True
+                    self.broker.invalidate(self.city_id, self.broker_session)
+                    self.stats["session_refreshes"] += 1
+                    await self._apply_broker_session()
+                    continue
+                if status == 304 and entry:
+                    cache.refresh(key, url)
+                    return json.loads(entry["body"])
+                if status == 200:
+                    try:
+                        body = json.loads(text)
+                    except ValueError:
+                        self.stats["errors"] += 1
+                        raise ApiError(f"Non-JSON response from {url}", status=status, url=url)
+                    if key and not (isinstance(body, dict) and body.get("code", 0) != 0):
+                        cache.put(key, method, url, text, etag=validators[0], last_modified=validators[1])
+                    return body
+                error = f"HTTP {status}"
+                if status not in RETRY_STATUS:
+                    self.stats["errors"] += 1
+                    raise ApiError(f"{error} from {url}", status=status, url=url)
+
+            if attempt >= retries:
+                self.stats["errors"] += 1
+                raise ApiError(f"{error} from {url} (after {attempt + 1} attempts)", status=status, url=url)
+            self.stats["retries"] += 1
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def get(self, url: str, params: Optional[Dict] = None, **kwargs) -> Any:
+        return await self.request("GET", url, params=params, **kwargs)
+
+    async def post(self, url: str, json: Any = None, **kwargs) -> Any:
+        return await self.request("POST", url, json_body=json, **kwargs)
+
+    async def call(self, method: str, path: str, params: Optional[Dict] = None, json: Any = None,
+                   base_url: Optional[str] = None, **kwargs) -> Any:
+        """Gateway-style call: checks `code == 0` and returns the `data` field"""
+        url = path if path.startswith("http") else f"{base_url or BASE_URL}{path}"
+        body = await self.request(method, url, params=params, json_body=json, **kwargs)
+        if not isinstance(body, dict) or body.get("code") != 0:
+            code = body.get("code") if isinstance(body, dict) else None
+            message = (body.get("resultMessage") or body.get("msg")) if isinstance(body, dict) else str(body)[:100]
+            raise ApiError(message or f"Unknown error (code={code})", status=200, code=code, url=url)
+        return body.get("data")
+
+
+# ============ SYNC FACADE ============
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Process-wide background event loop (loop_thread.py) shared by all SyncApiClients"""
+    return get_loop_thread().loop
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class SyncApiClient:
+    """Blocking facade over ApiClient for requests-style callers"""
+
+    def __init__(self, **client_kwargs):
+        self.loop = get_loop()
+        self.client = ApiClient(**client_kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def stats(self) -> Dict:
+        return self.client.stats
+
+    def submit(self, coro) -> Future:
+        """Schedule a coroutine on the client's loop, return a concurrent.futures.Future"""
+        if _running_loop() is self.loop:
+            # Waiting on the future would block the very loop that has to finish it
+            coro.close()
+            raise RuntimeError("SyncApiClient used from its own event loop - await ApiClient instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """Consume an async iterator (e.g. pagination.paginate) lazily from sync code"""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(agen.aclose())
+
+    def request(self, method: str, url: str, **kwargs) -> Any:
+        return self.run(self.client.request(method, url, **kwargs))
+
+    def get(self, url: str, params: Optional[Dict] = None, **kwargs) -> Any:
+        return self.run(self.client.get(url, params=params, **kwargs))
+
+    def post(self, url: str, json: Any = None, **kwargs) -> Any:
+        return self.run(self.client.post(url, json=json, **kwargs))
+
+    def call(self, method: str, path: str, **kwargs) -> Any:
+        return self.run(self.client.call(method, path, **kwargs))
+
+    def close(self):
+        if self.client.session is not None and self.loop.is_running():
+            self.run(self.client.close())
@@ -15,8 +15,19 @@ import json
 import csv
 import time
 import logging
+import threading
 from datetime import datetime
 from functools import wraps
+from concurrent.futures import TimeoutError as FutureTimeout
+from config import EXPORT_INDEX, LOOP_THREAD, is_upstream_url
+from browser_pool import get_browser_pool
+from loop_thread import SingleFlight, get_loop_thread
+from jobs import get_job_manager
+from result_cache import get_result_cache, normalize_url
+from export_index import get_export_index
+from export_catalog import get_export_catalog
+from json_stream import stream_json
+from export_stream import FORMATS, iter_table, open_rows, resolve_columns
 
 # Set UTF-8 encoding for Windows console (safe version)
 import os
@@ -56,6 +67,12 @@ logger.addHandler(console_handler)
 
 app = Flask(__name__)
 
+# One event loop thread for the whole process: requests, jobs, browser pool and HTTP clients share it
+get_loop_thread()
+
+# Catalog exports written before the catalog existed (or by other tools) without delaying startup
+threading.Thread(target=lambda: get_export_catalog().sync(), name="catalog-backfill", daemon=True).start()
+
 
 # ============ REQUEST LOGGING MIDDLEWARE ============
 @app.before_request
@@ -84,15 +101,23 @@ def after_request(response):
     
     # Log response size for API calls
     if request.path.startswith('/api/'):
-        size = len(response.data) if response.data else 0
-        logger.debug(f"[{g.request_id}] Response size: {size/1024:.1f}KB")
+        stats = getattr(response, "stream_stats", None)
+        if stats is not None:
+            # Streamed: sizes are only known once the last chunk has been sent
+            request_id = g.request_id
+            response.call_on_close(lambda: logger.info(
+                f"[{request_id}] Streamed {stats.format}: {stats.raw/1024:.1f}KB -> "
+                f"{stats.sent/1024:.1f}KB ({stats.encoding or 'identity'}, {stats.chunks} chunks)"))
+        elif not response.is_streamed:
+            size = len(response.data) if response.data else 0
+            logger.debug(f"[{g.request_id}] Response size: {size/1024:.1f}KB")
     
     return response
 
 
 # ============ AUTO EXPORT FUNCTION ============
-def auto_export(data, prefix="auto"):
-    """Auto-save scraped data to files"""
+def auto_export(data, prefix="auto", url=None, duration=None):
+    """Auto-save scraped data to files (and record it in the export catalog)"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     export_dir = "exports"
     os.makedirs(export_dir, exist_ok=True)
@@ -113,6 +138,11 @@ def auto_export(data, prefix="auto"):
     with open(json_file, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
     
+    try:
+        get_export_catalog().record(json_file, data, url=url, duration=duration)
+    except Exception as e:
+        logger.warning(f"Export catalog not updated for {json_file}: {e}")
+    
     logger.info(f"📁 Auto-exported: {json_file} ({item_count} items)")
     return json_file
 
@@ -313,12 +343,14 @@ HTML_TEMPLATE = """
             </div>
             <p style="color: var(--muted); font-size: 12px; margin-top: 10px;">
                 <b>Scrape</b>: Single page | <b>Deep Scrape</b>: Category → Brands → Series → Products (3 levels)
+                | <label><input type="checkbox" id="freshInput"> Bypass cache</label>
             </p>
         </div>
         
         <div class="loading" id="loading">
             <div class="spinner"></div>
             <p id="loadingText">Scraping data... This may take 15-30 seconds</p>
+            <button class="btn" id="cancelJobBtn" onclick="cancelJob()" style="display: none; margin-top: 10px;">Cancel</button>
         </div>
         
         <div class="results-card" id="results">
@@ -328,6 +360,7 @@ HTML_TEMPLATE = """
                     <span class="count-badge" id="count">0 items</span>
                     <div class="export-btns">
                         <button class="btn-export" onclick="exportData('custom')">📋 Export Custom</button>
+                        <button class="btn-export" onclick="exportData('xlsx')">📊 XLSX</button>
                         <button class="btn-export" onclick="exportData('json')">📄 JSON</button>
                     </div>
                 </div>
@@ -372,6 +405,7 @@ HTML_TEMPLATE = """
     
     <script>
         let currentData = [];
+        let currentSource = null;  // {export: file} or {jobId} - where /api/export reads the rows
         let allFields = [];  // All available fields from data
         let selectedColumns = [];  // User selected columns with custom headers
         let draggedItem = null;
@@ -399,7 +433,7 @@ HTML_TEMPLATE = """
                 const res = await fetch('/api/scrape', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({url})
+                    body: JSON.stringify({url, fresh: document.getElementById('freshInput').checked})
                 });
                 const data = await res.json();
                 
@@ -407,6 +441,7 @@ HTML_TEMPLATE = """
                     showStatus('Error: ' + data.error);
                 } else {
                     displayResults(data);
+                    if (data.cache?.hit) showCacheStatus(data.cache);
                 }
             } catch (e) {
                 showStatus('Error: ' + e.message);
@@ -416,40 +451,111 @@ HTML_TEMPLATE = """
             document.getElementById('loading').classList.remove('show');
         }
         
-        // Deep Scrape: Category → Brands → Series → Products
+        // Deep Scrape: Category → Brands → Series → Products (background job, polled)
+        const JOB_FINISHED = ['done', 'failed', 'cancelled', 'interrupted'];
+        let currentJob = null;
+        
         async function deepScrape() {
             const url = document.getElementById('urlInput').value.trim();
             if (!url) { showStatus('Please enter a category URL'); return; }
             
-            document.getElementById('scrapeBtn').disabled = true;
-            document.getElementById('deepScrapeBtn').disabled = true;
-            document.getElementById('loadingText').textContent = 'Deep scraping... This may take 2-5 minutes (Category → Brands → Series → Products)';
-            document.getElementById('loading').classList.add('show');
-            document.getElementById('results').classList.remove('show');
-            
+            startDeepScrape();
             try {
                 const res = await fetch('/api/deep-scrape', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({url})
+                    body: JSON.stringify({url, fresh: document.getElementById('freshInput').checked})
                 });
-                const data = await res.json();
+                const job = await res.json();
                 
-                if (data.error) {
-                    showStatus('Error: ' + data.error);
+                if (job.error) {
+                    showStatus('Error: ' + job.error);
+                    finishDeepScrape();
+                } else if (job.cache?.hit) {
+                    displayResults(job);
+                    showCacheStatus(job.cache);
+                    finishDeepScrape();
                 } else {
-                    displayResults(data);
+                    currentJob = job.jobId;
+                    localStorage.setItem('deepScrapeJob', currentJob);
+                    if (job.attached) showStatus('Same scrape already running - joined it');
+                    pollJob(currentJob);
                 }
             } catch (e) {
                 showStatus('Error: ' + e.message);
+                finishDeepScrape();
             }
-            
+        }
+        
+        async function pollJob(jobId) {
+            if (jobId !== currentJob) return;  // finished, detached or replaced
+            try {
+                const res = await fetch('/api/jobs/' + jobId);
+                if (res.status === 404) { finishDeepScrape(); return; }
+                const job = await res.json();
+                const progress = job.progress || {};
+                const counts = progress.counts || {};
+                document.getElementById('loadingText').textContent =
+                    `Deep scraping (${job.status})... Brands ${progress.brands_done || 0}/${counts.brands || '?'}` +
+                    ` · ${counts.products || 0} products` + (progress.brand ? ` · ${progress.brand}` : '') +
+                    ` · ${job.elapsed}s`;
+                
+                if (JOB_FINISHED.includes(job.status)) {
+                    if (job.status === 'failed' || job.status === 'interrupted') {
+                        showStatus('Error: ' + job.error);
+                    } else {
+                        const result = await (await fetch('/api/jobs/' + jobId + '/result')).json();
+                        displayResults(result);
+                        currentSource = {jobId};
+                        if (job.status === 'cancelled') showStatus(`Cancelled - ${job.product_count} products kept`);
+                    }
+                    finishDeepScrape();
+                    return;
+                }
+            } catch (e) {
+                // Server busy or restarting - keep polling
+            }
+            setTimeout(() => pollJob(jobId), 1500);
+        }
+        
+        async function cancelJob() {
+            if (!currentJob) return;
+            document.getElementById('cancelJobBtn').disabled = true;
+            const res = await (await fetch('/api/jobs/' + currentJob + '/cancel', {method: 'POST'})).json();
+            if (res.detached) {
+                // Someone else is waiting on the same run - it keeps going for them
+                finishDeepScrape();
+                showStatus('Stopped waiting - the shared scrape continues for other users');
+            }
+        }
+        
+        function startDeepScrape() {
+            document.getElementById('scrapeBtn').disabled = true;
+            document.getElementById('deepScrapeBtn').disabled = true;
+            document.getElementById('loadingText').textContent = 'Deep scraping... (Category → Brands → Series → Products)';
+            document.getElementById('cancelJobBtn').style.display = '';
+            document.getElementById('cancelJobBtn').disabled = false;
+            document.getElementById('loading').classList.add('show');
+            document.getElementById('results').classList.remove('show');
+        }
+        
+        function finishDeepScrape() {
+            currentJob = null;
+            localStorage.removeItem('deepScrapeJob');
             document.getElementById('scrapeBtn').disabled = false;
             document.getElementById('deepScrapeBtn').disabled = false;
+            document.getElementById('cancelJobBtn').style.display = 'none';
             document.getElementById('loadingText').textContent = 'Scraping data... This may take 15-30 seconds';
             document.getElementById('loading').classList.remove('show');
         }
         
+        // Page reloaded while a job was running - pick it up again
+        if (localStorage.getItem('deepScrapeJob')) {
+            currentJob = localStorage.getItem('deepScrapeJob');
+            startDeepScrape();
+            pollJob(currentJob);
+        }
+        
         function displayResults(data) {
             // ONLY use products - cleaner default view
             let items = [];
@@ -468,6 +574,7 @@ HTML_TEMPLATE = """
             });
             
             currentData = items;
+            currentSource = data.export ? {export: data.export} : null;
             
             // Extract all unique fields from data
             allFields = ['序号'];  // Always include index
@@ -628,40 +735,41 @@ HTML_TEMPLATE = """
         function exportData(format) {
             if (!currentData.length) { showStatus('No data to export'); return; }
             
-            let content, filename, type;
-            const timestamp = new Date().toISOString().slice(0,19).replace(/[:-]/g,'');
-            
             if (format === 'json') {
-                content = JSON.stringify(currentData, null, 2);
-                filename = `aihuishou_${timestamp}.json`;
-                type = 'application/json';
-            } else {
-                // Export with custom columns - CSV format
-                const enabledCols = selectedColumns.filter(c => c.enabled);
-                const sep = ',';
-                const nl = String.fromCharCode(10);
-                const bom = String.fromCharCode(0xFEFF);
-                
-                const headers = enabledCols.map(c => c.header).join(sep);
-                const rows = currentData.map((item, idx) => 
-                    enabledCols.map(c => {
-                        let val = c.isIndex ? (idx + 1) : (item[c.field] || '');
-                        if (typeof val === 'object') val = JSON.stringify(val);
-                        return String(val).replace(/,/g, ';');
-                    }).join(sep)
-                );
-                
-                content = bom + headers + nl + rows.join(nl);
-                filename = `aihuishou_${timestamp}.csv`;
-                type = 'text/csv;charset=utf-8';
+                const timestamp = new Date().toISOString().slice(0,19).replace(/[:-]/g,'');
+                const filename = `aihuishou_${timestamp}.json`;
+                const blob = new Blob([JSON.stringify(currentData, null, 2)], {type: 'application/json'});
+                const a = document.createElement('a');
+                a.href = URL.createObjectURL(blob);
+                a.download = filename;
+                a.click();
+                showStatus('Downloaded ' + filename);
+                return;
             }
             
-            const blob = new Blob([content], {type});
-            const a = document.createElement('a');
-            a.href = URL.createObjectURL(blob);
-            a.download = filename;
-            a.click();
-            showStatus('Downloaded ' + filename);
+            // CSV / XLSX are built and streamed by the server with the customized columns
+            const columns = selectedColumns.filter(c => c.enabled);
+            if (!columns.length) { showStatus('Select at least one column'); return; }
+            if (!currentSource) { showStatus('These results were not saved on the server - scrape again to export'); return; }
+            
+            // A plain form POST lets the browser stream the download to disk
+            const form = document.createElement('form');
+            form.method = 'POST';
+            form.action = '/api/export';
+            const payload = document.createElement('input');
+            payload.type = 'hidden';
+            payload.name = 'payload';
+            payload.value = JSON.stringify({...currentSource, format: format === 'xlsx' ? 'xlsx' : 'csv', columns});
+            form.appendChild(payload);
+            document.body.appendChild(form);
+            form.submit();
+            form.remove();
+            showStatus('Export started');
+        }
+        
+        function showCacheStatus(cache) {
+            const age = cache.age < 60 ? `${Math.round(cache.age)}s` : `${Math.round(cache.age / 60)} min`;
+            showStatus(`Served from cache (${age} old) - tick "Bypass cache" to scrape again`);
         }
         
         function showStatus(msg) {
@@ -681,12 +789,10 @@ HTML_TEMPLATE = """
 
 # ============ SCRAPER ============
 async def scrape_url(url: str):
-    from playwright.async_api import async_playwright
-    
     captured = {"products": [], "brands": [], "raw": []}
     
     async def handle_response(response):
-        if "aihuishou.com" not in response.url:
+        if not is_upstream_url(response.url):
             return
         try:
             data = await response.json()
@@ -731,35 +837,46 @@ async def scrape_url(url: str):
         except:
             pass
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X)",
-            viewport={"width": 375, "height": 812}
-        )
-        await context.add_cookies([{
-            "name": "chosenCity",
-            "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-            "domain": "m.aihuishou.com",
-            "path": "/"
-        }])
-        
+    # Warm context from the shared pool (rate limited, city cookie set) - no browser launch per request
+    async with get_browser_pool().context() as context:
         page = await context.new_page()
         page.on("response", lambda r: asyncio.create_task(handle_response(r)))
-        
-        await page.goto(url, timeout=60000, wait_until="domcontentloaded")
-        await asyncio.sleep(6)
-        
-        for _ in range(5):
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await asyncio.sleep(1.5)
-        
-        await browser.close()
+        try:
+            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+            await asyncio.sleep(6)
+            
+            for _ in range(5):
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                await asyncio.sleep(1.5)
+        finally:
+            await page.close()
     
     return captured
 
 
+async def scrape_and_export(url: str):
+    """scrape_url() + auto_export(), as one single-flight run so attached callers get the export name too"""
+    start = time.time()
+    result = await scrape_url(url)
+    if result.get("products"):
+        # File + catalog writes are blocking - keep them off the shared loop
+        export_file = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: auto_export(result, "scrape", url=url, duration=time.time() - start))
+        if export_file:
+            result["export"] = os.path.basename(export_file)  # lets /api/export find it again
+    return result
+
+
 # ============ ROUTES ============
+# Identical /api/scrape calls in flight at the same time share one browser run
+scrape_flights = SingleFlight()
+
+
+def fresh_requested(data) -> bool:
+    """?fresh=1 (or "fresh": true in the body) skips the result cache"""
+    return request.args.get('fresh') == '1' or bool((data or {}).get('fresh'))
+
+
 @app.route('/')
 def index():
     return render_template_string(HTML_TEMPLATE)
@@ -774,25 +891,43 @@ def api_scrape():
         logger.warning("Scrape request with no URL")
         return jsonify({"error": "URL required"})
     
+    cache = get_result_cache()
+    cache_key = f"scrape:{normalize_url(url)['url']}"
+    if cache and not fresh_requested(data):
+        hit = cache.get(cache_key)
+        if hit:
+            result, age = hit
+            logger.info(f"♻️ Scrape served from cache ({age}s old): {url[:60]}")
+            payload = {**result, "cache": {"hit": True, "age": age, "key": cache_key}}
+            return stream_json(payload, items=payload.get("products", []))
+    
     logger.info(f"🔍 Starting scrape: {url[:60]}...")
     
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(scrape_url(url))
-    loop.close()
+    try:
+        result, attached = scrape_flights.run(cache_key, lambda: scrape_and_export(url), timeout=LOOP_THREAD["timeout"])
+    except FutureTimeout:
+        logger.error(f"⏱️ Scrape timed out after {LOOP_THREAD['timeout']}s: {url[:60]}")
+        return jsonify({"error": f"Scrape timed out after {LOOP_THREAD['timeout']}s"}), 504
+    
+    if attached:
+        # The run exported it already; the first caller caches it
+        logger.info(f"🔗 Scrape attached to an in-flight run ({scrape_flights.stats['attached']} attached so far): {url[:60]}")
+        payload = {**result, "cache": {"hit": False, "age": 0, "key": cache_key, "attached": True}}
+        return stream_json(payload, items=payload.get("products", []))
     
-    # Auto-export
     product_count = len(result.get('products', []))
     if product_count > 0:
-        auto_export(result, "scrape")
+        if cache:
+            cache.put(cache_key, result)
         logger.info(f"✅ Scrape complete: {product_count} products")
     
-    return jsonify(result)
+    payload = {**result, "cache": {"hit": False, "age": 0, "key": cache_key}}
+    return stream_json(payload, items=payload.get("products", []))
 
 
 @app.route('/api/deep-scrape', methods=['POST'])
 def api_deep_scrape():
-    """Deep scrape: Category → Brands → Series → Products"""
+    """Deep scrape: Category → Brands → Series → Products, as a background job (poll /api/jobs/<id>)"""
     data = request.get_json()
     url = data.get('url', '')
     
@@ -800,31 +935,75 @@ def api_deep_scrape():
         logger.warning("Deep scrape request with no URL")
         return jsonify({"error": "URL required"})
     
-    logger.info(f"🔥 Starting DEEP scrape: {url[:60]}...")
-    start_time = time.perf_counter()
+    engine = data.get('engine', 'browser')
+    cache = get_result_cache()
+    cache_key = f"deep:{engine}:{normalize_url(url)['key']}"
+    if cache and not fresh_requested(data):
+        hit = cache.get(cache_key)
+        if hit:
+            result, age = hit
+            logger.info(f"♻️ DEEP scrape served from cache ({age}s old): {cache_key}")
+            payload = {**result, "status": "done", "cache": {"hit": True, "age": age, "key": cache_key}}
+            return stream_json(payload, items=payload.get("products", []))
     
     try:
-        from deep_scraper import DeepScraper
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        scraper = DeepScraper()
-        products = loop.run_until_complete(scraper.scrape_all(url, headless=True))
-        loop.close()
-        
-        elapsed = time.perf_counter() - start_time
-        result = {"products": products}
-        
-        # Auto-export
-        if len(products) > 0:
-            auto_export(result, "deep_scrape")
-            logger.info(f"✅ Deep scrape complete: {len(products)} products in {elapsed:.1f}s")
-        
-        return jsonify(result)
-    except Exception as e:
-        logger.error(f"❌ Deep scrape error: {str(e)}")
-        return jsonify({"error": str(e)})
+        manager = get_job_manager(export=auto_export)
+        job_id, attached = manager.submit(url, engine=engine, cache_key=cache_key)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    job = manager.get(job_id)
+    if attached:
+        logger.info(f"🔗 DEEP scrape attached to job {job_id} ({job['attached']} extra caller(s)): {url[:60]}")
+    else:
+        logger.info(f"🔥 DEEP scrape job {job_id} queued: {url[:60]}...")
+    return jsonify({"jobId": job_id, "status": job["status"], "attached": attached,
+                    "statusUrl": f"/api/jobs/{job_id}"}), 202
+
+
+# ============ BACKGROUND JOBS ============
+@app.route('/api/jobs', methods=['GET'])
+def api_jobs():
+    """Recent jobs, newest first"""
+    manager = get_job_manager(export=auto_export)
+    return jsonify({"jobs": manager.list(), "stats": manager.stats})
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """Status, progress and recent events of a job"""
+    job = get_job_manager(export=auto_export).get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def api_job_result(job_id):
+    """Products of a finished job"""
+    manager = get_job_manager(export=auto_export)
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    result = manager.result(job_id)
+    if result is None:
+        return jsonify({"error": f"Job is {job['status']}", "status": job["status"]}), 409
+    return stream_json(result, items=result.get("products", []))
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_job_cancel(job_id):
+    """Cancel a queued or running job (products found so far are kept)"""
+    manager = get_job_manager(export=auto_export)
+    if manager.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    if manager.detach(job_id):
+        # Other callers share this run - only this one leaves
+        return jsonify({"cancelled": False, "detached": True, "status": manager.get(job_id)["status"]})
+    cancelled = manager.cancel(job_id)
+    if cancelled:
+        logger.info(f"🛑 Job {job_id} cancel requested")
+    return jsonify({"cancelled": cancelled, "status": manager.get(job_id)["status"]})
 
 
 @app.route('/api/logs', methods=['GET'])
@@ -848,58 +1027,134 @@ def api_status():
         "status": "running",
         "time": datetime.now().isoformat(),
         "hostname": "192.168.1.11",
-        "port": 5000
+        "port": 5000,
+        "result_cache": get_result_cache().summary() if get_result_cache() else None,
+        "single_flight": {
+            "scrape": scrape_flights.stats,
+            "deep_scrape": get_job_manager(export=auto_export).stats,
+        }
     })
 
 
 # ============ DATA VIEWER ============
 @app.route('/api/exports', methods=['GET'])
 def api_exports():
-    """List all exported JSON files"""
-    export_dir = "exports"
-    if not os.path.exists(export_dir):
-        return jsonify({"files": []})
-    
+    """List exported JSON files with their metadata, straight from the export catalog"""
+    catalog = get_export_catalog()
+    try:
+        catalog.sync()  # picks up files written / deleted by other tools (enrich.py, CLI runs)
+    except Exception as e:
+        logger.warning(f"Export catalog sync failed: {e}")
     files = []
-    for filename in os.listdir(export_dir):
-        if filename.endswith('.json'):
-            filepath = os.path.join(export_dir, filename)
-            stat = os.stat(filepath)
-            files.append({
-                "name": filename,
-                "size": stat.st_size,
-                "sizeKB": round(stat.st_size / 1024, 1),
-                "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
-            })
-    
-    files.sort(key=lambda x: x['modified'], reverse=True)
+    for row in catalog.list():
+        files.append({
+            "name": row["name"],
+            "size": row["size"],
+            "sizeKB": round(row["size"] / 1024, 1),
+            "modified": datetime.fromtimestamp(row["mtime"]).isoformat(),
+            "items": row["items"],
+            "brands": row["brands"],
+            "series": row["series"],
+            "category": row["category"],
+            "duration": row["duration"],
+            "sha256": row["sha256"],
+        })
     return jsonify({"files": files})
 
 
 @app.route('/api/exports/<filename>', methods=['GET'])
 def api_export_file(filename):
-    """Get contents of a specific export file"""
+    """Get contents of a specific export file (streamed; ?format=ndjson for one product per line)"""
     export_dir = "exports"
     filepath = os.path.join(export_dir, filename)
     
-    if not os.path.exists(filepath) or not filename.endswith('.json'):
+    if os.path.basename(filename) != filename or not os.path.exists(filepath) or not filename.endswith('.json'):
         return jsonify({"error": "File not found"}), 404
     
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Count items
-        count = 0
-        if isinstance(data, dict) and 'products' in data:
-            count = len(data.get('products', []))
-            data = data['products']  # Return products directly
-        elif isinstance(data, list):
-            count = len(data)
-        
-        return jsonify({"count": count, "data": data})
+        # Parsed rows are shared with /rows (cached until the file changes)
+        rows = get_export_index(filepath).rows
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    
+    return stream_json({"count": len(rows), "data": rows}, items=rows)
+
+
+@app.route('/api/export', methods=['POST'])
+def api_export():
+    """Stream an export file or job result as CSV / XLSX with the UI's column config.
+    Body (JSON, or a form field "payload" holding the same JSON):
+    {"export": "<file>.json" | "jobId": "<id>", "format": "csv" | "xlsx",
+     "columns": [{"field", "header", "enabled", "isIndex"}, ...]}"""
+    data = request.get_json(silent=True)
+    if data is None:
+        try:
+            data = json.loads(request.form.get('payload') or '{}')
+        except ValueError:
+            return jsonify({"error": "Invalid payload"}), 400
+    
+    filename = data.get('export')
+    if data.get('jobId'):
+        job = get_job_manager(export=auto_export).get(data['jobId'])
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        if not job.get('result_file'):
+            return jsonify({"error": f"Job is {job['status']} and has no exported products"}), 409
+        filename = os.path.basename(job['result_file'])
+    if not filename:
+        return jsonify({"error": "export or jobId required"}), 400
+    
+    filepath = os.path.join("exports", filename)
+    if os.path.basename(filename) != filename or not filename.endswith('.json') or not os.path.exists(filepath):
+        return jsonify({"error": "File not found"}), 404
+    
+    fmt = data.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unknown format: {fmt}"}), 400
+    try:
+        columns = resolve_columns(data.get('columns'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        # Read incrementally from the file - memory stays flat however large the export is
+        rows = open_rows(filepath)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    download = f"aihuishou_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    logger.info(f"📤 Export {filename} -> {download} ({len(columns)} columns)")
+    response = Response(iter_table(rows, columns, fmt), mimetype=FORMATS[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="{download}"'
+    return response
+
+
+@app.route('/api/exports/<filename>/rows', methods=['GET'])
+def api_export_rows(filename):
+    """One page of an export's products, filtered and sorted server-side
+    (?offset=&limit=&q=&brand=&series=&sort=[-]field&facets=1)"""
+    filepath = os.path.join("exports", filename)
+    if os.path.basename(filename) != filename or not filename.endswith('.json') or not os.path.exists(filepath):
+        return jsonify({"error": "File not found"}), 404
+    
+    args = request.args
+    try:
+        offset = int(args.get('offset', 0))
+        limit = int(args.get('limit', EXPORT_INDEX["page_size"]))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    
+    try:
+        index = get_export_index(filepath)
+    except (OSError, ValueError) as e:
+        return jsonify({"error": str(e)}), 500
+    
+    page = index.query(q=args.get('q', '').strip(), brand=args.get('brand', ''), series=args.get('series', ''),
+                       sort=args.get('sort', ''), offset=offset, limit=limit)
+    if args.get('facets') == '1':
+        page["stats"] = index.stats()
+        page.update(index.facets())
+    return jsonify(page)
 
 
 DATA_VIEWER_TEMPLATE = """
@@ -939,6 +1194,11 @@ DATA_VIEWER_TEMPLATE = """
         .loading { text-align: center; padding: 50px; color: var(--muted); }
         .search { width: 100%; padding: 12px; border: 1px solid var(--border); border-radius: 8px; background: rgba(0,0,0,0.3); color: var(--text); margin-bottom: 15px; }
         img { max-width: 60px; max-height: 60px; border-radius: 4px; }
+        .filters { display: flex; gap: 10px; margin-bottom: 15px; align-items: center; flex-wrap: wrap; }
+        .filters select, .pager button { padding: 8px 12px; border: 1px solid var(--border); border-radius: 8px; background: rgba(0,0,0,0.3); color: var(--text); }
+        .pager { margin-left: auto; display: flex; gap: 10px; align-items: center; color: var(--muted); font-size: 13px; }
+        .pager button { cursor: pointer; }
+        th.sortable { cursor: pointer; }
     </style>
 </head>
 <body>
@@ -959,6 +1219,15 @@ DATA_VIEWER_TEMPLATE = """
             
             <div class="main">
                 <input type="text" class="search" id="search" placeholder="🔍 Search products..." oninput="filterData()">
+                <div class="filters">
+                    <select id="brandFilter" onchange="filterData()"><option value="">All brands</option></select>
+                    <select id="seriesFilter" onchange="filterData()"><option value="">All series</option></select>
+                    <span class="pager">
+                        <button onclick="changePage(-1)">‹ Prev</button>
+                        <span id="pageInfo"></span>
+                        <button onclick="changePage(1)">Next ›</button>
+                    </span>
+                </div>
                 
                 <div class="stats" id="stats"></div>
                 
@@ -975,8 +1244,8 @@ DATA_VIEWER_TEMPLATE = """
     </div>
     
     <script>
-        let currentData = [];
         let currentFile = '';
+        let catalog = {};  // file name -> catalog metadata from /api/exports
         
         async function loadFiles() {
             const res = await fetch('/api/exports');
@@ -988,10 +1257,11 @@ DATA_VIEWER_TEMPLATE = """
                 return;
             }
             
+            files.forEach(f => catalog[f.name] = f);
             list.innerHTML = files.map(f => `
                 <li class="file-item" data-file="${f.name}" onclick="loadFile('${f.name}')">
                     <div class="file-name">${f.name}</div>
-                    <div class="file-meta">${f.sizeKB} KB • ${new Date(f.modified).toLocaleString()}</div>
+                    <div class="file-meta">${f.items} items • ${f.sizeKB} KB • ${new Date(f.modified).toLocaleString()}</div>
                 </li>
             `).join('');
             
@@ -999,8 +1269,18 @@ DATA_VIEWER_TEMPLATE = """
             if (files.length) loadFile(files[0].name);
         }
         
+        const PAGE_SIZE = 100;
+        const COLS = ['brand', 'series', 'collection', 'productName', 'subTitle', 'productId', 'imageUrl'];
+        const HEADERS = ['Brand', 'Series', 'Collection', 'Product Name', 'Spec', 'ID', 'Image'];
+        // Single-page scrape exports name some fields differently
+        const ALIASES = {brand: ['brandName'], series: ['seriesName'], productName: ['name', 'title'], productId: ['id']};
+        let view = {offset: 0, sort: '', total: 0};
+        let searchTimer = null;
+        
         async function loadFile(filename) {
             currentFile = filename;
+            view = {offset: 0, sort: '', total: 0};
+            document.getElementById('search').value = '';
             
             // Update active state
             document.querySelectorAll('.file-item').forEach(el => el.classList.remove('active'));
@@ -1008,59 +1288,97 @@ DATA_VIEWER_TEMPLATE = """
             
             document.getElementById('tableBody').innerHTML = '<tr><td class="loading">Loading...</td></tr>';
             
-            const res = await fetch('/api/exports/' + filename);
-            const {count, data} = await res.json();
-            
-            currentData = data || [];
-            
-            // Stats
-            const brands = [...new Set(currentData.map(p => p.brand).filter(Boolean))];
-            const series = [...new Set(currentData.map(p => p.series).filter(Boolean))];
-            
+            // Stats from the export catalog; first page + brand / series facets from the server
+            const info = catalog[filename] || {};
             document.getElementById('stats').innerHTML = `
-                <div class="stat"><div class="stat-value">${count}</div><div class="stat-label">Products</div></div>
-                <div class="stat"><div class="stat-value">${brands.length}</div><div class="stat-label">Brands</div></div>
-                <div class="stat"><div class="stat-value">${series.length}</div><div class="stat-label">Series</div></div>
+                <div class="stat"><div class="stat-value">${info.items ?? 0}</div><div class="stat-label">Products</div></div>
+                <div class="stat"><div class="stat-value">${info.brands ?? 0}</div><div class="stat-label">Brands</div></div>
+                <div class="stat"><div class="stat-value">${info.series ?? 0}</div><div class="stat-label">Series</div></div>
+                ${info.category ? `<div class="stat"><div class="stat-value">${escapeHtml(info.category)}</div><div class="stat-label">Category</div></div>` : ''}
+                ${info.duration ? `<div class="stat"><div class="stat-value">${info.duration}s</div><div class="stat-label">Scrape time</div></div>` : ''}
             `;
             
-            renderTable(currentData);
+            const page = await (await fetch(`/api/exports/${filename}/rows?limit=${PAGE_SIZE}&facets=1`)).json();
+            fillSelect('brandFilter', 'All brands', page.brands || []);
+            fillSelect('seriesFilter', 'All series', page.series || []);
+            
+            showPage(page);
+        }
+        
+        function fillSelect(id, label, values) {
+            const options = values.map(v => `<option value="${escapeHtml(v.value)}">${escapeHtml(v.value)} (${v.count})</option>`);
+            document.getElementById(id).innerHTML = `<option value="">${label}</option>` + options.join('');
+        }
+        
+        function escapeHtml(value) {
+            return String(value).replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+        }
+        
+        async function fetchPage() {
+            if (!currentFile) return;
+            const params = new URLSearchParams({
+                offset: view.offset,
+                limit: PAGE_SIZE,
+                q: document.getElementById('search').value.trim(),
+                brand: document.getElementById('brandFilter').value,
+                series: document.getElementById('seriesFilter').value,
+                sort: view.sort,
+            });
+            const page = await (await fetch(`/api/exports/${currentFile}/rows?${params}`)).json();
+            showPage(page);
+        }
+        
+        function showPage(page) {
+            view.total = page.total || 0;
+            const first = view.total ? view.offset + 1 : 0;
+            document.getElementById('pageInfo').textContent = `${first}–${view.offset + (page.rows || []).length} of ${view.total}`;
+            renderTable(page.rows || []);
+        }
+        
+        function changePage(step) {
+            const offset = view.offset + step * PAGE_SIZE;
+            if (offset < 0 || offset >= view.total) return;
+            view.offset = offset;
+            fetchPage();
+        }
+        
+        function sortBy(col) {
+            view.sort = view.sort === col ? '-' + col : col;
+            view.offset = 0;
+            fetchPage();
         }
         
         function renderTable(data) {
+            document.getElementById('tableHead').innerHTML = `<tr>${HEADERS.map((h, i) => {
+                const arrow = view.sort === COLS[i] ? ' ▲' : view.sort === '-' + COLS[i] ? ' ▼' : '';
+                return `<th class="sortable" onclick="sortBy('${COLS[i]}')">${h}${arrow}</th>`;
+            }).join('')}</tr>`;
+            
             if (!data.length) {
                 document.getElementById('tableBody').innerHTML = '<tr><td>No data</td></tr>';
                 return;
             }
             
-            const cols = ['brand', 'series', 'collection', 'productName', 'subTitle', 'productId', 'imageUrl'];
-            const headers = ['Brand', 'Series', 'Collection', 'Product Name', 'Spec', 'ID', 'Image'];
-            
-            document.getElementById('tableHead').innerHTML = `<tr>${headers.map(h => `<th>${h}</th>`).join('')}</tr>`;
-            
-            document.getElementById('tableBody').innerHTML = data.slice(0, 500).map(item => `
+            document.getElementById('tableBody').innerHTML = data.map(item => `
                 <tr>
-                    ${cols.map(c => {
-                        let val = item[c] || '-';
+                    ${COLS.map(c => {
+                        let val = [c, ...(ALIASES[c] || [])].map(k => item[k]).find(v => v !== undefined && v !== null && v !== '') ?? '-';
                         if (c === 'imageUrl' && val !== '-') {
                             return `<td><img src="${val}" loading="lazy" onerror="this.style.display='none'"></td>`;
                         }
-                        return `<td>${String(val).substring(0, 50)}</td>`;
+                        return `<td>${escapeHtml(String(val).substring(0, 50))}</td>`;
                     }).join('')}
                 </tr>
             `).join('');
         }
         
         function filterData() {
-            const q = document.getElementById('search').value.toLowerCase();
-            if (!q) {
-                renderTable(currentData);
-                return;
-            }
-            
-            const filtered = currentData.filter(item => 
-                Object.values(item).some(v => String(v).toLowerCase().includes(q))
-            );
-            renderTable(filtered);
+            // Debounced: the server filters, a request per keystroke is wasteful
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => {
+                view.offset = 0;
+                fetchPage();
+            }, 250);
         }
         
         loadFiles();
@@ -0,0 +1,168 @@
+"""
+AIHUISHOU BENCHMARK
+Run DeepScraper end to end and report wall time, products/sec, pages/sec and
+peak RSS, compared against a stored baseline (bench_baseline.json).
+
+Deterministic runs replay a HAR recorded with deep_scraper.py --record (see
+har_replay.py); --http runs are best pointed at mock_server.py.
+
+Usage:
+    python bench.py "<category_url>" --replay=runs/watches.har --replay-scale=0.25 --runs=3
+    python bench.py "<category_url>" --replay=runs/watches.har --save-baseline
+    python bench.py "<category_url>" --http --runs=3 --tolerance=15   # exit 1 on a >15% regression
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import asyncio
+import statistics
+from datetime import datetime
+from typing import Dict, Optional
+
+from deep_scraper import DeepScraper
+from events import EventType
+from har_replay import HarReplayer
+
+# Fix Windows console encoding
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+BASELINE_PATH = "bench_baseline.json"
+METRICS = ("wall_s", "products_per_s", "pages_per_s", "peak_rss_mb", "peak_child_rss_mb")
+HIGHER_IS_BETTER = {"products_per_s", "pages_per_s"}
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak RSS of this process and of its finished children (Playwright driver + browser)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return {"peak_rss_mb": round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1),
+                    "peak_child_rss_mb": None}
+        except ImportError:
+            return {"peak_rss_mb": None, "peak_child_rss_mb": None}
+    unit = 1 if sys.platform == "darwin" else 1024  # bytes on macOS, KB elsewhere
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2 ** 20, 1),
+    }
+
+
+async def run_once(url: str, engine: str = "browser", replay: Optional[str] = None,
+                   scale: float = 1.0, headless: bool = True) -> Dict:
+    scraper = DeepScraper()
+    if replay:
+        scraper.replayer = HarReplayer(replay, scale=scale)
+    pages = 0
+
+    def count_pages(event):
+        nonlocal pages
+        if event.type == EventType.PAGE_FETCHED:
+            pages += 1
+
+    scraper.events.subscribe(count_pages)
+    start = time.perf_counter()
+    products = await scraper.scrape_all(url, headless=headless, engine=engine)
+    wall = time.perf_counter() - start
+
+    result = {
+        "wall_s": round(wall, 2),
+        "products": len(products),
+        "pages": pages,
+        "products_per_s": round(len(products) / wall, 1) if wall else None,
+        "pages_per_s": round(pages / wall, 2) if wall else None,
+        **peak_rss_mb(),
+    }
+    if scraper.replayer:
+        result["replay_missed"] = scraper.replayer.stats["missed"]
+    return result
+
+
+def median_of(runs, metric: str):
+    values = [r[metric] for r in runs if r.get(metric) is not None]
+    return round(statistics.median(values), 2) if values else None
+
+
+def load_baselines(path: str = BASELINE_PATH) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current: Dict, baseline: Optional[Dict], tolerance: float) -> bool:
+    """Print the comparison table, return True when some metric regressed beyond tolerance %"""
+    regressed = False
+    print(f"  {'metric':<18} {'current':>10} {'baseline':>10} {'delta':>8}")
+    for metric in METRICS:
+        value = current.get(metric)
+        base = (baseline or {}).get(metric)
+        delta = ""
+        flag = ""
+        if value is not None and base:
+            change = (value - base) / base * 100
+            delta = f"{change:+.1f}%"
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                flag = "  [!] regression"
+                regressed = True
+        print(f"  {metric:<18} {value if value is not None else '-':>10} "
+              f"{base if base is not None else '-':>10} {delta:>8}{flag}")
+    return regressed
+
+
+async def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print(__doc__)
+        return 0
+
+    url = args[0]
+    engine = "hybrid" if "--hybrid" in sys.argv else "http" if "--http" in sys.argv else "browser"
+    replay, scale, runs, tolerance, baseline_path = None, 1.0, 1, 10.0, BASELINE_PATH
+    for arg in sys.argv[1:]:
+        if arg.startswith("--replay="):
+            replay = arg.split("=", 1)[1]
+        elif arg.startswith("--replay-scale="):
+            scale = float(arg.split("=", 1)[1])
+        elif arg.startswith("--runs="):
+            runs = int(arg.split("=", 1)[1])
+        elif arg.startswith("--tolerance="):
+            tolerance = float(arg.split("=", 1)[1])
+        elif arg.startswith("--baseline="):
+            baseline_path = arg.split("=", 1)[1]
+
+    name = f"{engine}:{replay or url}" + (f"@{scale}" if replay else "")
+    results = []
+    for i in range(runs):
+        result = await run_once(url, engine=engine, replay=replay, scale=scale, headless="--show" not in sys.argv)
+        print(f"[BENCH] run {i + 1}/{runs}: {result}")
+        results.append(result)
+
+    current = {metric: median_of(results, metric) for metric in METRICS}
+    current["products"] = results[-1]["products"]
+    current["runs"] = runs
+    current["date"] = datetime.now().isoformat(timespec="seconds")
+
+    baselines = load_baselines(baseline_path)
+    print()
+    print(f"[BENCH] {name} (median of {runs})")
+    regressed = compare(current, baselines.get(name), tolerance)
+
+    if "--save-baseline" in sys.argv:
+        baselines[name] = current
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+        print(f"[BENCH] Baseline saved -> {baseline_path}")
+    elif name not in baselines:
+        print(f"[BENCH] No baseline for {name} yet - run with --save-baseline")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
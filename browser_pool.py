@@ -0,0 +1,113 @@
+"""
+AIHUISHOU BROWSER POOL
+One Chromium kept running with a few ready BrowserContexts (city cookie set,
+rate limited), so a browser lookup costs a page load instead of a browser launch.
+
+The pool belongs to the event loop it was started on - run every acquire()
+on that loop. get_browser_pool() is the process-wide pool on the shared loop
+thread (loop_thread.py), closed at shutdown.
+
+Usage:
+    pool = get_browser_pool()        # or BrowserPool(size=2) for a private one
+    async with pool.context() as context:
+        page = await context.new_page()
+        ...
+    await pool.close()
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from config import DEFAULT_CITY_ID, SITE_DOMAIN, get_cookies
+from rate_limiter import limit_context
+from loop_thread import on_shutdown
+
+USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148"
+
+
+class BrowserPool:
+    """Warm Chromium + up to `size` reusable contexts"""
+
+    def __init__(self, size: int = 2, headless: bool = True, city_id: int = DEFAULT_CITY_ID):
+        self.size = size
+        self.headless = headless
+        self.city_id = city_id
+        self.playwright = None
+        self.browser = None
+        self.contexts: List = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.stats = {"launches": 0, "contexts": 0, "acquired": 0}
+
+    async def start(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._idle = asyncio.Queue()
+        async with self._lock:
+            if self.browser is not None and self.browser.is_connected():
+                return
+            from playwright.async_api import async_playwright
+
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=self.headless)
+            self.contexts = []
+            self._idle = asyncio.Queue()
+            self.stats["launches"] += 1
+
+    async def _new_context(self):
+        context = await self.browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={"width": 375, "height": 812},
+            locale="zh-CN"
+        )
+        await limit_context(context)
+        await context.add_cookies([{
+            "name": "chosenCity",
+            "value": get_cookies(self.city_id)["chosenCity"],
+            "domain": SITE_DOMAIN,
+            "path": "/"
+        }])
+        self.contexts.append(context)
+        self.stats["contexts"] += 1
+        return context
+
+    @asynccontextmanager
+    async def context(self):
+        """Borrow a warm context (waits if all `size` contexts are busy)"""
+        await self.start()
+        async with self._lock:
+            if self._idle.empty() and len(self.contexts) < self.size:
+                self._idle.put_nowait(await self._new_context())
+        context = await self._idle.get()
+        self.stats["acquired"] += 1
+        try:
+            yield context
+        finally:
+            if context in self.contexts:
+                self._idle.put_nowait(context)
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+        self.contexts = []
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide warm pool, used on the shared loop thread and closed with it"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            on_shutdown(_pool.close)
+        return _pool
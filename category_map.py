@@ -0,0 +1,184 @@
+"""
+AIHUISHOU CATEGORY MAP
+Auto-discover frontCategoryId -> (categoryId, bizType, name) from the
+front-category list endpoint, cached on disk with a TTL.
+
+Usage:
+    python category_map.py            # print map (uses cache if fresh)
+    python category_map.py --refresh  # force re-discovery
+
+    from category_map import lookup_category
+    lookup_category("166")  # -> (340, 2, "Bags")
+"""
+
+import os
+import sys
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import CACHE_DIR, CATEGORY_MAP_TTL
+from loop_thread import on_loop_thread
+
+CACHE_FILE = os.path.join(CACHE_DIR, "category_map.json")
+
+# Known categories - used until discovery succeeds, and merged under discovered data
+SEED_CATEGORIES = {
+    # Watches 奢腕表
+    "145": (138, 2, "Watches"),
+    # Bags 包袋
+    "166": (340, 2, "Bags"),
+    # Phones 手机
+    "1": (1, 1, "Phone"),
+    # Shoes 潮鞋
+    "181": (341, 2, "Shoes"),
+    # Jewelry 珠宝首饰
+    "188": (342, 2, "Jewelry"),
+}
+
+# Top-level front categories (category page tabs)
+SEED_TOP_LEVEL = {
+    "6": "Phones",
+    "7": "Laptops",
+    "8": "Tablets",
+    "10": "Cameras",
+    "107": "Shoes",
+    "108": "Clothes",
+    "206": "Bags",
+    "144": "Watches",
+}
+
+CHILD_KEYS = ("children", "subCategories", "subFrontCategories", "childList", "childFrontCategories")
+
+RETRY_AFTER = 300  # seconds between discovery attempts after a failure
+
+_memory_cache: Optional[Dict] = None
+_last_attempt: float = 0
+
+
+def parse_category_tree(nodes: List[Dict]) -> Tuple[Dict[str, Tuple[int, int, str]], Dict[str, str]]:
+    """Walk the front-category tree -> (categories, top_level)"""
+    categories = {}
+    top_level = {}
+
+    def walk(items, depth):
+        for node in items or []:
+            if not isinstance(node, dict):
+                continue
+            front_id = node.get("frontCategoryId") or node.get("id")
+            name = node.get("name") or node.get("title") or ""
+            if front_id is not None:
+                if depth == 0:
+                    top_level[str(front_id)] = name
+                if node.get("categoryId"):
+                    categories[str(front_id)] = (node["categoryId"], node.get("bizType") or 1, name)
+            for key in CHILD_KEYS:
+                if isinstance(node.get(key), list):
+                    walk(node[key], depth + 1)
+
+    walk(nodes, 0)
+    return categories, top_level
+
+
+def discover_categories() -> Optional[Dict]:
+    """Fetch the category tree through DirectScraper.get_categories()"""
+    from direct_scraper import DirectScraper
+
+    scraper = DirectScraper()
+    try:
+        nodes = scraper.get_categories()
+    finally:
+        scraper.close()
+    if not nodes:
+        return None
+
+    categories, top_level = parse_category_tree(nodes)
+    if not categories and not top_level:
+        return None
+
+    return {
+        "updated": time.time(),
+        "categories": {k: list(v) for k, v in categories.items()},
+        "top_level": top_level,
+    }
+
+
+def _read_cache() -> Optional[Dict]:
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(data: Dict):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = CACHE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, CACHE_FILE)
+
+
+def load_category_map(ttl: float = CATEGORY_MAP_TTL, refresh: bool = False, discover: bool = True) -> Dict:
+    """
+    Cached category data: {"updated", "categories": {frontId: [categoryId, bizType, name]}, "top_level": {frontId: name}}
+    Re-discovers when the cache is older than ttl; falls back to stale cache, then seeds.
+    Never re-discovers on the shared loop thread (loop_thread.py): discovery blocks on that
+    loop through SyncApiClient, so the stale map / seeds are used until another thread refreshes it.
+    discover=False: cached data only, whatever its age (for hot paths that must not hit the network).
+    """
+    global _memory_cache, _last_attempt
+
+    data = _memory_cache or _read_cache()
+    fresh = data is not None and time.time() - data.get("updated", 0) < ttl
+
+    stale = not fresh and time.time() - _last_attempt > RETRY_AFTER
+    if (refresh or (discover and stale)) and not on_loop_thread():
+        _last_attempt = time.time()
+        discovered = None
+        try:
+            discovered = discover_categories()
+        except Exception as e:
+            print(f"[WARN] Category discovery failed: {e}")
+        if discovered:
+            _write_cache(discovered)
+            data = discovered
+
+    if data is None:
+        data = {"updated": 0, "categories": {}, "top_level": {}}
+
+    _memory_cache = data
+    return data
+
+
+def get_category_map(**kwargs) -> Dict[str, Tuple[int, int, str]]:
+    """frontCategoryId -> (categoryId, bizType, name), discovered entries over seeds"""
+    categories = dict(SEED_CATEGORIES)
+    for front_id, info in load_category_map(**kwargs).get("categories", {}).items():
+        categories[front_id] = tuple(info)
+    return categories
+
+
+def get_top_level_categories(**kwargs) -> Dict[int, str]:
+    """Top-level frontCategoryId -> name"""
+    top_level = load_category_map(**kwargs).get("top_level") or SEED_TOP_LEVEL
+    return {int(k): v for k, v in top_level.items()}
+
+
+def lookup_category(front_category_id, **kwargs) -> Optional[Tuple[int, int, str]]:
+    """(categoryId, bizType, name) for a frontCategoryId, or None"""
+    if front_category_id is None:
+        return None
+    return get_category_map(**kwargs).get(str(front_category_id))
+
+
+def main():
+    refresh = "--refresh" in sys.argv
+    categories = get_category_map(refresh=refresh)
+    print(f"[OK] {len(categories)} categories (cache: {CACHE_FILE})")
+    for front_id, (category_id, biz_type, name) in sorted(categories.items(), key=lambda x: int(x[0])):
+        print(f"  {front_id:>5} -> categoryId={category_id:<5} bizType={biz_type}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,36 @@
 # Configuration for Aihuishou Scraper
 
-BASE_URL = "https://dubai.aihuishou.com/dubai-gateway"
+import os
+from urllib.parse import urlsplit
+
+# Upstream hosts - override both to run every scraper against mock_server.py:
+#   AIHUISHOU_API_HOST=http://127.0.0.1:8900 AIHUISHOU_SITE_URL=http://127.0.0.1:8900 python deep_scraper.py ...
+API_HOST = os.environ.get("AIHUISHOU_API_HOST", "https://dubai.aihuishou.com").rstrip("/")
+SITE_URL = os.environ.get("AIHUISHOU_SITE_URL", "https://m.aihuishou.com").rstrip("/")
+API_DOMAIN = urlsplit(API_HOST).hostname
+SITE_DOMAIN = urlsplit(SITE_URL).hostname
+
+BASE_URL = f"{API_HOST}/dubai-gateway"
+
+
+def is_api_url(url: str) -> bool:
+    """Gateway / trade-front API call (dubai.aihuishou.com or the API_HOST override)"""
+    return "dubai.aihuishou.com" in url or url.startswith(API_HOST)
+
+
+def is_upstream_url(url: str) -> bool:
+    """Any aihuishou request (site or API), including the overridden hosts"""
+    return "aihuishou.com" in url or url.startswith((API_HOST, SITE_URL))
+
+
+# JSON endpoints (relative to BASE_URL) behind the m.aihuishou.com SPA pages
+API_PATHS = {
+    "brands": "/front-category/brands-v2",
+    "spu_collection": "/recycle-products/spu-collection",
+    "spu_list": "/recycle-products/spu-list",
+    "quick_inquiry": "/recycle-products/quick-inquiry/{product_id}",
+    "search": "/recycle-products/search-by-category",
+}
 
 # Default city IDs
 CITIES = {
@@ -12,24 +42,166 @@ CITIES = {
 
 DEFAULT_CITY_ID = 1  # Shanghai
 
+# City display names used in the chosenCity cookie
+CITY_NAMES = {
+    1: "上海市",
+    2: "北京市",
+    3: "广州市",
+    4: "深圳市",
+}
+
 # Request headers - cần giả lập browser thật
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
     "Content-Type": "application/json",
     "Accept": "application/json, text/plain, */*",
     "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-    "Origin": "https://m.aihuishou.com",
-    "Referer": "https://m.aihuishou.com/",
+    "Origin": SITE_URL,
+    "Referer": f"{SITE_URL}/",
     "x-city-id": "1",
     "x-host-type": "2",
 }
 
 # Cookie template - URL encoded to avoid encoding errors
-def get_cookies(city_id: int = 1, city_name: str = "上海市"):
+def get_cookies(city_id: int = 1, city_name: str = None):
     import json
     from urllib.parse import quote
-    city_data = json.dumps({"id": city_id, "name": city_name}, ensure_ascii=False)
+    city_name = city_name or CITY_NAMES.get(city_id, "上海市")
+    city_data = json.dumps({"id": city_id, "name": city_name}, ensure_ascii=False, separators=(',', ':'))
     return {
         "chosenCity": quote(city_data, safe=''),
     }
 
+
+def get_headers(city_id: int = DEFAULT_CITY_ID):
+    """HEADERS with x-city-id set for the given city"""
+    headers = dict(HEADERS)
+    headers["x-city-id"] = str(city_id)
+    return headers
+
+
+# Rate limits per host: (requests per second, burst size)
+# Hosts not listed here use the "default" budget
+RATE_LIMITS = {
+    API_DOMAIN: (4.0, 8),
+    SITE_DOMAIN: (2.0, 4),
+    "default": (4.0, 8),
+}
+
+# "RATE:BURST" for both upstream hosts, e.g. to push load at mock_server.py
+if os.environ.get("AIHUISHOU_RATE_LIMIT"):
+    _rate, _burst = os.environ["AIHUISHOU_RATE_LIMIT"].split(":")
+    RATE_LIMITS[API_DOMAIN] = RATE_LIMITS[SITE_DOMAIN] = (float(_rate), int(_burst))
+
+# Set to a file path to share the rate limiter between processes (SQLite)
+RATE_LIMIT_DB = os.environ.get("AIHUISHOU_RATE_LIMIT_DB")
+
+# On-disk caches (category map, ...)
+CACHE_DIR = os.environ.get("AIHUISHOU_CACHE_DIR", "cache")
+
+# Re-discover the category tree after this many seconds
+CATEGORY_MAP_TTL = 24 * 3600
+
+# Distributed deep scrape (work_queue.py) - put the DB on a volume shared by all workers
+WORK_QUEUE_DB = os.environ.get("AIHUISHOU_QUEUE_DB", "work_queue.db")
+WORK_LEASE_SECONDS = 180   # a unit goes back to the queue if its worker stops heartbeating
+WORK_MAX_ATTEMPTS = 3
+
+# Browser-harvested sessions for HTTP clients (session_broker.py)
+SESSION_TTL = 3600                               # re-bootstrap the browser session after this many seconds
+SESSION_CHALLENGE_STATUS = (403, 412, 429)       # responses treated as a challenge -> refresh session
+
+# Direct API client (api_client.py)
+API_CLIENT = {
+    "max_concurrent": 8,   # pooled connections / in-flight requests per client
+    "timeout": 15,         # seconds per call
+    "retries": 3,          # extra attempts on timeouts, connection errors, 429 and 5xx
+    "backoff": 0.5,        # base seconds for exponential backoff (with jitter)
+}
+
+# On-disk response cache under the API client (response_cache.py)
+RESPONSE_CACHE = {
+    "enabled": os.environ.get("AIHUISHOU_CACHE", "1") != "0",
+    "path": os.path.join(CACHE_DIR, "responses.db"),
+    "max_bytes": 200 * 1024 * 1024,   # LRU eviction above this size
+    "offline": os.environ.get("AIHUISHOU_OFFLINE") == "1",   # serve only from the cache
+    "browser": False,                 # also cache gateway XHRs captured in DeepScraper's browser
+}
+
+# Seconds a cached response stays fresh, by URL substring (first match wins).
+# Endpoints not listed here are never cached.
+RESPONSE_CACHE_TTLS = {
+    "/recycle-products/quick-inquiry/": 6 * 3600,
+    "/front-category/brands-v2": 24 * 3600,
+    "/recycle-products/spu-collection": 24 * 3600,
+    "/recycle-products/spu-list": 6 * 3600,
+    "/recycle-products/search-by-category": 6 * 3600,
+    "/trade-front/api/inquiry/front-category/list": 24 * 3600,
+    "/trade-front/api/trade/brand/list": 24 * 3600,
+    "/trade-front/api/trade/product/list": 6 * 3600,
+    "/trade-front/api/inquiry/product/info": 6 * 3600,
+}
+
+# Hedged requests + per-endpoint circuit breaker (resilience.py)
+RESILIENCE = {
+    "hedge": True,
+    "hedge_percentile": 0.95,    # send a duplicate once a call runs past this latency percentile
+    "hedge_min_samples": 20,     # ...after this many successful calls to the endpoint
+    "hedge_min_delay": 0.05,     # never hedge sooner than this (seconds)
+    "breaker_window": 30,        # seconds of outcomes the error rate is computed over
+    "breaker_min_requests": 10,
+    "breaker_error_rate": 0.5,   # open the circuit at this failure ratio
+    "breaker_cooldown": 15,      # seconds before a trial call is let through
+}
+
+# Local stand-in API for load tests (mock_server.py)
+MOCK_SERVER = {
+    "host": "127.0.0.1",
+    "port": 8900,
+    "latency": "lognormal:80:0.5",   # fixed:MS | uniform:MIN:MAX | lognormal:MEDIAN_MS:SIGMA
+    "error_rate": 0.0,
+    "error_status": 503,
+    "page_size": None,               # None = honour the request's pageSize
+}
+
+# Whole scrape results keyed by normalized URL (result_cache.py) - ?fresh=1 bypasses
+RESULT_CACHE = {
+    "enabled": os.environ.get("AIHUISHOU_RESULT_CACHE", "1") != "0",
+    "dir": os.path.join(CACHE_DIR, "results"),
+    "ttl": int(os.environ.get("AIHUISHOU_RESULT_CACHE_TTL", 30 * 60)),   # seconds
+    "memory_items": 8,   # results also kept in memory (deep scrapes are a few MB each)
+}
+
+# Server-side paging over export files (export_index.py, /api/exports/<file>/rows)
+EXPORT_INDEX = {
+    "files": 16,            # per-file indexes kept in memory
+    "page_size": 50,        # default rows per page
+    "max_page_size": 500,
+}
+
+# Catalog of export files with precomputed metadata (export_catalog.py)
+EXPORT_CATALOG = {
+    "path": os.path.join(CACHE_DIR, "export_catalog.db"),
+    "dir": "exports",
+}
+
+# Streamed JSON / NDJSON responses (json_stream.py)
+STREAMING = {
+    "chunk_size": 64 * 1024,   # bytes of JSON per chunk before compression
+    "gzip_level": 6,
+    "brotli_quality": 5,       # used when the optional brotli package is installed
+}
+
+# Shared background event loop (loop_thread.py)
+LOOP_THREAD = {
+    "timeout": 120,          # seconds a Flask request waits for its coroutine
+    "shutdown_timeout": 30,  # seconds for cancelling tasks + closing pools at exit
+}
+
+# Background deep-scrape jobs (jobs.py)
+JOBS = {
+    "workers": 2,        # deep scrapes running at the same time
+    "dir": "jobs",       # one <id>.json per job
+    "keep": 200,         # finished jobs kept on disk
+    "events": 50,        # recent events kept per job
+}
@@ -4,16 +4,19 @@ DEBUG: Check what brand data contains from category page
 
 import asyncio
 
+from config import SITE_URL, SITE_DOMAIN, is_upstream_url
+from rate_limiter import limit_context
+
 
 async def test():
     from playwright.async_api import async_playwright
     
-    category_url = "https://m.aihuishou.com/n/#/category?frontCategoryId=144&subFrontCategoryId=145"
+    category_url = f"{SITE_URL}/n/#/category?frontCategoryId=144&subFrontCategoryId=145"
     
     brands = []
     
     async def capture(response):
-        if "aihuishou.com" not in response.url:
+        if not is_upstream_url(response.url):
             return
         try:
             data = await response.json()
@@ -38,11 +41,12 @@ async def test():
             user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X)",
             viewport={"width": 375, "height": 812}
         )
+        await limit_context(context)
         
         await context.add_cookies([{
             "name": "chosenCity",
             "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-            "domain": "m.aihuishou.com",
+            "domain": SITE_DOMAIN,
             "path": "/"
         }])
         
@@ -15,14 +15,22 @@ import time
 import os
 from datetime import datetime
 from urllib.parse import urlencode, parse_qs, urlparse
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+from config import (CITIES, CITY_NAMES, DEFAULT_CITY_ID, RESPONSE_CACHE, SITE_URL, SITE_DOMAIN,
+                    get_cookies, is_upstream_url)
+from category_map import lookup_category
+from events import EventBus, EventType, JsonlSubscriber
+from rate_limiter import limit_context
+from response_cache import cache_context
 
 os.environ['PYTHONIOENCODING'] = 'utf-8'
 
 # Fix Windows encoding
 import io
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 def log(level: str, msg: str, indent: int = 0):
@@ -48,21 +56,7 @@ class DeepScraper:
     MAX_SCROLL = 3        # Reduced from 5
     MAX_CONCURRENT = 3    # Parallel brand processing
     
-    # Category ID mapping: frontCategoryId -> (categoryId, bizType, name)
-    CATEGORY_MAP = {
-        # Watches 奢腕表
-        "145": (138, 2, "Watches"),
-        # Bags 包袋  
-        "166": (340, 2, "Bags"),
-        # Phones 手机
-        "1": (1, 1, "Phone"),
-        # Shoes 潮鞋
-        "181": (341, 2, "Shoes"),
-        # Jewelry 珠宝首饰
-        "188": (342, 2, "Jewelry"),
-    }
-    
-    def __init__(self):
+    def __init__(self, city_id: int = DEFAULT_CITY_ID, events: Optional[EventBus] = None):
         self.brands: List[Dict] = []
         self.collections: List[Dict] = []  # For 4-level path
         self.products: List[Dict] = []
@@ -70,6 +64,11 @@ class DeepScraper:
         self.current_collection: Optional[Dict] = None
         self.start_time: float = 0
         
+        # City (cookie + x-city-id header)
+        self.city_id = city_id
+        self.multi_city = False
+        self._seen = set()  # (productId, cityId) already captured
+        
         # Category info
         self.front_category_id: Optional[str] = None
         self.category_id: Optional[int] = None
@@ -77,24 +76,41 @@ class DeepScraper:
         self.category_name: str = "Unknown"
         
         # Stats
-        self.stats = {"brands": 0, "collections": 0, "products": 0, "errors": 0}
+        self.stats = {"brands": 0, "collections": 0, "products": 0, "errors": 0, "fallbacks": 0}
+        
+        # Live progress (see events.py)
+        self.events = events or EventBus()
+        
+        # HAR record / replay of browser contexts (see har_replay.py)
+        self.recorder = None
+        self.replayer = None
     
-    async def scrape_all(self, category_url: str, headless: bool = True) -> List[Dict]:
+    async def scrape_all(self, category_url: str, headless: bool = True, engine: str = "browser") -> List[Dict]:
+        """
+        engine="browser": render the SPA pages and capture their XHRs
+        engine="http":    call the JSON endpoints directly (http_engine.py),
+                          falling back to the browser per brand when rejected
+        engine="hybrid":  like "http", but with a browser-harvested session
+                          from the session broker (session_broker.py)
+        """
         from playwright.async_api import async_playwright
         
         self.start_time = time.time()
         self._parse_url(category_url)
         
         self._print_banner()
+        self._emit(EventType.RUN_STARTED, url=category_url, category=self.category_name,
+                   cityIds=[self.city_id], engine=engine)
+        
+        if engine in ("http", "hybrid"):
+            await self._scrape_all_http(category_url, headless, hybrid=engine == "hybrid")
+            self._print_summary()
+            self._emit(EventType.RUN_FINISHED, elapsed=time.time() - self.start_time)
+            return self.products
         
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=headless)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X)",
-                viewport={"width": 375, "height": 812},
-                locale="zh-CN"
-            )
-            await self._set_cookies(context)
+            context = await self.new_context(browser, self.city_id)
             page = await context.new_page()
             
             # LEVEL 1: Get Brands
@@ -104,6 +120,8 @@ class DeepScraper:
             
             if not self.brands:
                 log("ERR", "No brands found!")
+                self._emit(EventType.ERROR, message="No brands found")
+                self._emit(EventType.RUN_FINISHED, elapsed=time.time() - self.start_time)
                 await browser.close()
                 return self.products
             
@@ -119,16 +137,7 @@ class DeepScraper:
                     try:
                         brand_name = brand.get('name', 'Unknown')
                         log("INFO", f"Brand [{idx+1}/{len(self.brands)}] {brand_name}")
-                        
-                        # Try spu-collection first (4-level), fallback to spu-list (3-level)
-                        collections = await self._get_collections(brand_page, brand)
-                        
-                        if collections:
-                            log("INFO", f"Found {len(collections)} collections", 1)
-                            for collection in collections:
-                                await self._scrape_products_from_collection(brand_page, brand, collection)
-                        else:
-                            await self._scrape_products_direct(brand_page, brand)
+                        await self._scrape_brand(brand_page, brand)
                     finally:
                         await brand_page.close()
             
@@ -139,8 +148,254 @@ class DeepScraper:
             await browser.close()
         
         self._print_summary()
+        self._emit(EventType.RUN_FINISHED, elapsed=time.time() - self.start_time)
+        return self.products
+    
+    async def scrape_all_cities(self, category_url: str, city_ids: Optional[List[int]] = None,
+                                headless: bool = True) -> List[Dict]:
+        """
+        Multi-city mode: discover brands/collections once, then scrape product
+        pages for every city at the same time (one browser context per city).
+        Products are keyed by (productId, cityId).
+        """
+        from playwright.async_api import async_playwright
+        
+        city_ids = city_ids or list(CITIES.values())
+        self.multi_city = True
+        self.start_time = time.time()
+        self._parse_url(category_url)
+        
+        self._print_banner()
+        log("INFO", f"Cities: {', '.join(CITY_NAMES.get(c, str(c)) for c in city_ids)}")
+        self._emit(EventType.RUN_STARTED, url=category_url, category=self.category_name, cityIds=city_ids)
+        
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless)
+            
+            # Hierarchy (brands + collections) is the same for every city - discover once
+            context = await self.new_context(browser, city_ids[0])
+            page = await context.new_page()
+            log("INFO", "LEVEL 1: Getting brands...")
+            await self._scrape_brands(page, category_url)
+            log("OK", f"Found {len(self.brands)} brands")
+            
+            if not self.brands:
+                log("ERR", "No brands found!")
+                self._emit(EventType.ERROR, message="No brands found")
+                self._emit(EventType.RUN_FINISHED, elapsed=time.time() - self.start_time)
+                await browser.close()
+                return self.products
+            
+            units = await self._discover_units(context)
+            await context.close()
+            log("OK", f"Found {len(units)} work units")
+            
+            # City-specific product pages - all cities in parallel
+            async def process_city(city_id: int):
+                city_context = await self.new_context(browser, city_id)
+                semaphore = asyncio.Semaphore(self.MAX_CONCURRENT)
+                
+                async def process_unit(brand: Dict, collection: Optional[Dict]):
+                    async with semaphore:
+                        unit_page = await city_context.new_page()
+                        try:
+                            if collection:
+                                await self._scrape_products_from_collection(unit_page, brand, collection, city_id)
+                            else:
+                                await self._scrape_products_direct(unit_page, brand, city_id)
+                        finally:
+                            await unit_page.close()
+                
+                log("INFO", f"City {CITY_NAMES.get(city_id, city_id)}: {len(units)} units")
+                try:
+                    await asyncio.gather(*[process_unit(b, c) for b, c in units])
+                finally:
+                    await city_context.close()
+            
+            await asyncio.gather(*[process_city(c) for c in city_ids])
+            await browser.close()
+        
+        self._print_summary()
+        self._emit(EventType.RUN_FINISHED, elapsed=time.time() - self.start_time)
         return self.products
     
+    async def discover_units(self, category_url: str, collections: bool = False,
+                             headless: bool = True) -> List[Dict]:
+        """
+        Hierarchy only, no products: one unit per brand, or one per
+        brand+collection when collections=True (3-level brands stay whole).
+        """
+        from playwright.async_api import async_playwright
+        
+        self._parse_url(category_url)
+        
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless)
+            context = await self.new_context(browser, self.city_id)
+            page = await context.new_page()
+            await self._scrape_brands(page, category_url)
+            
+            if collections and self.brands:
+                units = [{"brand": b, "collection": c} for b, c in await self._discover_units(context)]
+            else:
+                units = [{"brand": b} for b in self.brands]
+            
+            await browser.close()
+        
+        return units
+    
+    async def scrape_unit(self, context, unit: Dict, category_url: Optional[str] = None) -> List[Dict]:
+        """
+        Scrape one work unit in an existing context: {"brand": {...}} or
+        {"brand": {...}, "collection": {...}}. Returns the products captured.
+        """
+        if category_url:
+            self._parse_url(category_url)
+        page = await context.new_page()
+        try:
+            if unit.get("collection"):
+                await self._scrape_products_from_collection(page, unit["brand"], unit["collection"])
+            else:
+                await self._scrape_brand(page, unit["brand"])
+        finally:
+            await page.close()
+        return self.products
+    
+    async def _scrape_brand(self, page, brand: Dict):
+        started = time.time()
+        self._emit(EventType.BRAND_STARTED, brand=brand.get("name"), brandId=brand.get("id"))
+        
+        added = await self._scrape_brand_pages(page, brand)
+        
+        self._emit(EventType.BRAND_FINISHED, brand=brand.get("name"), brandId=brand.get("id"),
+                   added=added, elapsed=time.time() - started)
+    
+    async def _scrape_brand_pages(self, page, brand: Dict) -> int:
+        """Try spu-collection first (4-level), fallback to spu-list (3-level). Returns products added."""
+        collections = await self._get_collections(page, brand)
+        
+        if collections:
+            log("INFO", f"Found {len(collections)} collections", 1)
+            added = 0
+            for collection in collections:
+                added += await self._scrape_products_from_collection(page, brand, collection)
+            return added
+        return await self._scrape_products_direct(page, brand)
+    
+    async def _scrape_all_http(self, category_url: str, headless: bool = True, hybrid: bool = False):
+        """HTTP engine run - a browser is only started if some call gets rejected"""
+        from http_engine import HttpEngine, DirectApiRejected
+        from session_broker import get_broker
+        
+        fallback = {}  # lazily started playwright/browser/context
+        fallback_lock = asyncio.Lock()
+        
+        async def fallback_page():
+            async with fallback_lock:
+                if "context" not in fallback:
+                    from playwright.async_api import async_playwright
+                    log("INFO", "Starting browser for fallback...")
+                    fallback["playwright"] = await async_playwright().start()
+                    fallback["browser"] = await fallback["playwright"].chromium.launch(headless=headless)
+                    fallback["context"] = await self.new_context(fallback["browser"], self.city_id)
+            return await fallback["context"].new_page()
+        
+        try:
+            async with HttpEngine(self, broker=get_broker() if hybrid else None) as http:
+                # LEVEL 1: Get Brands
+                log("INFO", "LEVEL 1: Getting brands (direct API)...")
+                try:
+                    self.brands = await http.get_brands()
+                    self.stats["brands"] = len(self.brands)
+                except DirectApiRejected as e:
+                    log("WARN", f"Direct API rejected ({str(e)[:40]}) - using browser")
+                    self._emit(EventType.RETRY, engine="browser", step="brands", reason=str(e))
+                    page = await fallback_page()
+                    try:
+                        await self._scrape_brands(page, category_url)
+                    finally:
+                        await page.close()
+                log("OK", f"Found {len(self.brands)} brands")
+                
+                if not self.brands:
+                    log("ERR", "No brands found!")
+                    self._emit(EventType.ERROR, message="No brands found")
+                    return
+                
+                log("INFO", f"Processing {len(self.brands)} brands (direct API x{HttpEngine.MAX_CONCURRENT})...")
+                semaphore = asyncio.Semaphore(HttpEngine.MAX_CONCURRENT)
+                
+                async def process_brand(idx: int, brand: Dict):
+                    async with semaphore:
+                        brand_name = brand.get('name', 'Unknown')
+                        started = time.time()
+                        self._emit(EventType.BRAND_STARTED, brand=brand_name, brandId=brand.get("id"))
+                        
+                        # Counted per brand - other brands add to self.products concurrently
+                        try:
+                            added = await http.scrape_brand(brand)
+                        except DirectApiRejected as e:
+                            # Per-unit fallback: redo this brand in the browser (duplicates are skipped)
+                            self.stats["fallbacks"] += 1
+                            log("WARN", f"{brand_name}: direct API rejected - browser fallback", 1)
+                            self._emit(EventType.RETRY, engine="browser", brand=brand_name, reason=str(e))
+                            page = await fallback_page()
+                            try:
+                                added = await self._scrape_brand_pages(page, brand)
+                            finally:
+                                await page.close()
+                        
+                        log("OK", f"Brand [{idx+1}/{len(self.brands)}] {brand_name}: +{added} products")
+                        self._emit(EventType.BRAND_FINISHED, brand=brand_name, brandId=brand.get("id"),
+                                   added=added, elapsed=time.time() - started)
+                
+                await asyncio.gather(*[process_brand(i, b) for i, b in enumerate(self.brands)])
+                log("INFO", f"Direct API: {http.stats['requests']} requests, {http.stats['pages']} pages, "
+                            f"{http.stats['rejected']} rejected")
+        finally:
+            if "browser" in fallback:
+                await fallback["browser"].close()
+            if "playwright" in fallback:
+                await fallback["playwright"].stop()
+    
+    async def _discover_units(self, context) -> List[tuple]:
+        """Resolve every brand into (brand, collection) units - collection is None for 3-level brands"""
+        units = []
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT)
+        
+        async def discover(brand: Dict):
+            async with semaphore:
+                brand_page = await context.new_page()
+                try:
+                    collections = await self._get_collections(brand_page, brand)
+                finally:
+                    await brand_page.close()
+                if collections:
+                    units.extend((brand, c) for c in collections)
+                else:
+                    units.append((brand, None))
+        
+        await asyncio.gather(*[discover(b) for b in self.brands])
+        return units
+    
+    async def new_context(self, browser, city_id: int):
+        """Browser context with the city's cookie and x-city-id header"""
+        context = await browser.new_context(
+            user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X)",
+            viewport={"width": 375, "height": 812},
+            locale="zh-CN"
+        )
+        await limit_context(context)
+        if RESPONSE_CACHE["browser"]:
+            await cache_context(context)
+        if self.replayer:
+            await self.replayer.attach(context)
+        if self.recorder:
+            await self.recorder.attach(context)
+        await context.set_extra_http_headers({"x-city-id": str(city_id)})
+        await self._set_cookies(context, city_id)
+        return context
+    
     def _parse_url(self, url: str):
         """Extract category info from URL and lookup categoryId from map"""
         parsed = urlparse(url)
@@ -149,9 +404,9 @@ class DeepScraper:
         
         self.front_category_id = params.get('subFrontCategoryId', params.get('frontCategoryId', [None]))[0]
         
-        # Lookup from CATEGORY_MAP
-        if self.front_category_id and self.front_category_id in self.CATEGORY_MAP:
-            cat_info = self.CATEGORY_MAP[self.front_category_id]
+        # Lookup from discovered category map (category_map.py)
+        cat_info = lookup_category(self.front_category_id)
+        if cat_info:
             self.category_id = cat_info[0]
             self.biz_type = cat_info[1]
             self.category_name = cat_info[2]
@@ -162,11 +417,24 @@ class DeepScraper:
             if 'bizType' in params:
                 self.biz_type = int(params['bizType'][0])
     
-    async def _set_cookies(self, context):
+    def _page_params(self, brand: Dict, **extra) -> Dict:
+        """Query params for spu-collection / spu-list pages (unknown ids are left out)"""
+        params = {
+            "brandId": brand.get("id"),
+            "categoryId": self.category_id,
+            "frontCategoryId": self.front_category_id,
+            "bizType": self.biz_type,
+            "brand": brand.get("name", ""),
+            **extra,
+            "fullScreen": "true"
+        }
+        return {k: v for k, v in params.items() if v is not None}
+    
+    async def _set_cookies(self, context, city_id: Optional[int] = None):
         await context.add_cookies([{
             "name": "chosenCity",
-            "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-            "domain": "m.aihuishou.com",
+            "value": get_cookies(city_id or self.city_id)["chosenCity"],
+            "domain": SITE_DOMAIN,
             "path": "/"
         }])
     
@@ -175,7 +443,7 @@ class DeepScraper:
         captured_brands = []
         
         async def capture(response):
-            if "aihuishou.com" not in response.url:
+            if not is_upstream_url(response.url):
                 return
             try:
                 data = await response.json()
@@ -218,29 +486,13 @@ class DeepScraper:
             try:
                 data = await response.json()
                 if data.get("code") == 0:
-                    items = data.get("data", [])
-                    if isinstance(items, list):
-                        for item in items:
-                            if isinstance(item, dict) and "collectionId" in item:
-                                collections.append({
-                                    "collectionId": item.get("collectionId"),
-                                    "title": item.get("title", ""),
-                                    "seriesCode": item.get("seriesCode", ""),
-                                    "seriesName": item.get("seriesName", ""),
-                                })
+                    collections.extend(self.parse_collections(data.get("data", [])))
             except:
                 pass
         
         # Build collection URL
-        params = {
-            "brandId": brand.get("id"),
-            "categoryId": self.category_id or 340,
-            "frontCategoryId": self.front_category_id or 166,
-            "bizType": self.biz_type,
-            "brand": brand.get("name", ""),
-            "fullScreen": "true"
-        }
-        collection_url = f"https://m.aihuishou.com/p/main/recycle/spu-collection?{urlencode(params)}"
+        params = self._page_params(brand)
+        collection_url = f"{SITE_URL}/p/main/recycle/spu-collection?{urlencode(params)}"
         
         page.on("response", lambda r: asyncio.create_task(capture(r)))
         
@@ -252,109 +504,137 @@ class DeepScraper:
             pass
         
         self.stats["collections"] += len(collections)
+        if collections:
+            self._emit(EventType.COLLECTION_FOUND, brand=brand.get("name"), brandId=brand.get("id"),
+                       collections=len(collections))
         return collections
     
-    async def _scrape_products_from_collection(self, page, brand: Dict, collection: Dict):
+    async def _scrape_products_from_collection(self, page, brand: Dict, collection: Dict,
+                                               city_id: Optional[int] = None):
         """Scrape products from a specific collection (4-level)"""
-        products_before = len(self.products)
+        added = [0]  # this page only - other pages/cities add to self.products concurrently
         
         async def capture(response):
-            await self._capture_products(response, brand, collection)
+            added[0] += await self._capture_products(response, brand, collection, city_id)
         
-        params = {
-            "brandId": brand.get("id"),
-            "categoryId": self.category_id or 340,
-            "frontCategoryId": self.front_category_id or 166,
-            "bizType": self.biz_type,
-            "brand": brand.get("name", ""),
-            "collectionId": collection.get("collectionId"),
-            "seriesCode": collection.get("seriesCode", ""),
-            "title": collection.get("title", ""),
-            "fullScreen": "true"
-        }
-        spu_url = f"https://m.aihuishou.com/p/main/recycle/spu-list?{urlencode(params)}"
+        params = self._page_params(
+            brand,
+            collectionId=collection.get("collectionId"),
+            seriesCode=collection.get("seriesCode", ""),
+            title=collection.get("title", ""),
+        )
+        spu_url = f"{SITE_URL}/p/main/recycle/spu-list?{urlencode(params)}"
         
         page.on("response", lambda r: asyncio.create_task(capture(r)))
         
         try:
             await page.goto(spu_url, timeout=20000, wait_until="domcontentloaded")
             await asyncio.sleep(self.WAIT_PAGE)
-            await self._scroll_until_done(page, max_scrolls=15)
+            await self._scroll_until_done(page, lambda: added[0], max_scrolls=15)
         except Exception as e:
             log("ERR", f"Error: {str(e)[:30]}", 3)
             self.stats["errors"] += 1
+            self._emit(EventType.ERROR, message=str(e), brand=brand.get("name"), collection=collection.get("title"))
         
-        added = len(self.products) - products_before
-        if added > 0:
-            log("OK", f"+{added} products", 3)
+        if added[0] > 0:
+            log("OK", f"+{added[0]} products", 3)
+        return added[0]
     
-    async def _scrape_products_direct(self, page, brand: Dict):
+    async def _scrape_products_direct(self, page, brand: Dict, city_id: Optional[int] = None):
         """Scrape products directly from brand (3-level)"""
-        products_before = len(self.products)
+        added = [0]  # this page only - other pages/cities add to self.products concurrently
         
         async def capture(response):
-            await self._capture_products(response, brand, None)
+            added[0] += await self._capture_products(response, brand, None, city_id)
         
-        params = {
-            "brandId": brand.get("id"),
-            "categoryId": self.category_id or 138,
-            "frontCategoryId": self.front_category_id or 145,
-            "bizType": self.biz_type,
-            "brand": brand.get("name", ""),
-            "fullScreen": "true"
-        }
-        spu_url = f"https://m.aihuishou.com/p/main/recycle/spu-list?{urlencode(params)}"
+        params = self._page_params(brand)
+        spu_url = f"{SITE_URL}/p/main/recycle/spu-list?{urlencode(params)}"
         
         page.on("response", lambda r: asyncio.create_task(capture(r)))
         
         try:
             await page.goto(spu_url, timeout=20000, wait_until="domcontentloaded")
             await asyncio.sleep(self.WAIT_PAGE)
-            await self._scroll_until_done(page, max_scrolls=15)
+            await self._scroll_until_done(page, lambda: added[0], max_scrolls=15)
         except Exception as e:
             log("ERR", f"Error: {str(e)[:30]}", 2)
             self.stats["errors"] += 1
+            self._emit(EventType.ERROR, message=str(e), brand=brand.get("name"))
         
-        added = len(self.products) - products_before
-        if added > 0:
-            log("OK", f"+{added} products", 2)
+        if added[0] > 0:
+            log("OK", f"+{added[0]} products", 2)
+        return added[0]
     
-    async def _capture_products(self, response, brand: Dict, collection: Optional[Dict]):
-        """Capture product data from API response"""
-        if "aihuishou.com" not in response.url:
-            return
+    async def _capture_products(self, response, brand: Dict, collection: Optional[Dict],
+                                city_id: Optional[int] = None) -> int:
+        """Capture product data from API response. Returns how many products were new."""
+        if not is_upstream_url(response.url):
+            return 0
         try:
             data = await response.json()
             if data.get("code") != 0:
-                return
+                return 0
             
             items = data.get("data", [])
             if not isinstance(items, list) or not items:
-                return
+                return 0
             
             first = items[0]
             if not isinstance(first, dict) or "productId" not in first:
-                return
+                return 0
             
-            for item in items:
-                serials = item.get("serials", {})
-                series_name = serials.get("name", "") if isinstance(serials, dict) else ""
-                
-                product = {
-                    "brand": brand.get("name", ""),
-                    "series": series_name,
-                    "collection": collection.get("title", "") if collection else "",
-                    "productName": item.get("productName") or item.get("title", ""),
-                    "productId": item.get("productId"),
-                    "subTitle": item.get("subTitle", ""),
-                    "imageUrl": item.get("imageUrl", ""),
-                }
-                
-                if not any(p["productId"] == product["productId"] for p in self.products):
-                    self.products.append(product)
-                    self.stats["products"] += 1
+            return self.add_products(items, brand, collection, city_id, url=response.url)
         except:
-            pass
+            return 0
+    
+    @staticmethod
+    def parse_collections(items) -> List[Dict]:
+        """spu-collection items -> collection records"""
+        if not isinstance(items, list):
+            return []
+        return [{
+            "collectionId": item.get("collectionId"),
+            "title": item.get("title", ""),
+            "seriesCode": item.get("seriesCode", ""),
+            "seriesName": item.get("seriesName", ""),
+        } for item in items if isinstance(item, dict) and "collectionId" in item]
+    
+    def add_products(self, items: List[Dict], brand: Dict, collection: Optional[Dict],
+                     city_id: Optional[int] = None, url: str = "") -> int:
+        """Turn spu-list items into product records, skipping duplicates. Returns how many were new."""
+        self._emit(EventType.PAGE_FETCHED, url=url, items=len(items), brand=brand.get("name"))
+        added = 0
+        
+        for item in items:
+            serials = item.get("serials", {})
+            series_name = serials.get("name", "") if isinstance(serials, dict) else ""
+            
+            product = {
+                "brand": brand.get("name", ""),
+                "series": series_name,
+                "collection": collection.get("title", "") if collection else "",
+                "productName": item.get("productName") or item.get("title", ""),
+                "productId": item.get("productId"),
+                "subTitle": item.get("subTitle", ""),
+                "imageUrl": item.get("imageUrl", ""),
+            }
+            if self.multi_city:
+                product["cityId"] = city_id
+                product["cityName"] = CITY_NAMES.get(city_id, "")
+            
+            key = (product["productId"], city_id if self.multi_city else None)
+            if key not in self._seen:
+                self._seen.add(key)
+                self.products.append(product)
+                self.stats["products"] += 1
+                added += 1
+        
+        if added:
+            self._emit(EventType.PRODUCTS_ADDED, added=added, total=len(self.products), brand=brand.get("name"))
+        return added
+    
+    def _emit(self, event_type: str, **data):
+        self.events.emit(event_type, counts=self.stats, **data)
     
     async def _scroll(self, page, times: int = 3):
         """Simple scroll - kept for compatibility"""
@@ -362,9 +642,10 @@ class DeepScraper:
             await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
             await asyncio.sleep(self.WAIT_SCROLL)
     
-    async def _scroll_until_done(self, page, max_scrolls: int = 20):
-        """Smart scroll - continue scrolling until no new products loaded"""
-        last_count = len(self.products)
+    async def _scroll_until_done(self, page, count: Callable[[], int], max_scrolls: int = 20):
+        """Smart scroll - continue scrolling until no new products loaded.
+        count() is the number of products this page has captured so far."""
+        last_count = count()
         no_new_count = 0
         
         for i in range(max_scrolls):
@@ -372,7 +653,7 @@ class DeepScraper:
             await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
             await asyncio.sleep(0.8)  # Wait for API response
             
-            current_count = len(self.products)
+            current_count = count()
             
             if current_count > last_count:
                 # New products loaded, reset counter
@@ -393,6 +674,8 @@ class DeepScraper:
         print("=" * 60)
         log("INFO", f"Category: {self.category_name}")
         log("INFO", f"frontCategoryId: {self.front_category_id} -> categoryId: {self.category_id}")
+        if not self.category_id:
+            log("WARN", "categoryId unknown (not in category map) - will capture it from the brand API")
         print()
     
     def _print_summary(self):
@@ -405,6 +688,8 @@ class DeepScraper:
         log("OK", f"Products: {self.stats['products']}")
         if self.stats['errors']:
             log("WARN", f"Errors: {self.stats['errors']}")
+        if self.stats['fallbacks']:
+            log("WARN", f"Browser fallbacks: {self.stats['fallbacks']}")
         print("=" * 60)
         print(f"  Speed: {self.stats['products'] / elapsed:.1f} products/sec")
         print("=" * 60)
@@ -419,6 +704,8 @@ def export_csv(products: list, filename: str = None):
         return None
     
     fieldnames = ['brand', 'series', 'collection', 'productName', 'subTitle', 'productId', 'imageUrl']
+    if 'cityId' in products[0]:
+        fieldnames += ['cityId', 'cityName']
     with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
@@ -449,13 +736,59 @@ async def main():
         print()
         print('  # Bags (4-level):')
         print('  python deep_scraper.py "https://m.aihuishou.com/n/#/category?frontCategoryId=165&subFrontCategoryId=166"')
+        print()
+        print('  # All cities in config.CITIES (or --cities=shanghai,beijing):')
+        print('  python deep_scraper.py "<category_url>" --all-cities')
+        print()
+        print('  # Direct API engine (no page rendering, browser only as fallback):')
+        print('  python deep_scraper.py "<category_url>" --http')
+        print()
+        print('  # Hybrid: harvest a browser session once, then run on the direct API:')
+        print('  python deep_scraper.py "<category_url>" --hybrid')
+        print()
+        print('  # Write live progress events to a JSONL file:')
+        print('  python deep_scraper.py "<category_url>" --events=run.jsonl')
+        print()
+        print('  # Record the run to a HAR file, replay it later (timing x scale) - see bench.py:')
+        print('  python deep_scraper.py "<category_url>" --record=runs/watches.har')
+        print('  python deep_scraper.py "<category_url>" --replay=runs/watches.har --replay-scale=0.25')
         return
     
     url = sys.argv[1]
     headless = "--show" not in sys.argv
     
+    city_ids = None
+    if "--all-cities" in sys.argv:
+        city_ids = list(CITIES.values())
+    for arg in sys.argv:
+        if arg.startswith("--cities="):
+            city_ids = [CITIES[c.strip()] for c in arg.split("=", 1)[1].split(",") if c.strip()]
+    
+    engine = "hybrid" if "--hybrid" in sys.argv else "http" if "--http" in sys.argv else "browser"
+    
     scraper = DeepScraper()
-    products = await scraper.scrape_all(url, headless=headless)
+    replay_scale = 1.0
+    for arg in sys.argv:
+        if arg.startswith("--replay-scale="):
+            replay_scale = float(arg.split("=", 1)[1])
+    for arg in sys.argv:
+        if arg.startswith("--events="):
+            scraper.events.subscribe(JsonlSubscriber(arg.split("=", 1)[1]))
+        elif arg.startswith("--record="):
+            from har_replay import HarRecorder
+            scraper.recorder = HarRecorder(arg.split("=", 1)[1])
+        elif arg.startswith("--replay="):
+            from har_replay import HarReplayer
+            scraper.replayer = HarReplayer(arg.split("=", 1)[1], scale=replay_scale)
+    if city_ids:
+        products = await scraper.scrape_all_cities(url, city_ids, headless=headless)
+    else:
+        products = await scraper.scrape_all(url, headless=headless, engine=engine)
+    
+    if scraper.recorder:
+        await scraper.recorder.save()
+    if scraper.replayer:
+        log("INFO", f"Replay: {scraper.replayer.stats['served']} served, {scraper.replayer.stats['missed']} missed")
     
     if products:
         export_csv(products)
@@ -4,39 +4,54 @@ Crawl data directly from API - no browser automation
 
 Usage:
     python direct_scraper.py
+    python direct_scraper.py --crawl=6 [--concurrency=8]   # whole category -> xlsx/csv/json
 """
 
 import sys
 import io
-import requests
+import csv
 import json
-import pandas as pd
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from config import DEFAULT_CITY_ID, API_HOST, SITE_URL, get_cookies
+from api_client import ApiError, SyncApiClient
+from pagination import paginate, split_page
 
 # Fix encoding for Windows console
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 class DirectScraper:
     """Scraper calls Aihuishou API directly"""
     
-    BASE_URL = "https://dubai.aihuishou.com"
-    
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1",
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Origin": "https://m.aihuishou.com",
-            "Referer": "https://m.aihuishou.com/",
-            "Connection": "keep-alive",
-        })
-        # Add cookies
-        self.session.cookies.set("chosenCity", "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D", domain="m.aihuishou.com")
+    BASE_URL = API_HOST
+    
+    def __init__(self, city_id: int = DEFAULT_CITY_ID, broker=None):
+        """broker: optional SessionBroker - use a browser-harvested session for the HTTP calls"""
+        self.city_id = city_id
+        self.client = SyncApiClient(
+            city_id=city_id,
+            headers={
+                "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1",
+                "Accept": "application/json, text/plain, */*",
+                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+                "Origin": SITE_URL,
+                "Referer": f"{SITE_URL}/",
+                "x-city-id": str(city_id),
+            },
+            cookies=get_cookies(city_id),
+            broker=broker,
+        )
+    
+    def close(self):
+        self.client.close()
     
     # ============ CATEGORY ============
     def get_categories(self) -> List[Dict]:
@@ -44,19 +59,10 @@ class DirectScraper:
         url = f"{self.BASE_URL}/trade-front/api/inquiry/front-category/list"
         
         try:
-            resp = self.session.get(url, timeout=10)
-            print(f"  [DEBUG] Status: {resp.status_code}, Length: {len(resp.text)}")
-            if resp.status_code != 200:
-                print(f"  [DEBUG] Response: {resp.text[:200]}")
-                return []
-            data = resp.json()
-            if data.get("code") == 0:
-                categories = data.get("data", [])
-                print(f"[OK] Found {len(categories)} categories")
-                return categories
-            else:
-                print(f"  [DEBUG] API code: {data.get('code')}, msg: {data.get('msg')}")
-        except Exception as e:
+            categories = self.client.call("GET", url, timeout=10) or []
+            print(f"[OK] Found {len(categories)} categories")
+            return categories
+        except ApiError as e:
             print(f"[ERROR] get_categories: {e}")
         
         return []
@@ -68,19 +74,10 @@ class DirectScraper:
         params = {"frontCategoryId": category_id}
         
         try:
-            resp = self.session.get(url, params=params, timeout=10)
-            print(f"  [DEBUG] Status: {resp.status_code}, Length: {len(resp.text)}")
-            if resp.status_code != 200:
-                print(f"  [DEBUG] Response: {resp.text[:200]}")
-                return []
-            data = resp.json()
-            if data.get("code") == 0:
-                brands = data.get("data", [])
-                print(f"[OK] Found {len(brands)} brands for category {category_id}")
-                return brands
-            else:
-                print(f"  [DEBUG] API code: {data.get('code')}, msg: {data.get('msg')}")
-        except Exception as e:
+            brands = self.client.call("GET", url, params=params, timeout=10) or []
+            print(f"[OK] Found {len(brands)} brands for category {category_id}")
+            return brands
+        except ApiError as e:
             print(f"[ERROR] get_brands: {e}")
         
         return []
@@ -88,6 +85,17 @@ class DirectScraper:
     # ============ PRODUCTS (MODELS) ============
     def get_products(self, brand_id: int, category_id: Optional[int] = None, page: int = 1, size: int = 50) -> List[Dict]:
         """Lấy danh sách products/models theo brand"""
+        try:
+            products, _ = self.client.run(self._fetch_products_page(brand_id, category_id, page, size))
+            print(f"[OK] Found {len(products)} products for brand {brand_id}")
+            return products
+        except ApiError as e:
+            print(f"[ERROR] get_products: {e}")
+        
+        return []
+    
+    async def _fetch_products_page(self, brand_id: int, category_id: Optional[int], page: int,
+                                   size: int) -> Tuple[List[Dict], Optional[int]]:
         url = f"{self.BASE_URL}/trade-front/api/trade/product/list"
         params = {
             "brandId": brand_id,
@@ -97,29 +105,34 @@ class DirectScraper:
         if category_id:
             params["frontCategoryId"] = category_id
         
-        try:
-            resp = self.session.get(url, params=params)
-            data = resp.json()
-            if data.get("code") == 0:
-                products = data.get("data", [])
-                print(f"[OK] Found {len(products)} products for brand {brand_id}")
-                return products
-        except Exception as e:
-            print(f"[ERROR] get_products: {e}")
+        return split_page(await self.client.client.call("GET", url, params=params))
+    
+    def iter_products(self, brand_id: int, category_id: Optional[int] = None, size: int = 50,
+                      concurrency: int = 4, max_pages: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Tất cả products của brand, yielded lazily in page order.
+        Pages after the first are fetched concurrently (all at once up to `concurrency`
+        when the response has a total, speculatively until an empty page otherwise).
+        """
+        async def fetch(page):
+            return await self._fetch_products_page(brand_id, category_id, page, size)
         
-        return []
+        pages = paginate(fetch, size, first=1, concurrency=concurrency,
+                         max_pages=min(max_pages or self.MAX_PAGES, self.MAX_PAGES))
+        count = 0
+        for page, products in enumerate(self.client.iterate(pages), 1):
+            count += len(products)
+            print(f"  Page {page}: {len(products)} products (total: {count})")
+            yield from products
     
-    def get_all_products(self, brand_id: int, category_id: Optional[int] = None, max_pages: int = 10) -> List[Dict]:
+    def get_all_products(self, brand_id: int, category_id: Optional[int] = None,
+                         max_pages: int = 10) -> List[Dict]:
         """Lấy tất cả products với pagination"""
         all_products = []
-        
-        for page in range(1, max_pages + 1):
-            products = self.get_products(brand_id, category_id, page)
-            if not products:
-                break
-            all_products.extend(products)
-            print(f"  Page {page}: {len(products)} products (total: {len(all_products)})")
-        
+        try:
+            all_products.extend(self.iter_products(brand_id, category_id, max_pages=max_pages))
+        except ApiError as e:
+            print(f"[ERROR] get_all_products: {e}")
         return all_products
     
     # ============ PRODUCT INQUIRY (Chi tiết sản phẩm) ============
@@ -129,40 +142,100 @@ class DirectScraper:
         params = {"productId": product_id}
         
         try:
-            resp = self.session.get(url, params=params)
-            data = resp.json()
-            if data.get("code") == 0:
-                return data.get("data")
-        except Exception as e:
+            return self.client.call("GET", url, params=params)
+        except ApiError as e:
             print(f"[ERROR] get_product_inquiry: {e}")
         
         return None
     
     # ============ CRAWL ALL ============
-    def crawl_category(self, category_id: int) -> Dict[str, Any]:
-        """Crawl toàn bộ data của 1 category"""
+    PAGE_SIZE = 50
+    PAGE_CONCURRENCY = 4   # pages prefetched per brand
+    MAX_PAGES = 200        # hard cap per brand - a server that never sends an empty page is not paged forever
+    
+    def crawl_category(self, category_id: int, concurrency: int = 8, formats=("xlsx", "csv", "json"),
+                       prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Crawl toàn bộ data của 1 category
+        
+        All brands are crawled at once; brand and page requests share one pool of
+        `concurrency` in-flight requests. Products are streamed into the export
+        files as pages arrive instead of being collected in memory.
+        """
+        start = time.time()
+        brands = self.get_brands(category_id)
+        
+        prefix = prefix or f"category_{category_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        streams = [open_export_stream(fmt, f"{prefix}.{fmt}") for fmt in formats]
+        
+        def write(products):
+            for stream in streams:
+                stream.write(products)
+        
+        # CSV / openpyxl writes are blocking - one writer thread keeps them off the shared
+        # event loop (Flask requests and jobs run there too) and in arrival order
+        writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl-writer")
+        
+        async def sink(products):
+            await asyncio.get_running_loop().run_in_executor(writer, write, products)
+        
+        try:
+            timings = self.client.run(self._crawl_brands(brands, category_id, concurrency, sink))
+        finally:
+            writer.shutdown(wait=True)
+            for stream in streams:
+                stream.close()
+        
         result = {
             "category_id": category_id,
-            "brands": [],
-            "products": [],
+            "brands": brands,
+            "product_count": sum(t["products"] for t in timings),
+            "failed_brands": [t["brand_name"] for t in timings if t["error"]],
+            "files": [stream.filename for stream in streams],
+            "brand_timings": sorted(timings, key=lambda t: t["seconds"], reverse=True),
+            "seconds": round(time.time() - start, 2),
         }
         
-        # Lấy brands
-        brands = self.get_brands(category_id)
-        result["brands"] = brands
+        print(f"\n[DONE] {result['product_count']} products from {len(brands)} brands in {result['seconds']}s")
+        if result["failed_brands"]:
+            print(f"[WARN] {len(result['failed_brands'])} brands failed: {', '.join(result['failed_brands'])}")
+        for t in result["brand_timings"][:10]:
+            print(f"  {t['seconds']:>6.1f}s  {t['pages']:>3} pages  {t['products']:>5} products  {t['brand_name']}")
+        return result
+    
+    async def _crawl_brands(self, brands: List[Dict], category_id: int, concurrency: int, sink) -> List[Dict]:
+        pool = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*[self._crawl_brand(brand, category_id, pool, sink) for brand in brands])
+    
+    async def _crawl_brand(self, brand: Dict, category_id: int, pool: asyncio.Semaphore, sink) -> Dict:
+        brand_id = brand.get("id")
+        brand_name = brand.get("name", "Unknown")
+        timing = {"brand_id": brand_id, "brand_name": brand_name, "products": 0, "pages": 0, "error": None}
+        start = time.time()
         
-        # Lấy products cho từng brand
-        for brand in brands:
-            brand_id = brand.get("id")
-            brand_name = brand.get("name", "Unknown")
-            print(f"\n[BRAND] {brand_name} (ID: {brand_id})")
-            
-            products = self.get_all_products(brand_id, category_id)
-            for p in products:
-                p["brand_name"] = brand_name
-            result["products"].extend(products)
+        async def fetch(page):
+            async with pool:
+                return await self._fetch_products_page(brand_id, category_id, page, self.PAGE_SIZE)
         
-        return result
+        try:
+            async for products in paginate(fetch, self.PAGE_SIZE, first=1, concurrency=self.PAGE_CONCURRENCY,
+                                           max_pages=self.MAX_PAGES):
+                for p in products:
+                    p["brand_name"] = brand_name
+                await sink(products)
+                timing["products"] += len(products)
+                timing["pages"] += 1
+        except ApiError as e:
+            timing["error"] = str(e)
+        except Exception as e:
+            # One brand's odd payload or sink error must not take the other brands down with it
+            timing["error"] = f"{type(e).__name__}: {e}"
+        
+        timing["seconds"] = round(time.time() - start, 2)
+        status = f"[ERROR] {timing['error']}" if timing["error"] else "[OK]"
+        print(f"[BRAND] {brand_name} (ID: {brand_id}) {status} {timing['products']} products, "
+              f"{timing['pages']} pages in {timing['seconds']}s")
+        return timing
     
     # ============ EXPORT ============
     def export_to_excel(self, products: List[Dict], filename: str = None):
@@ -174,17 +247,7 @@ class DirectScraper:
         if not filename:
             filename = f"products_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
-        df = pd.DataFrame([{
-            "ID": p.get("id"),
-            "Name": p.get("name"),
-            "Brand": p.get("brand_name", p.get("brandId")),
-            "Max Price": p.get("maxPrice"),
-            "Image": p.get("imageUrl"),
-        } for p in products])
-        
-        df.to_excel(filename, index=False)
-        print(f"[EXPORTED] {len(products)} products -> {filename}")
-        return filename
+        return _export_all(ExcelExportStream(filename), products)
     
     def export_to_csv(self, products: List[Dict], filename: str = None):
         """Export products ra CSV"""
@@ -195,17 +258,7 @@ class DirectScraper:
         if not filename:
             filename = f"products_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         
-        df = pd.DataFrame([{
-            "ID": p.get("id"),
-            "Name": p.get("name"),
-            "Brand": p.get("brand_name", p.get("brandId")),
-            "Max Price": p.get("maxPrice"),
-            "Image": p.get("imageUrl"),
-        } for p in products])
-        
-        df.to_csv(filename, index=False, encoding="utf-8-sig")
-        print(f"[EXPORTED] {len(products)} products -> {filename}")
-        return filename
+        return _export_all(CsvExportStream(filename), products)
     
     def export_to_json(self, data: Any, filename: str = None):
         """Export data ra JSON"""
@@ -219,6 +272,98 @@ class DirectScraper:
         return filename
 
 
+# ============ STREAMING EXPORT ============
+EXPORT_COLUMNS = ["ID", "Name", "Brand", "Max Price", "Image"]
+
+
+def _export_row(p: Dict) -> List:
+    return [p.get("id"), p.get("name"), p.get("brand_name", p.get("brandId")), p.get("maxPrice"), p.get("imageUrl")]
+
+
+class ExportStream:
+    """Export file written incrementally - write() batches of products, then close()"""
+    
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.count = 0
+    
+    def write(self, products: List[Dict]):
+        for p in products:
+            self._write(p)
+        self.count += len(products)
+    
+    def _write(self, product: Dict):
+        raise NotImplementedError
+    
+    def close(self):
+        print(f"[EXPORTED] {self.count} products -> {self.filename}")
+
+
+class CsvExportStream(ExportStream):
+    def __init__(self, filename: str):
+        super().__init__(filename)
+        self.file = open(filename, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+    
+    def _write(self, product: Dict):
+        self.writer.writerow(_export_row(product))
+    
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+class JsonExportStream(ExportStream):
+    """JSON array of the raw product dicts"""
+    
+    def __init__(self, filename: str):
+        super().__init__(filename)
+        self.file = open(filename, "w", encoding="utf-8")
+        self.file.write("[")
+        self.separator = "\n  "
+    
+    def _write(self, product: Dict):
+        self.file.write(self.separator + json.dumps(product, ensure_ascii=False))
+        self.separator = ",\n  "
+    
+    def close(self):
+        self.file.write("\n]\n")
+        self.file.close()
+        super().close()
+
+
+class ExcelExportStream(ExportStream):
+    """openpyxl write-only workbook - rows go straight to disk"""
+    
+    def __init__(self, filename: str):
+        from openpyxl import Workbook
+        super().__init__(filename)
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(EXPORT_COLUMNS)
+    
+    def _write(self, product: Dict):
+        self.sheet.append(_export_row(product))
+    
+    def close(self):
+        self.workbook.save(self.filename)
+        super().close()
+
+
+EXPORT_STREAMS = {"xlsx": ExcelExportStream, "csv": CsvExportStream, "json": JsonExportStream}
+
+
+def open_export_stream(fmt: str, filename: str) -> ExportStream:
+    return EXPORT_STREAMS[fmt](filename)
+
+
+def _export_all(stream: ExportStream, products: List[Dict]) -> str:
+    stream.write(products)
+    stream.close()
+    return stream.filename
+
+
 # ============ MAIN ============
 def main():
     print("=" * 60)
@@ -228,6 +373,13 @@ def main():
     
     scraper = DirectScraper()
     
+    crawl = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--crawl=")), None)
+    if crawl:
+        concurrency = int(next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--concurrency=")), 8))
+        scraper.crawl_category(int(crawl), concurrency=concurrency)
+        scraper.close()
+        return
+    
     # 1. Lấy categories
     print("\n[STEP 1] Fetching categories...")
     categories = scraper.get_categories()
@@ -260,6 +412,7 @@ def main():
     else:
         print("[WARN] Apple brand not found in brands list")
     
+    scraper.close()
     print("\n" + "=" * 60)
     print("  DONE!")
     print("=" * 60)
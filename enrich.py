@@ -0,0 +1,211 @@
+"""
+AIHUISHOU EXPORT ENRICHMENT
+Add quick-inquiry details (couponPrice, templateType, question set) to every
+product of an export in exports/, joined by productId.
+
+- Concurrent calls through api_client (pooled, rate limited, response cache)
+- Resumable: finished lookups go to <export>.enrich.jsonl as they complete;
+  a re-run only fetches what is missing (and, with --retry-failed, what failed)
+- Multi-city exports (cityId column) are looked up per city
+
+Usage:
+    python enrich.py exports/deep_scrape_20251224_135557.json
+    python enrich.py exports/deep_scrape_20251224_135557.json --concurrency=16 --csv
+    python enrich.py exports/deep_scrape_20251224_135557.json --retry-failed
+"""
+
+import os
+import io
+import sys
+import csv
+import json
+import time
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from config import API_PATHS, DEFAULT_CITY_ID, get_cookies, get_headers
+from api_client import ApiClient, ApiError
+from export_catalog import get_export_catalog
+from scraper_browser import parse_product_data
+
+# Fix Windows console encoding
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+def load_export(path: str) -> List[Dict]:
+    """Product records from a JSON export ({"products": [...]} or a list) or a CSV export"""
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return list(csv.DictReader(f))
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("products") or data.get("data") or []
+    return [p for p in data if isinstance(p, dict)]
+
+
+def record_key(product: Dict) -> Optional[Tuple[int, int]]:
+    """(productId, cityId) of an export record, None if it has no usable id"""
+    product_id = product.get("productId") or product.get("id") or product.get("产品ID")
+    try:
+        return int(product_id), int(product.get("cityId") or DEFAULT_CITY_ID)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_checkpoint(path: str) -> Dict[Tuple[int, int], Dict]:
+    done = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # half-written last line after a crash
+                done[(entry["productId"], entry["cityId"])] = entry
+    return done
+
+
+class Enricher:
+    """Fetches quick-inquiry details for many (productId, cityId) pairs"""
+
+    def __init__(self, concurrency: int = 8):
+        self.concurrency = concurrency
+        self.clients: Dict[int, ApiClient] = {}
+        self.stats = {"fetched": 0, "failed": 0}
+
+    def _client(self, city_id: int) -> ApiClient:
+        if city_id not in self.clients:
+            self.clients[city_id] = ApiClient(city_id=city_id, headers=get_headers(city_id),
+                                              cookies=get_cookies(city_id), max_concurrent=self.concurrency)
+        return self.clients[city_id]
+
+    async def fetch(self, product_id: int, city_id: int) -> Dict:
+        entry = {"productId": product_id, "cityId": city_id}
+        try:
+            data = await self._client(city_id).call(
+                "GET", API_PATHS["quick_inquiry"].format(product_id=product_id),
+                params={"cityId": city_id, "queryType": 1})
+            entry["detail"] = parse_product_data(data or {})
+        except ApiError as e:
+            entry["error"] = str(e)
+        return entry
+
+    async def run(self, keys: List[Tuple[int, int]], checkpoint_path: str):
+        """Fetch every key, appending each result to the checkpoint as it completes"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        total = len(keys)
+        start = time.time()
+
+        async def one(key):
+            async with semaphore:
+                return await self.fetch(*key)
+
+        with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            tasks = [asyncio.ensure_future(one(key)) for key in keys]
+            try:
+                for i, task in enumerate(asyncio.as_completed(tasks), 1):
+                    entry = await task
+                    checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    checkpoint.flush()
+                    self.stats["failed" if "error" in entry else "fetched"] += 1
+                    if i % 100 == 0 or i == total:
+                        rate = i / (time.time() - start or 1)
+                        print(f"  [{i}/{total}] {self.stats['fetched']} ok, {self.stats['failed']} failed "
+                              f"({rate:.1f}/s)")
+            finally:
+                for task in tasks:
+                    task.cancel()
+                for client in self.clients.values():
+                    await client.close()
+
+
+def merge(products: List[Dict], done: Dict[Tuple[int, int], Dict]) -> List[Dict]:
+    """Export records + their quick-inquiry details"""
+    enriched = []
+    for product in products:
+        row = dict(product)
+        entry = done.get(record_key(product)) or {}
+        detail = entry.get("detail") or {}
+        row["couponPrice"] = detail.get("couponPrice")
+        row["templateType"] = detail.get("templateType")
+        row["questionCount"] = len(detail.get("questions") or [])
+        row["quickInquiry"] = detail.get("questions") or []
+        row["enrichError"] = entry.get("error") or (None if entry else "not fetched")
+        enriched.append(row)
+    return enriched
+
+
+def write_csv(rows: List[Dict], path: str):
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns and key != "quickInquiry":
+                columns.append(key)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def enrich_export(path: str, concurrency: int = 8, retry_failed: bool = False, with_csv: bool = False) -> str:
+    products = load_export(path)
+    stem = os.path.splitext(path)[0]
+    checkpoint_path = stem + ".enrich.jsonl"
+
+    done = load_checkpoint(checkpoint_path)
+    if retry_failed:
+        done = {k: v for k, v in done.items() if "error" not in v}
+
+    keys, seen = [], set(done)
+    for product in products:
+        key = record_key(product)
+        if key and key not in seen:
+            seen.add(key)
+            keys.append(key)
+    print(f"[ENRICH] {path}: {len(products)} records, {len(done)} already done, {len(keys)} to fetch")
+
+    enricher = Enricher(concurrency=concurrency)
+    if keys:
+        asyncio.run(enricher.run(keys, checkpoint_path))
+
+    rows = merge(products, load_checkpoint(checkpoint_path))  # last line per product wins
+
+    out_path = stem + "_enriched.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.basename(path), "products": rows}, f, ensure_ascii=False, indent=2)
+    print(f"[EXPORTED] {len(rows)} records -> {out_path}")
+    catalog = get_export_catalog()
+    if catalog.covers(out_path):  # listed by the web UI right away, also when a re-run overwrites it
+        try:
+            catalog.record(out_path, {"products": rows})
+        except Exception as e:
+            print(f"[WARN] Export catalog not updated for {out_path}: {e}")
+    if with_csv:
+        write_csv(rows, stem + "_enriched.csv")
+        print(f"[EXPORTED] {len(rows)} records -> {stem}_enriched.csv")
+
+    missing = sum(1 for r in rows if r["enrichError"])
+    if missing:
+        print(f"[WARN] {missing} records without details - re-run with --retry-failed to try them again")
+    return out_path
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print(__doc__)
+        return
+
+    concurrency = 8
+    for arg in sys.argv[1:]:
+        if arg.startswith("--concurrency="):
+            concurrency = int(arg.split("=", 1)[1])
+
+    for path in args:
+        enrich_export(path, concurrency=concurrency, retry_failed="--retry-failed" in sys.argv,
+                      with_csv="--csv" in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+AIHUISHOU SCRAPE EVENTS
+Typed progress events for DeepScraper, delivered live to pluggable subscribers
+
+Subscribers are plain callables taking an Event:
+    - any function / lambda              (callback)
+    - QueueSubscriber(asyncio.Queue)     (async consumers, thread-safe)
+    - JsonlSubscriber("run.jsonl")       (one JSON object per line)
+
+Usage:
+    scraper = DeepScraper()
+    scraper.events.subscribe(lambda e: print(e.type, e.counts))
+    scraper.events.subscribe(JsonlSubscriber("logs/run.jsonl"))
+"""
+
+import json
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+
+class EventType:
+    RUN_STARTED = "run_started"
+    RUN_FINISHED = "run_finished"
+    BRAND_STARTED = "brand_started"
+    BRAND_FINISHED = "brand_finished"
+    COLLECTION_FOUND = "collection_found"
+    PAGE_FETCHED = "page_fetched"
+    PRODUCTS_ADDED = "products_added"
+    ERROR = "error"
+    RETRY = "retry"
+
+
+@dataclass
+class Event:
+    type: str
+    ts: float = field(default_factory=time.time)
+    data: Dict = field(default_factory=dict)
+    counts: Dict = field(default_factory=dict)  # snapshot of scraper stats
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class EventBus:
+    """Fan-out of events to subscribers - a failing subscriber never breaks the scrape"""
+
+    def __init__(self):
+        self.subscribers: List[Callable[[Event], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscriber: Callable[[Event], None]) -> Callable[[], None]:
+        """Add a subscriber, return a function that removes it"""
+        with self._lock:
+            self.subscribers.append(subscriber)
+
+        def unsubscribe():
+            with self._lock:
+                if subscriber in self.subscribers:
+                    self.subscribers.remove(subscriber)
+        return unsubscribe
+
+    def emit(self, event_type: str, counts: Optional[Dict] = None, **data) -> Event:
+        event = Event(type=event_type, data=data, counts=dict(counts or {}))
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber(event)
+            except Exception:
+                pass
+        return event
+
+
+class QueueSubscriber:
+    """Put events on an asyncio.Queue (safe to emit from any thread)"""
+
+    def __init__(self, queue: asyncio.Queue, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.queue = queue
+        self.loop = loop or asyncio.get_event_loop()
+
+    def __call__(self, event: Event):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.queue.put_nowait(event)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+
+class JsonlSubscriber:
+    """Append events to a JSONL file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event):
+        line = json.dumps(event.to_dict(), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
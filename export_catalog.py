@@ -0,0 +1,210 @@
+"""
+AIHUISHOU EXPORT CATALOG
+SQLite catalog of export files (exports/*.json) with per-file metadata worked
+out once, so listing exports never opens a JSON file or stats the directory.
+
+- One row per file: size, mtime, item / brand / series counts, category,
+  scrape duration, source URL and a sha256 of the content
+- Filled by app.auto_export() as each export is written
+- backfill() records files written before the catalog existed (or changed
+  since) and drops rows whose file is gone; sync() runs it only when the
+  directory's mtime moved (a file was added, removed or renamed), so it is
+  cheap enough to call before every listing
+
+Usage:
+    python export_catalog.py --backfill     # sync the catalog with exports/
+    python export_catalog.py                # list what is catalogued
+
+    catalog = get_export_catalog()
+    catalog.record("exports/deep_scrape_20251224_135557.json", data, url=url, duration=241.3)
+    catalog.list()
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from config import EXPORT_CATALOG
+
+COLUMNS = ("name", "prefix", "size", "mtime", "created", "items", "brands", "series",
+           "category", "duration", "url", "sha256")
+
+
+def _products(data: Any) -> List[Dict]:
+    if isinstance(data, dict):
+        data = data.get("products", [])
+    return [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+
+
+def _distinct(products: List[Dict], *keys: str) -> int:
+    values = set()
+    for item in products:
+        for key in keys:
+            if item.get(key):
+                values.add(item[key])
+                break
+    return len(values)
+
+
+def _category(products: List[Dict], url: Optional[str]) -> Optional[str]:
+    """Category the export covers: resolved from the scrape URL, else from the products"""
+    if url:
+        from result_cache import normalize_url
+        norm = normalize_url(url)
+        if norm["category"] or norm["category_id"]:
+            return norm["category"] or str(norm["category_id"])
+    ids = {item.get("categoryId") for item in products if item.get("categoryId")}
+    return ",".join(str(i) for i in sorted(ids)) if ids else None
+
+
+class ExportCatalog:
+    """exports table in SQLite (thread-safe)"""
+
+    def __init__(self, path: str = EXPORT_CATALOG["path"], directory: str = EXPORT_CATALOG["dir"]):
+        self.path = path
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._synced_mtime: Optional[int] = None  # export directory mtime at the last sync()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS exports (
+                    name TEXT PRIMARY KEY,
+                    prefix TEXT,
+                    size INTEGER,
+                    mtime REAL,
+                    created REAL,
+                    items INTEGER,
+                    brands INTEGER,
+                    series INTEGER,
+                    category TEXT,
+                    duration REAL,
+                    url TEXT,
+                    sha256 TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS exports_mtime ON exports (mtime)")
+
+    def record(self, path: str, data: Any = None, url: Optional[str] = None,
+               duration: Optional[float] = None) -> Dict:
+        """Catalog one export; data is parsed from the file when not given"""
+        with open(path, "rb") as f:
+            raw = f.read()
+        if data is None:
+            data = json.loads(raw.decode("utf-8"))
+        stat = os.stat(path)
+        products = _products(data)
+        name = os.path.basename(path)
+        row = {
+            "name": name,
+            "prefix": name.rsplit("_", 2)[0] if name.count("_") >= 2 else os.path.splitext(name)[0],
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "created": time.time(),
+            "items": len(products),
+            "brands": _distinct(products, "brand", "brandName"),
+            "series": _distinct(products, "series", "seriesName"),
+            "category": _category(products, url),
+            "duration": round(duration, 1) if duration is not None else None,
+            "url": url,
+            "sha256": hashlib.sha256(raw).hexdigest(),
+        }
+        with self._lock, self.conn:
+            self.conn.execute(f"INSERT OR REPLACE INTO exports ({', '.join(COLUMNS)}) "
+                              f"VALUES ({', '.join('?' for _ in COLUMNS)})", [row[c] for c in COLUMNS])
+        return row
+
+    def list(self, limit: Optional[int] = None) -> List[Dict]:
+        """Newest first"""
+        query = "SELECT * FROM exports ORDER BY mtime DESC" + (" LIMIT ?" if limit else "")
+        with self._lock:
+            rows = self.conn.execute(query, (limit,) if limit else ()).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM exports WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def remove(self, name: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM exports WHERE name = ?", (name,))
+
+    def backfill(self) -> Dict[str, int]:
+        """Record new / changed files of the export directory, drop rows of deleted ones"""
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+        known = {row["name"]: row for row in self.list()}
+        names = set()
+        if os.path.isdir(self.directory):
+            names = {n for n in os.listdir(self.directory) if n.endswith(".json")}
+        for name in sorted(names):
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            row = known.get(name)
+            if row and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime:
+                stats["unchanged"] += 1
+                continue
+            try:
+                self.record(path, url=row["url"] if row else None, duration=row["duration"] if row else None)
+            except (OSError, ValueError, TypeError) as e:  # TypeError: unhashable brand / series values
+                print(f"[CATALOG] Skipped {name}: {e}")
+                stats["failed"] += 1
+                continue
+            stats["updated" if row else "added"] += 1
+        for name in set(known) - names:
+            self.remove(name)
+            stats["removed"] += 1
+        return stats
+
+    def sync(self) -> Optional[Dict[str, int]]:
+        """backfill() if files were added / removed in the directory since the last sync, else None"""
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if mtime == self._synced_mtime:
+                return None
+            self._synced_mtime = mtime
+        return self.backfill()
+
+    def covers(self, path: str) -> bool:
+        """Whether a file lives in the catalogued directory"""
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.directory)
+
+
+_catalog: Optional[ExportCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_export_catalog() -> ExportCatalog:
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ExportCatalog()
+        return _catalog
+
+
+def main():
+    catalog = get_export_catalog()
+    if "--backfill" in sys.argv:
+        start = time.time()
+        stats = catalog.backfill()
+        print(f"[CATALOG] {stats} in {time.time() - start:.1f}s -> {catalog.path}")
+        return
+    for row in catalog.list():
+        print(f"  {row['name']:<40} {row['items']:>6} items {row['brands']:>4} brands {row['series']:>5} series"
+              f"  {row['category'] or '-':<10} {row['duration'] or '-':>7}s  {row['sha256'][:12]}")
+
+
+if __name__ == "__main__":
+    main()
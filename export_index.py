@@ -0,0 +1,156 @@
+"""
+AIHUISHOU EXPORT INDEX
+Server-side paging, filtering and sorting over export files (exports/*.json),
+so the data viewer never downloads a whole export.
+
+- One in-memory index per file: rows + lowercased search text, brand / series
+  buckets and sort orders (built on first use), rebuilt when the file's
+  mtime or size changes
+- Deep-scrape exports (brand / series / productName) and single-page scrapes
+  (name / seriesName) are both understood
+- At most EXPORT_INDEX["files"] indexes are kept (least recently used dropped)
+
+Usage:
+    page = query_export("exports/deep_scrape_20251224_135557.json",
+                        q="rolex", brand="劳力士", sort="-productName", offset=0, limit=50)
+    page["total"], page["rows"]
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional
+
+from config import EXPORT_INDEX
+
+# Field -> the keys it may appear under, first present wins
+ALIASES = {
+    "brand": ("brand", "brandName"),
+    "series": ("series", "seriesName"),
+    "productName": ("productName", "name", "title"),
+    "productId": ("productId", "id"),
+}
+
+
+def field_of(item: Dict, field: str) -> Any:
+    for key in ALIASES.get(field, (field,)):
+        value = item.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def load_rows(path: str) -> List[Dict]:
+    """Products of an export file ({"products": [...]} or a bare list)"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("products", [])
+    return [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+
+
+class ExportIndex:
+    """Rows of one export file plus what filtering / sorting them needs"""
+
+    def __init__(self, path: str):
+        stat = os.stat(path)
+        self.path = path
+        self.signature = (stat.st_mtime, stat.st_size)
+        self.rows = load_rows(path)
+        self.text = [" ".join(str(v) for v in row.values() if v is not None).lower() for row in self.rows]
+        self.by_brand: Dict[str, List[int]] = defaultdict(list)
+        self.by_series: Dict[str, List[int]] = defaultdict(list)
+        for i, row in enumerate(self.rows):
+            self.by_brand[str(field_of(row, "brand") or "").lower()].append(i)
+            self.by_series[str(field_of(row, "series") or "").lower()].append(i)
+        self._orders: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict:
+        return {
+            "products": len(self.rows),
+            "brands": sum(1 for brand in self.by_brand if brand),
+            "series": sum(1 for series in self.by_series if series),
+        }
+
+    def order(self, sort: str) -> List[int]:
+        """Row positions sorted by a field ("-field" = descending), empty values last"""
+        with self._lock:
+            if sort not in self._orders:
+                field = sort.lstrip("-")
+                keyed = [(field_of(row, field), i) for i, row in enumerate(self.rows)]
+                present = [(value, i) for value, i in keyed if value is not None]
+                missing = [i for value, i in keyed if value is None]
+                numeric = all(isinstance(value, (int, float)) for value, _ in present)
+                present.sort(key=lambda pair: pair[0] if numeric else str(pair[0]).lower(),
+                             reverse=sort.startswith("-"))
+                self._orders[sort] = [i for _, i in present] + missing
+            return self._orders[sort]
+
+    def query(self, q: str = "", brand: str = "", series: str = "", sort: str = "",
+              offset: int = 0, limit: int = EXPORT_INDEX["page_size"]) -> Dict:
+        positions: Optional[List[int]] = None
+        if brand:
+            positions = self.by_brand.get(brand.lower(), [])
+        if series:
+            in_series = self.by_series.get(series.lower(), [])
+            positions = in_series if positions is None else sorted(set(positions) & set(in_series))
+        if positions is None:
+            positions = range(len(self.rows))
+        if q:
+            q = q.lower()
+            positions = [i for i in positions if q in self.text[i]]
+
+        if sort:
+            wanted = set(positions)
+            positions = [i for i in self.order(sort) if i in wanted]
+        else:
+            positions = list(positions)
+
+        limit = max(1, min(limit, EXPORT_INDEX["max_page_size"]))
+        offset = max(0, offset)
+        return {
+            "total": len(positions),
+            "offset": offset,
+            "limit": limit,
+            "rows": [self.rows[i] for i in positions[offset:offset + limit]],
+        }
+
+    def facets(self, limit: int = 500) -> Dict[str, List[Dict]]:
+        """Brand / series values with row counts, largest first"""
+        def top(buckets, field):
+            names = {}
+            for key, positions in buckets.items():
+                if key:
+                    names[key] = (field_of(self.rows[positions[0]], field), len(positions))
+            ordered = sorted(names.values(), key=lambda pair: -pair[1])[:limit]
+            return [{"value": value, "count": count} for value, count in ordered]
+
+        return {"brands": top(self.by_brand, "brand"), "series": top(self.by_series, "series")}
+
+
+_indexes: "OrderedDict[str, ExportIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_export_index(path: str) -> ExportIndex:
+    """Cached index for a file, rebuilt when its mtime / size changed"""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and index.signature == (stat.st_mtime, stat.st_size):
+            _indexes.move_to_end(key)
+            return index
+    index = ExportIndex(path)  # built outside the lock - large files take a moment
+    with _indexes_lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > EXPORT_INDEX["files"]:
+            _indexes.popitem(last=False)
+    return index
+
+
+def query_export(path: str, **kwargs) -> Dict:
+    return get_export_index(path).query(**kwargs)
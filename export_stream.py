@@ -0,0 +1,204 @@
+"""
+AIHUISHOU STREAMED TABLE EXPORT
+CSV / XLSX downloads of an export file with the UI's column config (which
+fields, in which order, under which header), written row by row so memory
+stays flat however many rows there are.
+
+- CSV: csv.writer quoting (commas, quotes and newlines survive), UTF-8 BOM so
+  Excel picks the encoding, flushed in small batches
+- XLSX: openpyxl write-only workbook (rows go straight to a temp file), sent
+  in chunks once the workbook is closed
+- Rows are read from the export file incrementally (open_rows), one product
+  at a time, so the file is never loaded whole
+
+Usage:
+    columns = resolve_columns([{"field": "序号", "header": "#", "isIndex": True},
+                               {"field": "brand", "header": "Brand"}])
+    Response(iter_table(open_rows("exports/deep_scrape_20251224_135557.json"), columns, "csv"),
+             mimetype="text/csv")
+"""
+
+import io
+import os
+import csv
+import json
+import tempfile
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List
+
+BATCH_ROWS = 500
+CHUNK_SIZE = 64 * 1024
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class _JsonReader:
+    """Just enough of a pull parser to walk an export file value by value"""
+
+    def __init__(self, f):
+        self.f = f
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        if self.pos > CHUNK_SIZE:  # drop what was consumed
+            self.buf, self.pos = self.buf[self.pos:], 0
+        chunk = self.f.read(CHUNK_SIZE)
+        self.eof = not chunk
+        self.buf += chunk
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end of the file)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the buffered text")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A value running into the end of the buffer (e.g. a number) may continue in the next read
+                if end < len(self.buf) or not self._fill():
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def array(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            self.expect(",")
+
+
+def iter_rows(path: str) -> Iterator[Dict]:
+    """Products of an export file ({"products": [...]} or a bare list), parsed one at a time"""
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _JsonReader(f)
+        first = reader.peek()
+        if first == "[":
+            items = reader.array()
+        elif first == "{":
+            items = iter(())
+            reader.expect("{")
+            while reader.peek() != "}":
+                key = reader.value()
+                reader.expect(":")
+                if key == "products" and reader.peek() == "[":
+                    items = reader.array()
+                    break
+                reader.value()  # other top-level values ("source", ...) are small - skip them
+                if reader.peek() != "}":
+                    reader.expect(",")
+        else:
+            raise ValueError(f"Not a JSON export: {os.path.basename(path)}")
+        for item in items:
+            if isinstance(item, dict):
+                yield item
+
+
+def open_rows(path: str) -> Iterator[Dict]:
+    """iter_rows() with the first row already read, so a missing / corrupt file raises here
+    (before a response has started) rather than halfway through the download"""
+    rows = iter_rows(path)
+    first = next(rows, None)
+    return chain([first], rows) if first is not None else iter(())
+
+
+def resolve_columns(columns: Any) -> List[Dict]:
+    """Enabled columns in order as {"field", "header", "isIndex"}; ValueError when none are usable"""
+    if not isinstance(columns, list):
+        raise ValueError("columns must be a list")
+    resolved = []
+    for col in columns:
+        if not isinstance(col, dict) or not col.get("field") or col.get("enabled") is False:
+            continue
+        resolved.append({
+            "field": str(col["field"]),
+            "header": str(col.get("header") or col["field"]),
+            "isIndex": bool(col.get("isIndex")),
+        })
+    if not resolved:
+        raise ValueError("No columns selected")
+    return resolved
+
+
+def cell(item: Dict, col: Dict, position: int) -> Any:
+    if col["isIndex"]:
+        return position + 1
+    value = item.get(col["field"])
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def iter_csv(rows: Iterable[Dict], columns: List[Dict]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # BOM - Excel opens UTF-8 CSVs correctly
+    writer.writerow([col["header"] for col in columns])
+    for position, item in enumerate(rows):
+        writer.writerow([cell(item, col, position) for col in columns])
+        if (position + 1) % BATCH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx(rows: Iterable[Dict], columns: List[Dict], title: str = "Products") -> Iterator[bytes]:
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def clean(value):
+        return ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([clean(col["header"]) for col in columns])
+    for position, item in enumerate(rows):
+        sheet.append([clean(cell(item, col, position)) for col in columns])
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def iter_table(rows: Iterable[Dict], columns: List[Dict], fmt: str) -> Iterator[bytes]:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    return iter_csv(rows, columns) if fmt == "csv" else iter_xlsx(rows, columns)
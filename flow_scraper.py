@@ -13,10 +13,14 @@ import asyncio
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Any
+from config import SITE_URL, SITE_DOMAIN, is_api_url
+from rate_limiter import limit_context
 
 # Fix encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 class FlowScraper:
@@ -43,12 +47,13 @@ class FlowScraper:
                 viewport={"width": 375, "height": 812},
                 locale="zh-CN"
             )
+            await limit_context(context)
             
             # Set cookies
             await context.add_cookies([{
                 "name": "chosenCity",
                 "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-                "domain": "m.aihuishou.com",
+                "domain": SITE_DOMAIN,
                 "path": "/"
             }])
             
@@ -59,7 +64,7 @@ class FlowScraper:
             
             try:
                 # Step 1: Go to Phones category (frontCategoryId=6)
-                category_url = f"https://m.aihuishou.com/n/#/category?frontCategoryId=6"
+                category_url = f"{SITE_URL}/n/#/category?frontCategoryId=6"
                 print(f"\n[STEP 1] Loading phones category...")
                 print(f"[URL] {category_url}")
                 await page.goto(category_url, timeout=30000)
@@ -159,7 +164,7 @@ class FlowScraper:
     async def _handle_response(self, response):
         """Capture API responses"""
         url = response.url
-        if "dubai.aihuishou.com" not in url:
+        if not is_api_url(url):
             return
         
         try:
@@ -13,23 +13,15 @@ import json
 import asyncio
 from datetime import datetime
 from typing import Dict, List, Any
+from category_map import get_top_level_categories
+from config import SITE_URL, SITE_DOMAIN, is_api_url
+from rate_limiter import limit_context
 
 # Fix encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
-
-
-# Category IDs to scrape
-CATEGORIES = {
-    6: "Phones",
-    7: "Laptops", 
-    8: "Tablets",
-    10: "Cameras",
-    107: "Shoes",
-    108: "Clothes",
-    206: "Bags",
-    144: "Watches",
-}
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 class FullScraper:
@@ -56,24 +48,28 @@ class FullScraper:
                 viewport={"width": 375, "height": 812},
                 locale="zh-CN"
             )
+            await limit_context(context)
             
             await context.add_cookies([{
                 "name": "chosenCity",
                 "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-                "domain": "m.aihuishou.com",
+                "domain": SITE_DOMAIN,
                 "path": "/"
             }])
             
             page = await context.new_page()
             page.on("response", lambda r: asyncio.create_task(self._capture(r)))
             
-            for cat_id, cat_name in CATEGORIES.items():
+            # Top-level categories from the discovered (cached) category map
+            categories = get_top_level_categories()
+            
+            for cat_id, cat_name in categories.items():
                 print(f"\n[{cat_name}] Category ID: {cat_id}")
                 self.current_category = cat_id
                 self.current_brands = []
                 
                 try:
-                    url = f"https://m.aihuishou.com/n/#/category?frontCategoryId={cat_id}"
+                    url = f"{SITE_URL}/n/#/category?frontCategoryId={cat_id}"
                     await page.goto(url, timeout=60000, wait_until="domcontentloaded")
                     await asyncio.sleep(4)
                     
@@ -103,7 +99,7 @@ class FullScraper:
     
     async def _capture(self, response):
         """Capture brand data from API"""
-        if "dubai.aihuishou.com" not in response.url:
+        if not is_api_url(response.url):
             return
         
         try:
@@ -0,0 +1,198 @@
+"""
+AIHUISHOU HAR RECORD / REPLAY
+Record every response a DeepScraper browser run receives into a HAR file, then
+replay it through Playwright routing - same payloads, same per-response timing
+(optionally scaled) - so benchmark runs do not depend on upstream variance.
+
+- HarRecorder: pages, scripts and API XHRs of every attached BrowserContext
+  (images / fonts / media are skipped), with the time each response took
+- HarReplayer: serves matching requests from the HAR after the recorded delay
+  x scale; unmatched requests are aborted (or sent to the network with
+  miss="network"). Replayed requests still take rate-limiter tokens.
+- Requests are matched on method + URL (cache-buster params dropped) + body;
+  repeated requests are answered in recorded order
+
+Only browser contexts are recorded - the --http engine talks to the API
+directly (use mock_server.py to benchmark it).
+
+Usage:
+    python deep_scraper.py "<category_url>" --record=runs/watches.har
+    python deep_scraper.py "<category_url>" --replay=runs/watches.har [--replay-scale=0.25]
+    python har_replay.py runs/watches.har      # summary of a recording
+"""
+
+import os
+import sys
+import json
+import base64
+import asyncio
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import Dict, List, Optional
+
+from rate_limiter import LIMITED_RESOURCE_TYPES, get_limiter
+from config import is_upstream_url
+
+SKIP_RESOURCE_TYPES = ("image", "font", "media")
+IGNORED_PARAMS = {"_", "_t", "t", "timestamp"}
+# Hop-by-hop / encoding headers that no longer describe the stored (decoded) body
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def request_key(method: str, url: str, body: Optional[str] = None) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if k not in IGNORED_PARAMS))
+    url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, parts.fragment))
+    if body:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            pass
+    return f"{method.upper()} {url} {body or ''}"
+
+
+class HarRecorder:
+    """Collects responses of attached contexts; save() writes a HAR 1.2 file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[Dict] = []
+        self._pending = set()
+
+    async def attach(self, context):
+        def on_finished(request):
+            if request.resource_type in SKIP_RESOURCE_TYPES:
+                return
+            task = asyncio.ensure_future(self._record(request))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+        context.on("requestfinished", on_finished)
+
+    async def _record(self, request):
+        try:
+            response = await request.response()
+            if response is None:
+                return
+            body = await response.body()
+        except Exception:
+            return  # page closed before the body was read
+
+        try:
+            content = {"text": body.decode("utf-8")}
+        except UnicodeDecodeError:
+            content = {"text": base64.b64encode(body).decode("ascii"), "encoding": "base64"}
+        headers = await response.all_headers()
+        content["mimeType"] = headers.get("content-type", "")
+        content["size"] = len(body)
+
+        timing = request.timing
+        elapsed = timing.get("responseEnd", -1)
+        started = timing.get("startTime") or 0
+        self.entries.append({
+            "startedDateTime": datetime.fromtimestamp(started / 1000, timezone.utc).isoformat(),
+            "time": max(elapsed, 0),
+            "_resourceType": request.resource_type,
+            "request": {
+                "method": request.method,
+                "url": request.url,
+                "headers": [],
+                "postData": {"mimeType": "application/json", "text": request.post_data}
+                if request.post_data else None,
+            },
+            "response": {
+                "status": response.status,
+                "statusText": response.status_text,
+                "headers": [{"name": k, "value": v} for k, v in headers.items() if k not in DROP_HEADERS],
+                "content": content,
+            },
+        })
+
+    async def save(self) -> str:
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        self.entries.sort(key=lambda e: e["startedDateTime"])
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"log": {"version": "1.2", "creator": {"name": "aihuishou-deep-scraper", "version": "4"},
+                               "entries": self.entries}}, f, ensure_ascii=False)
+        print(f"[HAR] Recorded {len(self.entries)} responses -> {self.path}")
+        return self.path
+
+
+class HarReplayer:
+    """Answers context requests from a HAR with the recorded timing x scale"""
+
+    def __init__(self, path: str, scale: float = 1.0, miss: str = "abort"):
+        self.path = path
+        self.scale = scale
+        self.miss = miss
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["log"]["entries"]
+        self.entries: Dict[str, deque] = defaultdict(deque)
+        for entry in entries:
+            request = entry["request"]
+            body = (request.get("postData") or {}).get("text")
+            self.entries[request_key(request["method"], request["url"], body)].append(entry)
+        self.stats = {"served": 0, "missed": 0, "delay": 0.0}
+
+    def _next(self, key: str) -> Optional[Dict]:
+        """Recorded answers in order; the last one keeps answering repeats"""
+        queue = self.entries.get(key)
+        if not queue:
+            return None
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    async def attach(self, context):
+        limiter = get_limiter()
+
+        async def handle(route):
+            request = route.request
+            entry = self._next(request_key(request.method, request.url, request.post_data))
+            if entry is None:
+                self.stats["missed"] += 1
+                if self.miss == "network" or not is_upstream_url(request.url):
+                    await route.fallback()
+                else:
+                    await route.abort()
+                return
+
+            # Registered after limit_context(), so this handler runs first - take the token here
+            if request.resource_type in LIMITED_RESOURCE_TYPES and is_upstream_url(request.url):
+                await limiter.acquire_async(request.url)
+            delay = entry["time"] / 1000 * self.scale
+            self.stats["delay"] += delay
+            await asyncio.sleep(delay)
+
+            response = entry["response"]
+            content = response["content"]
+            body = content.get("text") or ""
+            body = base64.b64decode(body) if content.get("encoding") == "base64" else body.encode("utf-8")
+            self.stats["served"] += 1
+            await route.fulfill(status=response["status"], body=body,
+                                headers={h["name"]: h["value"] for h in response["headers"]})
+
+        await context.route("**/*", handle)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        entries = json.load(f)["log"]["entries"]
+    by_type = defaultdict(list)
+    for entry in entries:
+        by_type[entry.get("_resourceType", "?")].append(entry["time"])
+    print(f"[HAR] {sys.argv[1]}: {len(entries)} responses")
+    for resource_type, times in sorted(by_type.items()):
+        times.sort()
+        print(f"  {resource_type:<12} {len(times):>5}  median {times[len(times) // 2]:.0f}ms  "
+              f"total {sum(times) / 1000:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
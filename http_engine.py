@@ -0,0 +1,136 @@
+"""
+AIHUISHOU HTTP ENGINE
+DeepScraper engine that calls the spu-collection / spu-list JSON endpoints
+directly (api_client.ApiClient, pooled keep-alive connections) instead of
+rendering pages.
+
+Used through DeepScraper.scrape_all(url, engine="http"); a unit whose direct
+call is rejected (HTTP error, non-JSON, code != 0) is re-done in the browser.
+With a SessionBroker (engine="hybrid") the calls carry a browser-harvested
+session, refreshed once and retried when a call hits a challenge.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from config import BASE_URL, API_PATHS
+from api_client import ApiClient, ApiError
+from events import EventType
+from pagination import paginate, split_page
+
+
+class DirectApiRejected(Exception):
+    """The upstream refused a direct API call - caller should fall back to the browser"""
+
+
+class HttpEngine:
+    """Direct JSON calls for one DeepScraper (shares its category info, products and stats)"""
+
+    PAGE_SIZE = 20
+    MAX_CONCURRENT = 8    # Pooled connections / in-flight requests
+    PREFETCH_PAGES = 4    # Pages requested at once when the total is unknown
+    MAX_PAGES = 200
+    TIMEOUT = 15
+    RETRIES = 1           # keep low - a rejected unit is re-done in the browser anyway
+
+    def __init__(self, scraper, city_id: Optional[int] = None, broker=None):
+        self.scraper = scraper
+        self.city_id = city_id or scraper.city_id
+        self.client = ApiClient(city_id=self.city_id, broker=broker, max_concurrent=self.MAX_CONCURRENT,
+                                timeout=self.TIMEOUT, retries=self.RETRIES)
+        self.stats = {"requests": 0, "pages": 0, "rejected": 0}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        await self.client.open()
+
+    async def close(self):
+        await self.client.close()
+
+    async def _post(self, path: str, payload: Dict):
+        """POST to a gateway endpoint, return the `data` field or raise DirectApiRejected"""
+        self.stats["requests"] += 1
+        try:
+            return await self.client.call("POST", path, json=payload)
+        except ApiError as e:
+            self.stats["rejected"] += 1
+            raise DirectApiRejected(f"{path}: {e}") from e
+
+    def _base_payload(self, brand: Dict) -> Dict:
+        payload = {
+            "brandId": brand.get("id"),
+            "categoryId": self.scraper.category_id,
+            "frontCategoryId": self.scraper.front_category_id,
+            "bizType": self.scraper.biz_type,
+            "cityId": self.city_id,
+        }
+        return {k: v for k, v in payload.items() if v is not None}
+
+    # ============ BRANDS ============
+    async def get_brands(self) -> List[Dict]:
+        data = await self._post(API_PATHS["brands"], {
+            "frontCategoryId": self.scraper.front_category_id,
+            "cityId": self.city_id,
+        })
+        items = data.get("brands", []) if isinstance(data, dict) else data
+        return [{"id": b.get("id"), "name": b.get("name")} for b in items or [] if isinstance(b, dict)]
+
+    # ============ COLLECTIONS ============
+    async def get_collections(self, brand: Dict) -> List[Dict]:
+        data = await self._post(API_PATHS["spu_collection"], self._base_payload(brand))
+        return self.scraper.parse_collections(data)
+
+    # ============ PRODUCTS ============
+    async def _fetch_page(self, brand: Dict, collection: Optional[Dict], page: int):
+        payload = self._base_payload(brand)
+        if collection:
+            payload["collectionId"] = collection.get("collectionId")
+            payload["seriesCode"] = collection.get("seriesCode", "")
+        payload["pageIndex"] = page
+        payload["pageSize"] = self.PAGE_SIZE
+
+        data = await self._post(API_PATHS["spu_list"], payload)
+        self.stats["pages"] += 1
+        return split_page(data)
+
+    async def scrape_products(self, brand: Dict, collection: Optional[Dict] = None) -> int:
+        """All pages of one brand/collection - first page alone, then PREFETCH_PAGES at a time"""
+        url = f"{BASE_URL}{API_PATHS['spu_list']}"
+        added = 0
+
+        async def fetch(page):
+            return await self._fetch_page(brand, collection, page)
+
+        async for items in paginate(fetch, self.PAGE_SIZE, concurrency=self.PREFETCH_PAGES,
+                                    max_pages=self.MAX_PAGES):
+            added += self.scraper.add_products(items, brand, collection, self.city_id, url=url)
+
+        return added
+
+    async def scrape_brand(self, brand: Dict) -> int:
+        """Same 3-level / 4-level detection as the browser engine"""
+        collections = await self.get_collections(brand)
+        self.scraper.stats["collections"] += len(collections)
+        if collections:
+            self.scraper.events.emit(EventType.COLLECTION_FOUND, counts=self.scraper.stats,
+                                     brand=brand.get("name"), brandId=brand.get("id"),
+                                     collections=len(collections))
+
+        if not collections:
+            return await self.scrape_products(brand)
+
+        tasks = [asyncio.ensure_future(self.scrape_products(brand, c)) for c in collections]
+        try:
+            return sum(await asyncio.gather(*tasks))
+        finally:
+            # One rejected collection sends the whole brand to the browser - stop the siblings
+            # instead of letting them keep taking rate-limit tokens
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
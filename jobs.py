@@ -0,0 +1,300 @@
+"""
+AIHUISHOU BACKGROUND JOBS
+Deep scrapes run on a background executor instead of inside a Flask request.
+
+- submit() returns a job id straight away; the scrape runs on the shared loop
+  thread (loop_thread.py), a worker thread per job waits for it
+- Live progress from the scraper's EventBus (counts, brands done, recent events)
+- Identical deep scrapes (same cache key: normalized URL + engine) submitted while
+  one is queued or running attach to it instead of starting another run
+- cancel() stops a queued or running job (partial products are still exported);
+  detach() lets one of several attached callers leave a shared job
+- Job state is persisted to jobs/<id>.json, results to the export file, so both
+  survive a restart (jobs running or queued at shutdown are marked "interrupted")
+
+Usage:
+    manager = get_job_manager(export=auto_export)
+    job_id, attached = manager.submit("https://m.aihuishou.com/n/#/category?frontCategoryId=6",
+                                      cache_key="deep:browser:category=6&city=1")
+    manager.get(job_id)["progress"]
+    manager.result(job_id)       # {"products": [...]} once done
+    manager.cancel(job_id)
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import JOBS
+from category_map import get_category_map
+from events import Event, EventType
+from loop_thread import get_loop_thread
+from result_cache import get_result_cache
+
+FINISHED = ("done", "failed", "cancelled", "interrupted")
+ENGINES = ("browser", "http", "hybrid")
+
+
+@dataclass
+class Job:
+    id: str
+    url: str
+    engine: str = "browser"
+    status: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    progress: Dict = field(default_factory=dict)
+    events: List[Dict] = field(default_factory=list)
+    product_count: int = 0
+    result_file: Optional[str] = None
+    error: Optional[str] = None
+    cache_key: Optional[str] = None
+    attached: int = 0   # later identical submissions sharing this run
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        end = self.finished or time.time()
+        data["elapsed"] = round(end - self.started, 1) if self.started else 0
+        return data
+
+
+class JobManager:
+    """Runs deep-scrape jobs on the shared loop; the thread pool bounds how many run at once"""
+
+    def __init__(self, export: Optional[Callable] = None, workers: int = JOBS["workers"],
+                 directory: str = JOBS["dir"]):
+        self.export = export
+        self.directory = directory
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.jobs: Dict[str, Job] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled = set()
+        self._inflight: Dict[str, str] = {}   # cache key -> queued/running job id
+        self.stats = {"submitted": 0, "attached": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # ============ PERSISTENCE ============
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: Job):
+        with self._lock:
+            data = job.to_dict()
+        tmp = self._path(job.id) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._path(job.id))
+
+    def _load(self):
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                data.pop("elapsed", None)
+                job = Job(**data)
+            except (OSError, ValueError, TypeError):
+                continue
+            if job.status not in FINISHED:
+                job.status = "interrupted"
+                job.error = "Server restarted while the job was running"
+                job.finished = job.finished or time.time()
+                self._save(job)
+            self.jobs[job.id] = job
+        self._prune()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond JOBS["keep"]"""
+        finished = sorted((j for j in self.jobs.values() if j.status in FINISHED), key=lambda j: j.created)
+        for job in finished[:max(0, len(self.jobs) - JOBS["keep"])]:
+            self.jobs.pop(job.id, None)
+            try:
+                os.remove(self._path(job.id))
+            except OSError:
+                pass
+
+    # ============ API ============
+    def submit(self, url: str, engine: str = "browser", cache_key: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Queue a deep scrape -> (job id, attached). With a cache_key, a queued/running job
+        for the same key is reused (attached=True); a completed run is stored in the
+        result cache under that key.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        with self._lock:
+            running = self.jobs.get(self._inflight.get(cache_key)) if cache_key else None
+            if running is not None and running.status not in FINISHED:
+                running.attached += 1
+                self.stats["attached"] += 1
+                job, attached = running, True
+            else:
+                job, attached = Job(id=uuid.uuid4().hex[:12], url=url, engine=engine, cache_key=cache_key), False
+                self.jobs[job.id] = job
+                if cache_key:
+                    self._inflight[cache_key] = job.id
+                self.stats["submitted"] += 1
+                self._prune()
+        self._save(job)
+        if attached:
+            print(f"[JOB] {job.id} attached ({job.attached} extra caller(s)): {cache_key}")
+        else:
+            self.executor.submit(self._run, job)
+        return job.id, attached
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            return job.to_dict()
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        jobs = sorted(self.jobs.values(), key=lambda j: j.created, reverse=True)[:limit]
+        with self._lock:
+            return [{k: v for k, v in j.to_dict().items() if k != "events"} for j in jobs]
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        """{"products": [...]} of a finished job (read back from its export file)"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in FINISHED:
+            return None
+        if not job.result_file or not os.path.exists(job.result_file):
+            return {"products": []}
+        with open(job.result_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {"products": data}
+
+    def detach(self, job_id: str) -> bool:
+        """One caller of a shared job leaves it; False when nobody else is attached (cancel instead)"""
+        job = self.jobs.get(job_id)
+        with self._lock:
+            if job is None or job.status in FINISHED or job.attached == 0:
+                return False
+            job.attached -= 1
+        self._save(job)
+        print(f"[JOB] {job.id} detached ({job.attached} extra caller(s) left)")
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        with self._lock:
+            if job.status in FINISHED:
+                return False
+            if job.status == "queued":
+                # Never started - the worker skips it
+                job.status = "cancelled"
+                job.finished = time.time()
+                if self._inflight.get(job.cache_key) == job.id:
+                    del self._inflight[job.cache_key]
+                running = None
+            else:
+                self._cancelled.add(job_id)
+                running = self._running.get(job_id)
+        if running:
+            get_loop_thread().loop.call_soon_threadsafe(running.cancel)
+        self._save(job)
+        return True
+
+    # ============ WORKER ============
+    def _on_event(self, job: Job, event: Event):
+        with self._lock:
+            progress = job.progress
+            progress["counts"] = event.counts
+            if event.type == EventType.BRAND_STARTED:
+                progress["brand"] = event.data.get("brand")
+            elif event.type == EventType.BRAND_FINISHED:
+                progress["brands_done"] = progress.get("brands_done", 0) + 1
+            total = event.counts.get("brands") or 0
+            if total:
+                progress["percent"] = round(100 * progress.get("brands_done", 0) / total, 1)
+            if event.type != EventType.PAGE_FETCHED:  # pages are too chatty for the log
+                job.events = (job.events + [{"type": event.type, "ts": event.ts, **event.data}])[-JOBS["events"]:]
+
+    async def _scrape(self, job: Job, scraper):
+        with self._lock:
+            task = self._running[job.id] = asyncio.current_task()
+            if job.id in self._cancelled:  # cancel() came before the task existed
+                task.cancel()
+        try:
+            await scraper.scrape_all(job.url, headless=True, engine=job.engine)
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+
+    def _run(self, job: Job):
+        from deep_scraper import DeepScraper
+
+        with self._lock:
+            if job.status in FINISHED:  # cancelled while queued
+                return
+            job.status = "running"
+            job.started = time.time()
+
+        # A stale category map is re-discovered with blocking calls - do it here, off the
+        # shared loop (on the loop it is skipped and the stale map / seeds are used)
+        get_category_map()
+
+        scraper = DeepScraper()
+        scraper.events.subscribe(lambda event: self._on_event(job, event))
+        loop_thread = get_loop_thread()
+        status, error = "done", None
+        try:
+            future = loop_thread.submit(self._scrape(job, scraper))
+            self._save(job)
+            future.result()
+        except (CancelledError, asyncio.CancelledError):
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", str(e)
+        if status != "done" and loop_thread.stopping:
+            status, error = "interrupted", "Server shut down while the job was running"
+        self._finish(job, status, scraper.products, error)
+
+    def _finish(self, job: Job, status: str, products: List[Dict], error: Optional[str] = None):
+        if products and self.export:
+            started = job.started or job.created
+            job.result_file = self.export({"products": products}, "deep_scrape", url=job.url,
+                                          duration=time.time() - started)
+        cache = get_result_cache()
+        if status == "done" and products and job.cache_key and cache:
+            result = {"products": products}
+            if job.result_file:
+                result["export"] = os.path.basename(job.result_file)  # lets /api/export find it again
+            cache.put(job.cache_key, result)
+        with self._lock:
+            job.status = status
+            job.error = error
+            job.product_count = len(products)
+            job.finished = time.time()
+            self._cancelled.discard(job.id)
+            if self._inflight.get(job.cache_key) == job.id:
+                del self._inflight[job.cache_key]
+        self._save(job)
+        print(f"[JOB] {job.id} {status}: {job.product_count} products in {job.to_dict()['elapsed']}s"
+              + (f" ({error})" if error else ""))
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager(export: Optional[Callable] = None) -> JobManager:
+    """Process-wide manager (export: function(data, prefix, url=, duration=) -> file path, e.g. app.auto_export)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(export=export)
+        return _manager
@@ -0,0 +1,125 @@
+"""
+AIHUISHOU JSON STREAMING
+Chunked, compressed JSON / NDJSON responses for large Flask payloads, so a
+scrape result or export is encoded and sent piece by piece instead of being
+built as one string first.
+
+- JSON is encoded incrementally (JSONEncoder.iterencode) into ~64KB chunks
+- NDJSON (?format=ndjson or Accept: application/x-ndjson): one item per line
+- Content-Encoding negotiated from Accept-Encoding: br (when the optional
+  brotli package is installed), then gzip, else identity
+- Every streamed response carries stream_stats (raw / sent bytes), logged
+  by app.after_request once the body has gone out
+
+Usage:
+    return stream_json(result, items=result["products"])   # items: NDJSON lines
+"""
+
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from flask import Response, request
+
+from config import STREAMING
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only
+    brotli = None
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+class StreamStats:
+    """Bytes before / after compression of one streamed response"""
+
+    def __init__(self, encoding: Optional[str], fmt: str):
+        self.encoding = encoding
+        self.format = fmt
+        self.raw = 0
+        self.sent = 0
+        self.chunks = 0
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def wants_ndjson() -> bool:
+    return request.args.get("format") == "ndjson" or NDJSON_MIMETYPE in request.headers.get("Accept", "")
+
+
+def _chunked(pieces: Iterable[str], size: int) -> Iterator[bytes]:
+    """Join small encoder pieces into ~size-byte UTF-8 chunks"""
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer).encode("utf-8")
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def iter_json(obj: Any) -> Iterator[str]:
+    return json.JSONEncoder(ensure_ascii=False).iterencode(obj)
+
+
+def iter_ndjson(items: Iterable[Any]) -> Iterator[str]:
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    for item in items:
+        yield encoder.encode(item)
+        yield "\n"
+
+
+def _compressed(chunks: Iterator[bytes], stats: StreamStats) -> Iterator[bytes]:
+    if stats.encoding == "br":
+        compressor = brotli.Compressor(quality=STREAMING["brotli_quality"])
+        compress, flush = compressor.process, compressor.finish
+    elif stats.encoding == "gzip":
+        compressor = zlib.compressobj(STREAMING["gzip_level"], zlib.DEFLATED, 31)  # 31 = gzip container
+        compress, flush = compressor.compress, compressor.flush
+    else:
+        compress, flush = None, None
+
+    for chunk in chunks:
+        stats.raw += len(chunk)
+        out = compress(chunk) if compress else chunk
+        if out:
+            stats.sent += len(out)
+            stats.chunks += 1
+            yield out
+    if flush:
+        out = flush()
+        if out:
+            stats.sent += len(out)
+            stats.chunks += 1
+            yield out
+
+
+def stream_json(obj: Any, items: Optional[Iterable[Any]] = None, status: int = 200,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Streamed response for obj. When the client asks for NDJSON and `items` is
+    given (e.g. the products list), those items are sent one per line instead.
+    """
+    ndjson = items is not None and wants_ndjson()
+    stats = StreamStats(negotiate_encoding(request.headers.get("Accept-Encoding", "")),
+                        "ndjson" if ndjson else "json")
+    pieces = iter_ndjson(items) if ndjson else iter_json(obj)
+    response = Response(_compressed(_chunked(pieces, STREAMING["chunk_size"]), stats), status=status,
+                        mimetype=NDJSON_MIMETYPE if ndjson else "application/json")
+    response.headers["Vary"] = "Accept-Encoding"
+    if stats.encoding:
+        response.headers["Content-Encoding"] = stats.encoding
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    response.stream_stats = stats
+    return response
@@ -0,0 +1,165 @@
+"""
+AIHUISHOU LOOKUP SERVICE
+Single-product lookup in tiers:
+  1. HTTP  - quick-inquiry through api_client (milliseconds)
+  2. Browser - warm browser_pool context, only when HTTP fails or the payload
+     is incomplete
+
+Every result carries "tier" and "elapsed_ms"; per-tier counts and latency
+percentiles are kept in LookupService.summary(). Both tiers are hedged and
+circuit-broken per endpoint (resilience.py); a hedged browser load takes a
+second pool context. The process-wide service runs on the shared loop thread
+(loop_thread.py) and borrows the shared browser pool.
+
+Usage:
+    service = get_lookup_service()
+    result = service.lookup_sync("https://m.aihuishou.com/n/#/inquiry?productId=43510")
+
+    python lookup_service.py 43510 225358
+"""
+
+import re
+import sys
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from config import API_PATHS, DEFAULT_CITY_ID, SITE_URL, get_cookies, get_headers
+from api_client import ApiClient, ApiError
+from browser_pool import BrowserPool, get_browser_pool
+from loop_thread import get_loop_thread, on_shutdown
+from resilience import get_resilience
+from scraper_browser import get_product_data, parse_product_data
+
+INQUIRY_URL = SITE_URL + "/n/#/inquiry?productId={product_id}"
+BROWSER_ENDPOINT = "BROWSER /n/#/inquiry"
+
+
+def extract_product_id(url_or_id: str) -> Optional[int]:
+    text = str(url_or_id).strip()
+    if text.isdigit():
+        return int(text)
+    match = re.search(r'productId=(\d+)', text) or re.search(r'/product/(\d+)', text)
+    return int(match.group(1)) if match else None
+
+
+def is_complete(result: Dict) -> bool:
+    """HTTP result good enough to skip the browser"""
+    return "error" not in result and bool(result.get("id")) and bool(result.get("name"))
+
+
+class LookupService:
+    """HTTP-first product lookup with a warm-browser fallback (runs on the shared loop thread)"""
+
+    LATENCY_WINDOW = 500
+
+    def __init__(self, city_id: int = DEFAULT_CITY_ID, pool_size: int = 2, headless: bool = True,
+                 pool: Optional[BrowserPool] = None):
+        self.city_id = city_id
+        self.client = ApiClient(city_id=city_id, headers=get_headers(city_id), cookies=get_cookies(city_id))
+        self.owns_pool = pool is None
+        self.pool = pool or BrowserPool(size=pool_size, headless=headless, city_id=city_id)
+        self.resilience = get_resilience()
+        self.stats = {"http": 0, "browser": 0, "failed": 0}
+        self.latencies = {"http": deque(maxlen=self.LATENCY_WINDOW), "browser": deque(maxlen=self.LATENCY_WINDOW)}
+
+    async def _http(self, product_id: int) -> Dict[str, Any]:
+        params = {"cityId": self.city_id, "queryType": 1}
+        try:
+            data = await self.client.call("GET", API_PATHS["quick_inquiry"].format(product_id=product_id),
+                                          params=params)
+        except ApiError as e:
+            return {"error": f"HTTP tier: {e}"}
+        return parse_product_data(data or {})
+
+    async def _browser_once(self, product_id: int) -> Dict[str, Any]:
+        async with self.pool.context() as context:
+            return await get_product_data(INQUIRY_URL.format(product_id=product_id), context=context)
+
+    async def _browser(self, product_id: int) -> Dict[str, Any]:
+        return await self.resilience.run(BROWSER_ENDPOINT, lambda: self._browser_once(product_id),
+                                         failed=lambda result: "error" in result)
+
+    async def lookup(self, url_or_id: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        product_id = extract_product_id(url_or_id)
+        if product_id is None:
+            return {"error": "Cannot extract productId from URL"}
+
+        tier = "http"
+        result = await self._http(product_id)
+        if not is_complete(result):
+            http_error = result.get("error", "incomplete payload")
+            tier = "browser"
+            try:
+                result = await self._browser(product_id)
+            except Exception as e:
+                result = {"error": f"Browser error: {e}"}
+            result.setdefault("fallback_reason", http_error)
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000)
+        if "error" in result:
+            self.stats["failed"] += 1
+        else:
+            self.stats[tier] += 1
+            self.latencies[tier].append(elapsed_ms)
+        result["tier"] = tier
+        result["elapsed_ms"] = elapsed_ms
+        print(f"[LOOKUP] {product_id} via {tier} in {elapsed_ms}ms" + (" (failed)" if "error" in result else ""))
+        return result
+
+    def lookup_sync(self, url_or_id: str, timeout: float = 60) -> Dict[str, Any]:
+        """Blocking lookup for Flask handlers / scripts"""
+        return get_loop_thread().run(self.lookup(url_or_id), timeout)
+
+    def summary(self) -> Dict:
+        def percentile(values, p):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else None
+
+        every = list(self.latencies["http"]) + list(self.latencies["browser"])
+        return {
+            **self.stats,
+            "p50_ms": percentile(every, 0.5),
+            "p95_ms": percentile(every, 0.95),
+            "http_p50_ms": percentile(self.latencies["http"], 0.5),
+            "browser_p50_ms": percentile(self.latencies["browser"], 0.5),
+            "upstream": self.resilience.summary(),
+        }
+
+    async def close(self):
+        if self.owns_pool:
+            await self.pool.close()
+        await self.client.close()
+
+
+_service: Optional[LookupService] = None
+_service_lock = threading.Lock()
+
+
+def get_lookup_service() -> LookupService:
+    """Process-wide service on the shared browser pool, closed with the loop thread"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = LookupService(pool=get_browser_pool())
+            on_shutdown(_service.close)
+        return _service
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python lookup_service.py <productId|url> [...]")
+        return
+    service = get_lookup_service()
+    for item in sys.argv[1:]:
+        result = service.lookup_sync(item)
+        print(f"  {result.get('id')} | {result.get('name')} | {result.get('tier')} | "
+              f"{result.get('elapsed_ms')}ms {result.get('error', '')}")
+    print(service.summary())
+    get_loop_thread().stop()
+
+
+if __name__ == "__main__":
+    main()
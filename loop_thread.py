@@ -0,0 +1,181 @@
+"""
+AIHUISHOU LOOP THREAD
+One long-lived asyncio event loop on a background thread, shared by every
+Flask request, background job and sync client in the process.
+
+- Coroutines are submitted with run_coroutine_threadsafe; run() waits with a
+  timeout and cancels the coroutine when it expires
+- Async resources (browser pool, HTTP sessions) live on this loop for the
+  whole process; on_shutdown() registers their async close()
+- stop() cancels what is still running, runs the shutdown hooks and joins the thread
+  (called automatically at interpreter exit)
+- SingleFlight: identical concurrent calls (same key) share one run and its result
+
+Usage:
+    result = get_loop_thread().run(scrape_url(url), timeout=120)
+    future = get_loop_thread().submit(coro)      # concurrent.futures.Future
+    on_shutdown(pool.close)
+
+    flights = SingleFlight()
+    result, attached = flights.run(cache_key, lambda: scrape_url(url), timeout=120)
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import LOOP_THREAD
+
+
+class LoopThread:
+    """asyncio loop running forever on a daemon thread"""
+
+    def __init__(self, name: str = "event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_forever, name=name, daemon=True)
+        self.stopping = False
+        self._hooks: List[Callable[[], Awaitable]] = []
+        self.stats = {"submitted": 0, "timeouts": 0}
+
+    def _run_forever(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self) -> "LoopThread":
+        self.thread.start()
+        # Before ThreadPoolExecutor workers are joined at exit, so running jobs get cancelled
+        # instead of holding the interpreter open (plain atexit would run after that join)
+        register = getattr(threading, "_register_atexit", None)
+        if register is not None:
+            register(self.stop)
+        else:
+            import atexit
+            atexit.register(self.stop)
+        return self
+
+    def submit(self, coro) -> Future:
+        """Schedule a coroutine on the loop, return a concurrent.futures.Future"""
+        if self.stopping or self.loop.is_closed():
+            coro.close()
+            raise RuntimeError("Event loop thread is shut down")
+        self.stats["submitted"] += 1
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: Optional[float] = LOOP_THREAD["timeout"]) -> Any:
+        """Block until the coroutine finishes; cancel it and raise TimeoutError after `timeout`s"""
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError("LoopThread.run() called on the loop thread - it would block the loop; await instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            future.cancel()
+            raise
+
+    def on_shutdown(self, hook: Callable[[], Awaitable]):
+        """Async callable run on the loop at stop(), latest registered first"""
+        self._hooks.append(hook)
+
+    async def _shutdown(self):
+        # In-flight work first, then the resources it was using
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for hook in reversed(self._hooks):
+            try:
+                await hook()
+            except Exception as e:
+                print(f"[LOOP] Shutdown hook failed: {e}")
+        await self.loop.shutdown_asyncgens()
+
+    def stop(self, timeout: float = LOOP_THREAD["shutdown_timeout"]):
+        if self.stopping or not self.thread.is_alive():
+            return
+        self.stopping = True  # refuse new work while the hooks run
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout)
+        except Exception as e:
+            print(f"[LOOP] Shutdown incomplete: {e!r}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not self.loop.is_running():
+            self.loop.close()
+
+
+class SingleFlight:
+    """In-flight deduplication: a call whose key is already running waits for that run instead"""
+
+    def __init__(self):
+        self.inflight: Dict[str, Dict] = {}   # key -> {"future", "waiters", "attached"}
+        self.stats = {"runs": 0, "attached": 0}
+        self._lock = threading.Lock()
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if key in self.inflight and self.inflight[key]["future"] is future:
+                del self.inflight[key]
+
+    def run(self, key: str, factory: Callable[[], Awaitable],
+            timeout: Optional[float] = LOOP_THREAD["timeout"]) -> Tuple[Any, bool]:
+        """
+        (result, attached): factory() runs on the loop thread unless the same key is
+        already in flight, in which case this call attaches to it (attached=True).
+        A timeout cancels the run only when no other caller is waiting on it.
+        """
+        with self._lock:
+            entry = self.inflight.get(key)
+            attached = entry is not None
+            if attached:
+                entry["attached"] += 1
+                self.stats["attached"] += 1
+            else:
+                entry = self.inflight[key] = {"future": get_loop_thread().submit(factory()),
+                                              "waiters": 0, "attached": 0}
+                self.stats["runs"] += 1
+            entry["waiters"] += 1
+        future = entry["future"]
+        if not attached:
+            future.add_done_callback(lambda done: self._forget(key, done))
+        try:
+            return future.result(timeout), attached
+        except TimeoutError:
+            with self._lock:
+                if entry["waiters"] == 1:
+                    future.cancel()
+            raise
+        finally:
+            with self._lock:
+                entry["waiters"] -= 1
+
+    def attached(self, key: str) -> int:
+        """Callers currently attached to the run for key"""
+        with self._lock:
+            entry = self.inflight.get(key)
+            return entry["attached"] if entry else 0
+
+
+_loop_thread: Optional[LoopThread] = None
+_loop_thread_lock = threading.Lock()
+
+
+def get_loop_thread() -> LoopThread:
+    """Process-wide loop thread, started on first use"""
+    global _loop_thread
+    with _loop_thread_lock:
+        if _loop_thread is None:
+            _loop_thread = LoopThread().start()
+        return _loop_thread
+
+
+def on_loop_thread() -> bool:
+    """True when called on the shared loop's thread (where blocking on it would deadlock)"""
+    return _loop_thread is not None and threading.current_thread() is _loop_thread.thread
+
+
+def on_shutdown(hook: Callable[[], Awaitable]):
+    get_loop_thread().on_shutdown(hook)
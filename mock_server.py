@@ -0,0 +1,405 @@
+"""
+AIHUISHOU MOCK SERVER
+Local stand-in for dubai.aihuishou.com + m.aihuishou.com, for load tests and
+offline throughput measurements.
+
+- dubai-gateway endpoints: brands-v2, spu-collection, spu-list, quick-inquiry,
+  search-by-category (plus the trade-front endpoints used by direct_scraper.py)
+- A minimal SPA shell (/n/#/category, /n/#/inquiry, /p/main/recycle/...) that
+  calls the gateway like the real site, so the Playwright scrapers work too
+- Fixtures: products from exports/*.json, quick-inquiry from aihuishou_inquiry_*.json,
+  brands from brands_*.json (brands only seen in exports get synthetic ids)
+- Injected latency (fixed / uniform / lognormal), error rate and page size
+- GET /__mock/stats: requests, errors and latency per endpoint
+
+Point the scrapers at it with the host overrides in config.py, turn the
+response cache off (or the second run never reaches the server) and lift the
+rate limit if the point is to push load:
+    AIHUISHOU_API_HOST=http://127.0.0.1:8900 AIHUISHOU_SITE_URL=http://127.0.0.1:8900 AIHUISHOU_CACHE=0 \\
+    AIHUISHOU_RATE_LIMIT=200:400 \\
+        python deep_scraper.py "http://127.0.0.1:8900/n/#/category?frontCategoryId=107" --http
+
+Usage:
+    python mock_server.py
+    python mock_server.py --port=8900 --latency=lognormal:80:0.5 --error-rate=0.05 --page-size=10
+    python mock_server.py --latency=uniform:20:300 --error-status=429
+"""
+
+import os
+import io
+import sys
+import glob
+import json
+import math
+import random
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from config import MOCK_SERVER
+
+# Fix Windows console encoding
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+GATEWAY = "/dubai-gateway"
+
+
+def parse_latency(spec: str):
+    """"fixed:MS" | "uniform:MIN_MS:MAX_MS" | "lognormal:MEDIAN_MS:SIGMA" -> function returning seconds"""
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class Fixtures:
+    """Brands, collections, products and inquiries built from the JSON already in the repo"""
+
+    SYNTHETIC_BRAND_ID = 900000
+    SYNTHETIC_COLLECTION_ID = 700000
+
+    def __init__(self, root: str = "."):
+        self.brands: List[Dict] = []
+        self.products: Dict[int, Dict] = {}
+        self.by_brand: Dict[int, List[Dict]] = defaultdict(list)
+        self.collections: Dict[int, List[Dict]] = defaultdict(list)
+        self.inquiries: Dict[int, Dict] = {}
+        self.categories: List[Dict] = []
+        self._load_categories(root)
+        self._load_brands(root)
+        self._load_products(root)
+        self._load_inquiries(root)
+
+    @staticmethod
+    def _read(path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_categories(self, root: str):
+        """frontCategoryIds seen in the brand-group dumps (aihuishou_data_* / aihuishou_products_*)"""
+        seen = set()
+        for path in sorted(glob.glob(os.path.join(root, "aihuishou_data_*.json")) +
+                           glob.glob(os.path.join(root, "aihuishou_products_*.json"))):
+            for entry in self._read(path) or []:
+                category_id = entry.get("frontCategoryId") if isinstance(entry, dict) else None
+                if category_id and category_id not in seen:
+                    seen.add(category_id)
+                    self.categories.append({"id": category_id, "name": str(category_id)})
+
+    def _load_brands(self, root: str):
+        for path in sorted(glob.glob(os.path.join(root, "brands_*.json"))):
+            for brand in self._read(path) or []:
+                if isinstance(brand, dict) and brand.get("id") not in {b["id"] for b in self.brands}:
+                    self.brands.append(brand)
+
+    def _brand_id(self, name: str) -> int:
+        for brand in self.brands:
+            if brand["name"] == name or brand["name"] in name.split("/"):
+                return brand["id"]
+        brand = {"id": self.SYNTHETIC_BRAND_ID + len(self.brands), "name": name, "initial": "",
+                 "iconUrl": "", "marketingTagText": None}
+        self.brands.append(brand)
+        return brand["id"]
+
+    def _load_products(self, root: str):
+        collection_ids = {}
+        # Newest export wins when a product appears in several
+        for path in sorted(glob.glob(os.path.join(root, "exports", "*.json")), reverse=True):
+            data = self._read(path)
+            records = data.get("products", []) if isinstance(data, dict) else data or []
+            for record in records:
+                product_id = record.get("productId") if isinstance(record, dict) else None
+                if not product_id or not record.get("brand") or product_id in self.products:
+                    continue
+                brand_id = self._brand_id(record["brand"])
+                title = record.get("collection") or ""
+                collection_id = None
+                if title:
+                    if (brand_id, title) not in collection_ids:
+                        collection_ids[(brand_id, title)] = self.SYNTHETIC_COLLECTION_ID + len(collection_ids)
+                        self.collections[brand_id].append({
+                            "collectionId": collection_ids[(brand_id, title)], "title": title,
+                            "seriesCode": "", "seriesName": record.get("series", ""),
+                        })
+                    collection_id = collection_ids[(brand_id, title)]
+                product = {
+                    "productId": product_id,
+                    "productName": record.get("productName", ""),
+                    "subTitle": record.get("subTitle", ""),
+                    "imageUrl": record.get("imageUrl", ""),
+                    "serials": {"name": record.get("series", "")},
+                    "brandId": brand_id,
+                    "collectionId": collection_id,
+                }
+                self.products[product_id] = product
+                self.by_brand[brand_id].append(product)
+
+    def _load_inquiries(self, root: str):
+        for path in sorted(glob.glob(os.path.join(root, "aihuishou_inquiry_*.json"))):
+            data = self._read(path)
+            if isinstance(data, dict) and data.get("productId"):
+                self.inquiries[data["productId"]] = data
+
+    def inquiry(self, product_id: int) -> Optional[Dict]:
+        """Recorded inquiry, else the first recorded one re-labelled for a known product"""
+        if product_id in self.inquiries:
+            return self.inquiries[product_id]
+        product = self.products.get(product_id)
+        if product is None or not self.inquiries:
+            return None
+        template = next(iter(self.inquiries.values()))
+        return {**template, "productId": product_id, "productName": product["productName"]}
+
+    def page(self, brand_id: int, collection_id: Optional[int], page: int, size: int) -> List[Dict]:
+        items = [p for p in self.by_brand.get(brand_id, [])
+                 if collection_id is None or p["collectionId"] == collection_id]
+        return items[page * size:(page + 1) * size]
+
+
+class MockServer:
+    """aiohttp app serving the fixtures with injected latency / errors"""
+
+    def __init__(self, fixtures: Fixtures, latency: str = MOCK_SERVER["latency"],
+                 error_rate: float = MOCK_SERVER["error_rate"], error_status: int = MOCK_SERVER["error_status"],
+                 page_size: Optional[int] = MOCK_SERVER["page_size"]):
+        self.fixtures = fixtures
+        self.latency_spec = latency
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.page_size = page_size
+        self.stats = defaultdict(lambda: {"requests": 0, "errors": 0, "latency_ms": 0.0})
+
+    # ============ PLUMBING ============
+    @staticmethod
+    async def _params(request) -> Dict:
+        """Query string and JSON body merged - the SPA sends GETs, the HTTP engines POST"""
+        params = dict(request.query)
+        if request.can_read_body:
+            try:
+                body = await request.json()
+                if isinstance(body, dict):
+                    params.update(body)
+            except (ValueError, ConnectionResetError):
+                pass  # not JSON, or a hedged duplicate the client already dropped
+        return params
+
+    @staticmethod
+    def _int(params: Dict, key: str, default=None) -> Optional[int]:
+        try:
+            return int(params[key])
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    def _size(self, params: Dict, key: str = "pageSize") -> int:
+        return self.page_size or self._int(params, key, 20)
+
+    @staticmethod
+    def ok(data, **extra):
+        return web.json_response({"code": 0, "resultMessage": "", "data": data, **extra})
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        if request.method == "OPTIONS":
+            response = web.Response()
+        else:
+            endpoint = request.match_info.route.resource.canonical if request.match_info.route.resource else "?"
+            stats = self.stats[endpoint]
+            stats["requests"] += 1
+            delay = self.latency()
+            stats["latency_ms"] += delay * 1000
+            await asyncio.sleep(delay)
+            if endpoint.startswith(("/dubai-gateway", "/trade-front")) and random.random() < self.error_rate:
+                stats["errors"] += 1
+                response = web.Response(status=self.error_status, text="injected error")
+            else:
+                response = await handler(request)
+        response.headers["Access-Control-Allow-Origin"] = request.headers.get("Origin", "*")
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers["Access-Control-Allow-Headers"] = "*"
+        return response
+
+    # ============ GATEWAY ============
+    async def brands(self, request):
+        return self.ok(self.fixtures.brands)
+
+    async def spu_collection(self, request):
+        params = await self._params(request)
+        return self.ok(self.fixtures.collections.get(self._int(params, "brandId"), []))
+
+    async def spu_list(self, request):
+        params = await self._params(request)
+        items = self.fixtures.page(self._int(params, "brandId"), self._int(params, "collectionId"),
+                                   self._int(params, "pageIndex", 0), self._size(params))
+        return self.ok([{k: v for k, v in p.items() if k not in ("brandId", "collectionId")} for p in items])
+
+    async def search(self, request):
+        params = await self._params(request)
+        brand_id = self._int(params, "brandId")
+        items = self.fixtures.page(brand_id, None, self._int(params, "pageIndex", 0), self._size(params))
+        return self.ok({
+            "list": [{"id": p["productId"], "name": p["productName"], "maxPrice": None,
+                      "imageUrl": p["imageUrl"]} for p in items],
+            "total": len(self.fixtures.by_brand.get(brand_id, [])),
+        })
+
+    async def quick_inquiry(self, request):
+        data = self.fixtures.inquiry(int(request.match_info["product_id"]))
+        if data is None:
+            return web.json_response({"code": 10001, "resultMessage": "商品不存在", "data": None})
+        return self.ok(data)
+
+    # ============ TRADE-FRONT (direct_scraper.py) ============
+    async def tf_categories(self, request):
+        return self.ok(self.fixtures.categories)
+
+    async def tf_brands(self, request):
+        return self.ok([{"id": b["id"], "name": b["name"]} for b in self.fixtures.brands])
+
+    async def tf_products(self, request):
+        params = await self._params(request)
+        brand_id = self._int(params, "brandId")
+        items = self.fixtures.page(brand_id, None, self._int(params, "pageNo", 1) - 1, self._size(params))
+        return self.ok({
+            "list": [{"id": p["productId"], "name": p["productName"], "imageUrl": p["imageUrl"]} for p in items],
+            "total": len(self.fixtures.by_brand.get(brand_id, [])),
+        })
+
+    async def tf_inquiry(self, request):
+        params = await self._params(request)
+        return self.ok(self.fixtures.inquiry(self._int(params, "productId")))
+
+    # ============ SITE ============
+    async def shell(self, request):
+        return web.Response(text=SPA_SHELL.replace("__GATEWAY__", GATEWAY), content_type="text/html")
+
+    async def mock_stats(self, request):
+        return web.json_response({
+            "latency": self.latency_spec, "error_rate": self.error_rate, "page_size": self.page_size,
+            "products": len(self.fixtures.products), "brands": len(self.fixtures.brands),
+            "endpoints": {k: {**v, "latency_ms": round(v["latency_ms"] / (v["requests"] or 1), 1)}
+                          for k, v in self.stats.items()},
+        })
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        gw = GATEWAY
+        for method in ("GET", "POST"):
+            app.router.add_route(method, f"{gw}/front-category/brands-v2", self.brands)
+            app.router.add_route(method, f"{gw}/recycle-products/spu-collection", self.spu_collection)
+            app.router.add_route(method, f"{gw}/recycle-products/spu-list", self.spu_list)
+            app.router.add_route(method, f"{gw}/recycle-products/search-by-category", self.search)
+            app.router.add_route(method, f"{gw}/recycle-products/quick-inquiry/{{product_id:\\d+}}",
+                                 self.quick_inquiry)
+        app.router.add_get("/trade-front/api/inquiry/front-category/list", self.tf_categories)
+        app.router.add_get("/trade-front/api/trade/brand/list", self.tf_brands)
+        app.router.add_get("/trade-front/api/trade/product/list", self.tf_products)
+        app.router.add_get("/trade-front/api/inquiry/product/info", self.tf_inquiry)
+        app.router.add_get("/__mock/stats", self.mock_stats)
+        app.router.add_route("OPTIONS", "/{tail:.*}", self.shell)
+        app.router.add_get("/n/", self.shell)
+        app.router.add_get("/p/main/recycle/{page}", self.shell)
+        return app
+
+
+# Just enough of the SPA for the Playwright scrapers: same XHRs, infinite scroll on spu-list
+SPA_SHELL = """<!doctype html>
+<html><head><meta charset="utf-8"><title>aihuishou mock</title>
+<style>.item{height:80px;border-bottom:1px solid #eee}</style></head>
+<body><div id="app"></div>
+<script>
+const GATEWAY = "__GATEWAY__";
+const app = document.getElementById("app");
+
+async function call(path, body) {
+    const resp = await fetch(GATEWAY + path, {method: "POST", credentials: "include",
+        headers: {"Content-Type": "application/json"}, body: JSON.stringify(body)});
+    return (await resp.json()).data;
+}
+function render(items, label) {
+    for (const item of items || []) {
+        const div = document.createElement("div");
+        div.className = "item";
+        div.textContent = label(item);
+        app.appendChild(div);
+    }
+}
+function params() {
+    const hash = location.hash.includes("?") ? location.hash.split("?")[1] : "";
+    return Object.fromEntries(new URLSearchParams(location.search + "&" + hash));
+}
+
+async function main() {
+    const p = params();
+    const route = location.pathname + location.hash.split("?")[0];
+    if (route.includes("inquiry")) {
+        const resp = await fetch(GATEWAY + "/recycle-products/quick-inquiry/" + p.productId +
+                                 "?cityId=1&queryType=1", {credentials: "include"});
+        const data = (await resp.json()).data;
+        app.textContent = data ? data.productName : "not found";
+    } else if (route.includes("spu-collection")) {
+        render(await call("/recycle-products/spu-collection", p), c => c.title);
+    } else if (route.includes("spu-list")) {
+        let page = 0, loading = false, done = false;
+        const size = 20;
+        async function more() {
+            if (loading || done) return;
+            loading = true;
+            const items = await call("/recycle-products/spu-list", {...p, pageIndex: page++, pageSize: size});
+            render(items, i => i.productName);
+            done = !items || items.length === 0;
+            loading = false;
+        }
+        window.addEventListener("scroll", () => {
+            if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 200) more();
+        });
+        await more();
+    } else {
+        render(await call("/front-category/brands-v2", p), b => b.name);
+    }
+}
+main();
+</script></body></html>
+"""
+
+
+def main():
+    options = dict(MOCK_SERVER)
+    for arg in sys.argv[1:]:
+        if arg.startswith("--port="):
+            options["port"] = int(arg.split("=", 1)[1])
+        elif arg.startswith("--latency="):
+            options["latency"] = arg.split("=", 1)[1]
+        elif arg.startswith("--error-rate="):
+            options["error_rate"] = float(arg.split("=", 1)[1])
+        elif arg.startswith("--error-status="):
+            options["error_status"] = int(arg.split("=", 1)[1])
+        elif arg.startswith("--page-size="):
+            options["page_size"] = int(arg.split("=", 1)[1])
+
+    fixtures = Fixtures()
+    server = MockServer(fixtures, latency=options["latency"], error_rate=options["error_rate"],
+                        error_status=options["error_status"], page_size=options["page_size"])
+    url = f"http://{options['host']}:{options['port']}"
+    print(f"[MOCK] {len(fixtures.products)} products, {len(fixtures.brands)} brands, "
+          f"{len(fixtures.inquiries)} recorded inquiries")
+    print(f"[MOCK] latency={options['latency']} error_rate={options['error_rate']} "
+          f"page_size={options['page_size'] or 'as requested'}")
+    print(f"[MOCK] export AIHUISHOU_API_HOST={url} AIHUISHOU_SITE_URL={url} AIHUISHOU_CACHE=0")
+    web.run_app(server.app(), host=options["host"], port=options["port"], print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+AIHUISHOU PAGINATION
+Fetch every page of a paged endpoint concurrently, yielding pages lazily and in order.
+
+- Total known (from the first page): the remaining pages are fetched through a
+  sliding window of `concurrency` requests
+- Total unknown: a short first page is the only page; otherwise pages are
+  prefetched speculatively, stopping at the first empty or short page
+  (in-flight pages past that point are cancelled)
+- A server that caps pageSize below the requested size is still read to the
+  end when its total proves the cap (first page short, total larger)
+- Nothing beyond the window is requested until the consumer asks for more
+
+Usage:
+    async def fetch(page):                 # -> (items, total or None)
+        data = await client.call("POST", path, json={..., "pageIndex": page})
+        return data["list"], data.get("total")
+
+    async for items in paginate(fetch, page_size=20):
+        ...
+
+    for items in sync_client.iterate(paginate(fetch)):   # blocking callers
+        ...
+"""
+
+import math
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+PageFetcher = Callable[[int], Awaitable[Tuple[List[Dict], Optional[int]]]]
+
+TOTAL_KEYS = ("total", "totalCount", "totalNum", "count")
+LIST_KEYS = ("list", "items", "records", "products", "data")
+
+
+def split_page(data) -> Tuple[List[Dict], Optional[int]]:
+    """(items, total) from a page response: a bare list, or a dict with a list and maybe a total"""
+    if isinstance(data, list):
+        return data, None
+    if not isinstance(data, dict):
+        return [], None
+    items = next((data[k] for k in LIST_KEYS if isinstance(data.get(k), list)), [])
+    total = next((data[k] for k in TOTAL_KEYS if isinstance(data.get(k), int)), None)
+    return items, total
+
+
+async def paginate(fetch: PageFetcher, page_size: int, first: int = 0, concurrency: int = 4,
+                   max_pages: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+    """Yield the items of each page, in page order"""
+    items, total = await fetch(first)
+    if not items:
+        return
+
+    per_page = page_size
+    if total is not None:
+        if len(items) < page_size and total > len(items):
+            per_page = len(items)  # the total proves the server caps pageSize below what was asked
+        last = first + math.ceil(total / per_page)           # exclusive
+    elif len(items) < page_size:
+        last = first + 1  # no total: a short page is the last one - no speculative fetches
+    else:
+        last = None
+    if max_pages is not None:
+        last = min(last, first + max_pages) if last is not None else first + max_pages
+
+    window = deque()
+    next_page = first + 1
+    try:
+        while True:
+            # Keep the window full while the consumer works on the current page
+            while len(window) < concurrency and (last is None or next_page < last):
+                window.append(asyncio.ensure_future(fetch(next_page)))
+                next_page += 1
+
+            yield items
+            if not window or (total is None and len(items) < per_page):
+                return
+
+            items, _ = await window.popleft()
+            if not items:
+                return
+    finally:
+        for task in window:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # mark as retrieved - the page is no longer wanted
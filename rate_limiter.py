@@ -0,0 +1,170 @@
+"""
+AIHUISHOU RATE LIMITER
+Token bucket shared by every scraper in the process (optionally across processes)
+
+- Per-host budgets from config.RATE_LIMITS
+- Sync acquire() for requests.Session, async acquire_async() for Playwright
+- limit_context() makes browser navigations and in-page fetches take tokens
+- Set AIHUISHOU_RATE_LIMIT_DB to share the buckets between processes (SQLite)
+
+Usage:
+    from rate_limiter import get_limiter, RateLimitedSession, limit_context
+
+    session = RateLimitedSession()          # requests.Session that waits for tokens
+    await limit_context(context)            # Playwright BrowserContext
+"""
+
+import time
+import asyncio
+import sqlite3
+import threading
+import requests
+from urllib.parse import urlparse
+from typing import Dict, Optional, Tuple
+
+from config import RATE_LIMITS, RATE_LIMIT_DB, is_upstream_url
+
+
+class TokenBucket:
+    """In-process token bucket (thread-safe)"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token, return seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+
+class SQLiteTokenBucket:
+    """Token bucket stored in SQLite - shared by every process using the same file"""
+
+    def __init__(self, path: str, host: str, rate: float, burst: int):
+        self.path = path
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (host TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def reserve(self) -> float:
+        """Take one token, return seconds to wait before using it"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE host = ?", (self.host,)).fetchone()
+            now = time.time()
+            tokens, updated = row if row else (float(self.burst), now)
+            tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (host, tokens, updated) VALUES (?, ?, ?)",
+                (self.host, tokens, now)
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return max(0.0, -tokens / self.rate)
+
+
+class RateLimiter:
+    """Per-host token buckets"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None, shared_path: Optional[str] = None):
+        self.limits = limits or RATE_LIMITS
+        self.shared_path = shared_path
+        self.buckets = {}
+        self.stats = {}  # host -> {"acquired": n, "waited": seconds}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str):
+        with self._lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                rate, burst = self.limits.get(host, self.limits["default"])
+                if self.shared_path:
+                    bucket = SQLiteTokenBucket(self.shared_path, host, rate, burst)
+                else:
+                    bucket = TokenBucket(rate, burst)
+                self.buckets[host] = bucket
+                self.stats[host] = {"acquired": 0, "waited": 0.0}
+            return bucket
+
+    def _reserve(self, url: str) -> float:
+        host = urlparse(url).hostname or url
+        wait = self._bucket(host).reserve()
+        stats = self.stats[host]
+        stats["acquired"] += 1
+        stats["waited"] += wait
+        return wait
+
+    def acquire(self, url: str):
+        """Block until a token for the URL's host is available"""
+        wait = self._reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str):
+        """Wait (without blocking the event loop) for a token for the URL's host"""
+        if self.shared_path:
+            # SQLite transaction with a busy timeout - reserve on a worker thread, only sleep on the loop
+            wait = await asyncio.to_thread(self._reserve, url)
+        else:
+            wait = self._reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    """Process-wide limiter shared by all scrapers"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(shared_path=RATE_LIMIT_DB)
+        return _limiter
+
+
+class RateLimitedSession(requests.Session):
+    """requests.Session that takes a token before every request"""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None):
+        super().__init__()
+        self.limiter = limiter or get_limiter()
+
+    def request(self, method, url, *args, **kwargs):
+        self.limiter.acquire(url)
+        return super().request(method, url, *args, **kwargs)
+
+
+# Only documents and API calls are paced - images/scripts/css pass through
+LIMITED_RESOURCE_TYPES = ("document", "xhr", "fetch")
+
+
+async def limit_context(context, limiter: Optional[RateLimiter] = None):
+    """Route every aihuishou navigation and in-page fetch of a BrowserContext through the limiter"""
+    limiter = limiter or get_limiter()
+
+    async def handle(route):
+        request = route.request
+        if request.resource_type in LIMITED_RESOURCE_TYPES:
+            await limiter.acquire_async(request.url)
+        await route.continue_()
+
+    await context.route(is_upstream_url, handle)
@@ -0,0 +1,223 @@
+"""
+AIHUISHOU RESILIENCE
+Tail-latency and failure control for upstream calls, per endpoint:
+
+- Hedging: when a call has been running longer than the endpoint's p95
+  latency, a duplicate is sent and the first good answer wins
+- Circuit breaker: when the error rate over a sliding window spikes, calls are
+  shed (CircuitOpen) until a cooldown passes; one trial call then decides
+  whether the circuit closes again
+
+Used by api_client.ApiClient (HTTP) and lookup_service (browser tier).
+
+Usage:
+    resilience = get_resilience()
+    result = await resilience.run("GET /recycle-products/quick-inquiry/{id}", lambda: fetch(),
+                                  failed=lambda r: r.status >= 500)
+    resilience.summary()   # hedges fired / won, breaker trips, p95 per endpoint
+"""
+
+import re
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from config import RESILIENCE
+
+
+class CircuitOpen(Exception):
+    """The endpoint's breaker is open - the call was shed without being sent"""
+
+
+def endpoint_of(method: str, url: str) -> str:
+    """"GET /recycle-products/quick-inquiry/{id}" - ids folded so one endpoint shares one breaker"""
+    path = re.sub(r"/\d+(?=/|$)", "/{id}", urlsplit(url).path)
+    return f"{method.upper()} {path}"
+
+
+class LatencyTracker:
+    """Recent successful latencies of one endpoint"""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < RESILIENCE["hedge_min_samples"]:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class CircuitBreaker:
+    """closed -> open (error rate above threshold) -> half-open (after cooldown) -> closed/open"""
+
+    def __init__(self):
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.outcomes = deque()  # (timestamp, ok)
+        self.trips = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.time() - self.opened_at >= RESILIENCE["breaker_cooldown"]:
+                self.state = "half_open"
+                self.trial_running = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            self.shed += 1
+            return False
+
+    def record(self, ok: bool):
+        now = time.time()
+        with self._lock:
+            if self.state == "half_open":
+                self.trial_running = False
+                if ok:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                else:
+                    self._trip(now)
+                return
+
+            self.outcomes.append((now, ok))
+            while self.outcomes and now - self.outcomes[0][0] > RESILIENCE["breaker_window"]:
+                self.outcomes.popleft()
+            failures = sum(1 for _, good in self.outcomes if not good)
+            if (self.state == "closed" and len(self.outcomes) >= RESILIENCE["breaker_min_requests"]
+                    and failures / len(self.outcomes) >= RESILIENCE["breaker_error_rate"]):
+                self._trip(now)
+
+    def release(self):
+        """The call was abandoned (cancelled) - no verdict, so a half-open trial is handed back"""
+        with self._lock:
+            if self.state == "half_open":
+                self.trial_running = False
+
+    def _trip(self, now: float):
+        self.state = "open"
+        self.opened_at = now
+        self.trips += 1
+        self.outcomes.clear()
+
+
+class Resilience:
+    """Per-endpoint latency trackers and breakers, with hedge / trip counters"""
+
+    def __init__(self):
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint: str):
+        with self._lock:
+            if endpoint not in self.trackers:
+                self.trackers[endpoint] = LatencyTracker()
+                self.breakers[endpoint] = CircuitBreaker()
+            return self.trackers[endpoint], self.breakers[endpoint]
+
+    async def run(self, endpoint: str, factory: Callable[[], Awaitable[Any]],
+                  failed: Callable[[Any], bool] = lambda result: False, hedge: bool = True,
+                  hedge_factory: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """
+        Await factory(); hedge it with a second call (hedge_factory, default factory)
+        once it runs past the endpoint's p95. Exceptions and results where
+        failed(result) is true count against the breaker.
+        """
+        tracker, breaker = self._get(endpoint)
+        if not breaker.allow():
+            raise CircuitOpen(f"Circuit open for {endpoint}")
+        self.stats["calls"] += 1
+
+        delay = tracker.percentile(RESILIENCE["hedge_percentile"]) if hedge and RESILIENCE["hedge"] else None
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(factory())]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=max(delay, RESILIENCE["hedge_min_delay"]))
+                if not done:
+                    self.stats["hedges"] += 1
+                    tasks.append(asyncio.ensure_future((hedge_factory or factory)()))
+
+            winner, result, error = await self._first_good(tasks, failed)
+        except BaseException:
+            # Cancelled by the caller (pagination, LoopThread.run timeout, job cancel): says nothing
+            # about the endpoint, but a half-open trial must not stay "running" forever
+            breaker.release()
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        ok = error is None and not failed(result)
+        breaker.record(ok)
+        if ok:
+            tracker.add(time.perf_counter() - start)
+            if winner is not tasks[0]:
+                self.stats["hedge_wins"] += 1
+        if error is not None:
+            raise error
+        return result
+
+    @staticmethod
+    async def _first_good(tasks, failed):
+        """First task to finish well; else the last outcome (result or exception)"""
+        pending = set(tasks)
+        winner, result, error = None, None, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                winner = task
+                if task.exception() is not None:
+                    result, error = None, task.exception()
+                    continue
+                result, error = task.result(), None
+                if not failed(result):
+                    return winner, result, None
+        return winner, result, error
+
+    def summary(self) -> Dict:
+        endpoints = {}
+        for endpoint, tracker in list(self.trackers.items()):
+            breaker = self.breakers[endpoint]
+            p95 = tracker.percentile(0.95)
+            endpoints[endpoint] = {
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                "breaker": breaker.state,
+                "trips": breaker.trips,
+                "shed": breaker.shed,
+            }
+        return {
+            **self.stats,
+            "breaker_trips": sum(b.trips for b in self.breakers.values()),
+            "shed": sum(b.shed for b in self.breakers.values()),
+            "endpoints": endpoints,
+        }
+
+
+_resilience: Optional[Resilience] = None
+_resilience_lock = threading.Lock()
+
+
+def get_resilience() -> Resilience:
+    """Process-wide trackers/breakers shared by every client"""
+    global _resilience
+    with _resilience_lock:
+        if _resilience is None:
+            _resilience = Resilience()
+        return _resilience
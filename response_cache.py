@@ -0,0 +1,247 @@
+"""
+AIHUISHOU RESPONSE CACHE
+On-disk (SQLite) cache of API responses, used by api_client.ApiClient.
+
+- Keyed by method, URL, params / JSON body and city
+- Per-endpoint TTLs from config.RESPONSE_CACHE_TTLS (unlisted endpoints are not cached)
+- Stale entries are revalidated with If-None-Match / If-Modified-Since when the
+  server sent an ETag / Last-Modified
+- Size cap (config.RESPONSE_CACHE["max_bytes"]) with LRU eviction
+- Offline mode (AIHUISHOU_OFFLINE=1): serve only from the cache, never the network
+- cache_context(): the same cache for gateway XHRs inside a Playwright context
+
+Usage:
+    python response_cache.py            # stats
+    python response_cache.py --clear    # drop every entry
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from typing import Any, Dict, Optional
+
+from config import RESPONSE_CACHE, RESPONSE_CACHE_TTLS, is_api_url
+
+
+def _canonical(value: Any) -> Any:
+    """JSON strings are parsed so that a body sent by the browser and by ApiClient give the same key"""
+    if isinstance(value, (str, bytes)):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+    return value
+
+
+class ResponseCache:
+    """SQLite-backed response cache (thread-safe, shareable between processes)"""
+
+    def __init__(self, path: str = RESPONSE_CACHE["path"], max_bytes: int = RESPONSE_CACHE["max_bytes"],
+                 ttls: Optional[Dict[str, float]] = None, offline: bool = RESPONSE_CACHE["offline"]):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = RESPONSE_CACHE_TTLS if ttls is None else ttls
+        self.offline = offline
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0, "offline_misses": 0}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    method TEXT,
+                    url TEXT,
+                    status INTEGER,
+                    body TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    created REAL,
+                    expires REAL,
+                    accessed REAL,
+                    size INTEGER
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict] = None, body: Any = None, city_id: Any = None) -> str:
+        parts = urlsplit(url)
+        query = sorted(parse_qsl(parts.query) + [(str(k), str(v)) for k, v in (params or {}).items()])
+        raw = json.dumps({
+            "method": method.upper(),
+            "url": f"{parts.scheme}://{parts.netloc}{parts.path}",
+            "query": query,
+            "body": _canonical(body),
+            "city": str(city_id) if city_id is not None else None,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, url: str) -> float:
+        """Freshness lifetime for the URL's endpoint, 0 = not cacheable"""
+        for pattern, ttl in self.ttls.items():
+            if pattern in url:
+                return ttl
+        return 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Entry (fresh or stale) with an extra "fresh" flag, or None"""
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT status, body, etag, last_modified, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        status, body, etag, last_modified, expires = row
+        return {"status": status, "body": body, "etag": etag, "last_modified": last_modified,
+                "fresh": expires > now}
+
+    def put(self, key: str, method: str, url: str, body: str, status: int = 200,
+            etag: Optional[str] = None, last_modified: Optional[str] = None, ttl: Optional[float] = None):
+        now = time.time()
+        ttl = self.ttl_for(url) if ttl is None else ttl
+        size = len(body.encode("utf-8"))
+        with self._lock, self.conn:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, method.upper(), url, status, body, etag, last_modified, now, now + ttl, now, size)
+            )
+            self.size += size - (old[0] if old else 0)
+            self.stats["stored"] += 1
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def refresh(self, key: str, url: str):
+        """Server answered 304 - the stored body is good for another TTL"""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE responses SET expires = ?, accessed = ? WHERE key = ?",
+                              (now + self.ttl_for(url), now, key))
+        self.stats["revalidated"] += 1
+
+    def _evict(self):
+        """Drop least recently used entries down to 90% of the cap (lock held)"""
+        self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_bytes * 0.9
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if self.size <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.size -= size
+            self.stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+            self.size = 0
+
+    def summary(self) -> Dict:
+        with self._lock:
+            entries, fresh = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(expires > ?), 0) FROM responses", (time.time(),)
+            ).fetchone()
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "entries": entries,
+            "fresh": fresh,
+            "bytes": self.size,
+            "offline": self.offline,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, or None when disabled (AIHUISHOU_CACHE=0)"""
+    global _cache
+    if not RESPONSE_CACHE["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+async def cache_context(context, cache: Optional[ResponseCache] = None):
+    """
+    Serve cached gateway XHRs inside a Playwright BrowserContext and store new ones.
+    Register after limit_context() so misses still go through the rate limiter.
+    """
+    cache = cache or get_response_cache()
+    if cache is None:
+        return
+
+    served = set()  # requests fulfilled from the cache - not stored again
+
+    def key_of(request):
+        city = request.headers.get("x-city-id")
+        return cache.make_key(request.method, request.url, None, request.post_data, city)
+
+    async def handle(route):
+        request = route.request
+        if request.resource_type not in ("xhr", "fetch") or not cache.ttl_for(request.url):
+            await route.fallback()
+            return
+        entry = cache.get(key_of(request))
+        if entry and (entry["fresh"] or cache.offline):
+            cache.stats["hits"] += 1
+            served.add(request)
+            await route.fulfill(status=entry["status"], content_type="application/json", body=entry["body"])
+            return
+        if cache.offline:
+            cache.stats["offline_misses"] += 1
+            await route.abort()
+            return
+        cache.stats["misses"] += 1
+        await route.fallback()
+
+    async def store(response):
+        request = response.request
+        if request in served:
+            served.discard(request)
+            return
+        if response.status != 200 or request.resource_type not in ("xhr", "fetch") or not cache.ttl_for(request.url):
+            return
+        try:
+            body = await response.text()
+            data = json.loads(body)
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("code", 0) != 0:
+            return
+        cache.put(key_of(request), request.method, request.url, body,
+                  etag=response.headers.get("etag"), last_modified=response.headers.get("last-modified"))
+
+    await context.route(is_api_url, handle)
+    context.on("response", store)
+
+
+def main():
+    cache = ResponseCache()
+    if "--clear" in sys.argv:
+        cache.clear()
+        print(f"[OK] Cleared {cache.path}")
+        return
+    print(f"[CACHE] {cache.path}")
+    for key, value in cache.summary().items():
+        print(f"  {key:<15} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+AIHUISHOU RESULT CACHE
+Whole scrape results (scrape_url / DeepScraper) keyed by a normalized URL, so
+the same category asked for twice within the TTL is not scraped twice.
+
+- normalize_url(): canonical params (HTML-escaped "amp;" keys fixed, city
+  display names and cache busters dropped, sorted) + the category and city
+  the URL resolves to
+- ResultCache: recent results in memory (LRU), every result on disk as
+  cache/results/<sha>.json, both expiring after RESULT_CACHE["ttl"]
+
+Usage:
+    norm = normalize_url("https://m.aihuishou.com/n/#/category?frontCategoryId=165&amp%3BsubFrontCategoryId=166")
+    norm["key"]           # "category=166&city=1"
+    cache = get_result_cache()
+    hit = cache.get("deep:browser:" + norm["key"])     # (result, age_seconds) or None
+    cache.put("deep:browser:" + norm["key"], {"products": [...]})
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import DEFAULT_CITY_ID, RESULT_CACHE
+from category_map import lookup_category
+
+# Params that never change what a scrape returns
+IGNORED_PARAMS = {"cityName", "cityOriginName", "_", "_t", "t", "timestamp"}
+
+
+def _clean_key(key: str) -> str:
+    """"amp;subFrontCategoryId" (an &amp; that was URL-encoded) -> "subFrontCategoryId\""""
+    while key.startswith("amp;"):
+        key = key[4:]
+    return key
+
+
+def normalize_url(url: str) -> Dict[str, Any]:
+    """
+    Canonical form of a category / product URL:
+    {"url", "params", "front_category_id", "category_id", "category", "city_id", "key"}.
+    Query params may sit in the SPA fragment (/n/#/category?...) or the real query.
+    """
+    parts = urlsplit(url.strip().replace("&amp;", "&"))
+    route, _, fragment_query = parts.fragment.partition("?")
+    params = {}
+    for key, value in parse_qsl(parts.query, keep_blank_values=True) + \
+            parse_qsl(fragment_query, keep_blank_values=True):
+        key = _clean_key(key)
+        if key and key not in IGNORED_PARAMS:
+            params[key] = value
+    params = dict(sorted(params.items()))
+
+    query = urlencode(params)
+    if route:
+        canonical = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, "",
+                                route + ("?" + query if query else "")))
+    else:
+        canonical = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ""))
+
+    front_id = params.get("subFrontCategoryId") or params.get("frontCategoryId")
+    # Cached map only - normalizing runs on every scrape request and must not trigger a discovery
+    info = lookup_category(front_id, discover=False) if front_id else None
+    category_id = info[0] if info else params.get("categoryId")
+    city_id = int(params["cityId"]) if params.get("cityId", "").isdigit() else DEFAULT_CITY_ID
+    # Same category + city = same deep scrape, whatever else the URL carries
+    key = f"category={front_id}&city={city_id}" if front_id else canonical
+    return {
+        "url": canonical,
+        "params": params,
+        "front_category_id": front_id,
+        "category_id": int(category_id) if str(category_id or "").isdigit() else None,
+        "category": info[2] if info else None,
+        "city_id": city_id,
+        "key": key,
+    }
+
+
+class ResultCache:
+    """Memory (LRU, a few results) + disk (one JSON file per key) with one TTL"""
+
+    def __init__(self, directory: str = RESULT_CACHE["dir"], ttl: float = RESULT_CACHE["ttl"],
+                 memory_items: int = RESULT_CACHE["memory_items"]):
+        self.directory = directory
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()  # key -> (created, result)
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stored": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def _remember(self, key: str, created: float, result: Dict):
+        self.memory[key] = (created, result)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Tuple[Dict, float]]:
+        """(result, age in seconds) while fresh, else None"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry and now - entry[0] < ttl:
+                self.memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1], round(now - entry[0], 1)
+
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        if not data or data.get("key") != key or now - data["created"] >= ttl:
+            with self._lock:
+                self.memory.pop(key, None)
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._remember(key, data["created"], data["result"])
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+        return data["result"], round(now - data["created"], 1)
+
+    def put(self, key: str, result: Dict):
+        created = time.time()
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "created": created, "result": result}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        with self._lock:
+            self._remember(key, created, result)
+            self.stats["stored"] += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "memory": len(self.memory), "ttl": self.ttl}
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide cache, None when RESULT_CACHE["enabled"] is off"""
+    global _cache
+    if not RESULT_CACHE["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
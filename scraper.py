@@ -20,10 +20,14 @@ import pandas as pd
 from typing import Dict, Any, List
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
+from config import SITE_URL, SITE_DOMAIN, is_api_url
+from rate_limiter import limit_context
 
 # Fix Windows console encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 class AihuishouScraper:
@@ -54,12 +58,13 @@ class AihuishouScraper:
                 viewport={"width": 375, "height": 812},
                 locale="zh-CN"
             )
+            await limit_context(context)
             
             # Set cookies
             await context.add_cookies([{
                 "name": "chosenCity",
                 "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-                "domain": "m.aihuishou.com",
+                "domain": SITE_DOMAIN,
                 "path": "/"
             }])
             
@@ -152,7 +157,7 @@ class AihuishouScraper:
     async def _handle_response(self, response):
         """Capture API responses"""
         url = response.url
-        if "dubai.aihuishou.com" not in url:
+        if not is_api_url(url):
             return
         
         try:
@@ -344,7 +349,7 @@ async def main():
         if arg.isdigit():
             brand_id = arg
             # Build URL for brand products
-            url = f"https://m.aihuishou.com/n/#/category?brandId={brand_id}&cityId=1"
+            url = f"{SITE_URL}/n/#/category?brandId={brand_id}&cityId=1"
             print(f"[INFO] Using brand ID: {brand_id}")
         else:
             url = arg
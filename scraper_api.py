@@ -17,36 +17,25 @@ import asyncio
 import pandas as pd
 from typing import Dict, Any, List
 from datetime import datetime
+from config import SITE_URL, SITE_DOMAIN, is_api_url
+from rate_limiter import limit_context
 
 # Fix Windows console encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 # API Configuration
-BASE_URL = "https://dubai.aihuishou.com/dubai-gateway"
 DEFAULT_CITY_ID = 1  # Shanghai
 
 
-async def get_session_cookies():
-    """Get cookies from browser session"""
-    from playwright.async_api import async_playwright
-    
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X)",
-            viewport={"width": 375, "height": 812}
-        )
-        page = await context.new_page()
-        
-        # Navigate to set cookies
-        await page.goto("https://m.aihuishou.com/n/#/", timeout=30000)
-        await asyncio.sleep(2)
-        
-        cookies = await context.cookies()
-        await browser.close()
-        
-        return {c["name"]: c["value"] for c in cookies}
+async def get_session_cookies(city_id: int = 1):
+    """Get cookies from a browser session (shared with HTTP clients via the session broker)"""
+    from session_broker import get_broker
+
+    session = await get_broker().get(city_id)
+    return session.cookies
 
 
 async def search_products(brand_id: int, city_id: int = 1, page_index: int = 0, page_size: int = 50) -> Dict:
@@ -59,13 +48,14 @@ async def search_products(brand_id: int, city_id: int = 1, page_index: int = 0,
             user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X)",
             viewport={"width": 375, "height": 812}
         )
+        await limit_context(context)
         page = await context.new_page()
         
         # Set city cookie
         await context.add_cookies([{
             "name": "chosenCity",
             "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-            "domain": "m.aihuishou.com",
+            "domain": SITE_DOMAIN,
             "path": "/"
         }])
         
@@ -87,7 +77,7 @@ async def search_products(brand_id: int, city_id: int = 1, page_index: int = 0,
         page.on("response", handle_response)
         
         # Navigate to brand page which triggers the product search API
-        url = f"https://m.aihuishou.com/n/#/category?brandId={brand_id}&cityId={city_id}"
+        url = f"{SITE_URL}/n/#/category?brandId={brand_id}&cityId={city_id}"
         print(f"[INFO] Navigating to: {url}")
         await page.goto(url, timeout=30000)
         await asyncio.sleep(5)
@@ -111,12 +101,13 @@ async def get_brands(front_category_id: int = 6) -> List[Dict]:
             user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X)",
             viewport={"width": 375, "height": 812}
         )
+        await limit_context(context)
         page = await context.new_page()
         
         brands = []
         
         async def handle_response(response):
-            if "dubai.aihuishou.com" in response.url:
+            if is_api_url(response.url):
                 try:
                     data = await response.json()
                     if data.get("code") == 0:
@@ -131,7 +122,7 @@ async def get_brands(front_category_id: int = 6) -> List[Dict]:
         
         page.on("response", handle_response)
         
-        url = f"https://m.aihuishou.com/n/#/category?frontCategoryId={front_category_id}"
+        url = f"{SITE_URL}/n/#/category?frontCategoryId={front_category_id}"
         await page.goto(url, timeout=30000)
         await asyncio.sleep(3)
         
@@ -15,14 +15,27 @@ import io
 import json
 import asyncio
 from typing import Optional, Dict, Any
+from config import SITE_DOMAIN
+from rate_limiter import limit_context
 
 # Fix Windows console encoding for Chinese characters
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
-async def get_product_data(url: str) -> Dict[str, Any]:
-    """Lay thong tin san pham bang Playwright"""
+# Seconds to wait for the quick-inquiry response after navigation
+RESPONSE_TIMEOUT = 10
+
+
+async def get_product_data(url: str, context=None) -> Dict[str, Any]:
+    """
+    Lay thong tin san pham bang Playwright
+    
+    context: an existing BrowserContext (e.g. from browser_pool.BrowserPool) -
+    skips launching and closing a browser for this lookup.
+    """
     from playwright.async_api import async_playwright
     
     # Extract productId from URL
@@ -30,7 +43,8 @@ async def get_product_data(url: str) -> Dict[str, Any]:
     if not match:
         return {"error": "Cannot extract productId from URL"}
     
-    product_id = match.group(1)
+    if context is not None:
+        return await _get_product_data(context, url)
     
     async with async_playwright() as p:
         # Launch browser
@@ -40,79 +54,81 @@ async def get_product_data(url: str) -> Dict[str, Any]:
             viewport={"width": 375, "height": 812},
             locale="zh-CN"
         )
+        await limit_context(context)
         
-        page = await context.new_page()
-        
-        # Storage for captured API response
-        api_data = {}
-        
-        # Intercept API responses
-        async def handle_response(response):
-            url = response.url
-            if "quick-inquiry" in url or "recycle-products" in url:
-                try:
-                    data = await response.json()
-                    if data.get("code") == 0:
-                        api_data["response"] = data
-                        print(f"[DEBUG] Captured API response from: {url[:80]}...")
-                except Exception as e:
-                    print(f"[DEBUG] Failed to parse response: {e}")
-        
-        page.on("response", handle_response)
+        # Set city cookie first
+        await context.add_cookies([{
+            "name": "chosenCity",
+            "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
+            "domain": SITE_DOMAIN,
+            "path": "/"
+        }])
         
         try:
-            # Set city cookie first
-            await context.add_cookies([{
-                "name": "chosenCity",
-                "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-                "domain": "m.aihuishou.com",
-                "path": "/"
-            }])
-            
-            print("[DEBUG] Navigating to page...")
-            
-            # Go to product page
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            
-            # Wait for network to settle
-            print("[DEBUG] Waiting for network...")
-            await asyncio.sleep(5)
-            
-            # Check if we captured API data
-            if api_data.get("response"):
-                print("[DEBUG] Found API response!")
-                data = api_data["response"]
-                # Debug: print raw response to understand structure
-                print(f"[DEBUG] Raw response keys: {list(data.keys())}")
-                if data.get("data"):
-                    print(f"[DEBUG] Data keys: {list(data['data'].keys())}")
-                    # Save raw response for debugging
-                    with open("debug_response.json", "w", encoding="utf-8") as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    print("[DEBUG] Raw response saved to debug_response.json")
-                return parse_product_data(data.get("data", {}))
-            
-            # If no API data, try to scrape from page
-            print("[DEBUG] No API response, trying to scrape page...")
-            
-            # Take screenshot for debugging
-            await page.screenshot(path="debug_screenshot.png")
-            print("[DEBUG] Screenshot saved to debug_screenshot.png")
-            
-            # Get page content for debugging
-            content = await page.content()
-            print(f"[DEBUG] Page length: {len(content)} chars")
-            
-            # Try to extract data from page
-            result = await scrape_page_content(page)
-            return result
-            
-        except Exception as e:
-            return {"error": f"Browser error: {str(e)}"}
+            return await _get_product_data(context, url)
         finally:
             await browser.close()
 
 
+async def _get_product_data(context, url: str) -> Dict[str, Any]:
+    page = await context.new_page()
+    
+    # Storage for captured API response
+    api_data = {}
+    captured = asyncio.Event()
+    
+    # Intercept API responses
+    async def handle_response(response):
+        url = response.url
+        if "quick-inquiry" in url or "recycle-products" in url:
+            try:
+                data = await response.json()
+                if data.get("code") == 0:
+                    api_data["response"] = data
+                    print(f"[DEBUG] Captured API response from: {url[:80]}...")
+                    if "quick-inquiry" in url:
+                        captured.set()
+            except Exception as e:
+                print(f"[DEBUG] Failed to parse response: {e}")
+    
+    page.on("response", handle_response)
+    
+    try:
+        print("[DEBUG] Navigating to page...")
+        
+        # Go to product page
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        
+        # Wait for the quick-inquiry response (not a fixed sleep)
+        print("[DEBUG] Waiting for API response...")
+        try:
+            await asyncio.wait_for(captured.wait(), timeout=RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        
+        # Check if we captured API data
+        if api_data.get("response"):
+            print("[DEBUG] Found API response!")
+            data = api_data["response"]
+            return parse_product_data(data.get("data", {}))
+        
+        # If no API data, try to scrape from page
+        print("[DEBUG] No API response, trying to scrape page...")
+        
+        # Take screenshot for debugging
+        await page.screenshot(path="debug_screenshot.png")
+        print("[DEBUG] Screenshot saved to debug_screenshot.png")
+        
+        # Try to extract data from page
+        result = await scrape_page_content(page)
+        return result
+        
+    except Exception as e:
+        return {"error": f"Browser error: {str(e)}"}
+    finally:
+        await page.close()
+
+
 async def scrape_page_content(page) -> Dict[str, Any]:
     """Scrape product info directly from page DOM"""
     try:
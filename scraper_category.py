@@ -17,10 +17,14 @@ import asyncio
 import pandas as pd
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+from config import SITE_DOMAIN, is_api_url
+from rate_limiter import limit_context
 
 # Fix Windows console encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 async def get_category_products(url: str) -> Dict[str, Any]:
@@ -34,6 +38,7 @@ async def get_category_products(url: str) -> Dict[str, Any]:
             viewport={"width": 375, "height": 812},
             locale="zh-CN"
         )
+        await limit_context(context)
         
         page = await context.new_page()
         
@@ -48,7 +53,7 @@ async def get_category_products(url: str) -> Dict[str, Any]:
         async def handle_response(response):
             url = response.url
             try:
-                if "dubai.aihuishou.com" in url:
+                if is_api_url(url):
                     data = await response.json()
                     if data.get("code") == 0:
                         response_data = data.get("data")
@@ -80,7 +85,7 @@ async def get_category_products(url: str) -> Dict[str, Any]:
             await context.add_cookies([{
                 "name": "chosenCity",
                 "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-                "domain": "m.aihuishou.com",
+                "domain": SITE_DOMAIN,
                 "path": "/"
             }])
             
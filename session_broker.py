@@ -0,0 +1,167 @@
+"""
+AIHUISHOU SESSION BROKER
+Bootstrap a real browser session once per city, then hand its cookies and
+request headers (including any signing tokens the SPA adds) to HTTP clients.
+
+- Sessions are cached per city and refreshed after config.SESSION_TTL
+- A challenge response (403/429/captcha page) invalidates the session; the
+  next call bootstraps a new one (ApiClient does this and retries once)
+
+Usage:
+    broker = get_broker()
+    session = await broker.get(city_id=1)      # BrokerSession(cookies, headers)
+    client = ApiClient(city_id=1, broker=broker)
+"""
+
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from config import (DEFAULT_CITY_ID, SESSION_TTL, SESSION_CHALLENGE_STATUS, SITE_URL, SITE_DOMAIN,
+                    get_cookies, is_api_url)
+from rate_limiter import limit_context
+
+# Request headers the browser sets itself - not worth copying to HTTP clients
+SKIP_HEADERS = {"host", "content-length", "content-type", "cookie", "connection", "accept-encoding", "origin",
+                "referer"}
+
+CHALLENGE_MARKERS = ("captcha", "验证码", "滑块", "访问过于频繁")
+
+
+@dataclass
+class BrokerSession:
+    city_id: int
+    cookies: Dict[str, str] = field(default_factory=dict)
+    headers: Dict[str, str] = field(default_factory=dict)
+    created: float = field(default_factory=time.time)
+    ttl: float = SESSION_TTL
+
+    @property
+    def expired(self) -> bool:
+        return time.time() - self.created > self.ttl
+
+
+def is_challenge(status: int, body: str = "") -> bool:
+    """Response looks like throttling / a bot challenge rather than a normal error"""
+    if status in SESSION_CHALLENGE_STATUS:
+        return True
+    head = (body or "")[:2000].lower()
+    return head.lstrip().startswith("<") and any(m in head for m in CHALLENGE_MARKERS)
+
+
+class SessionBroker:
+    """Per-city browser-harvested sessions, shared by every HTTP client in the process"""
+
+    BOOTSTRAP_URL = f"{SITE_URL}/n/#/"
+    BOOTSTRAP_WAIT = 3.0
+
+    def __init__(self, ttl: float = SESSION_TTL, headless: bool = True):
+        self.ttl = ttl
+        self.headless = headless
+        self.sessions: Dict[int, BrokerSession] = {}
+        self.stats = {"bootstraps": 0, "refreshes": 0, "challenges": 0}
+        self._locks = {}  # (loop id, city_id) -> asyncio.Lock
+        self._lock = threading.Lock()
+
+    def _city_lock(self, city_id: int) -> asyncio.Lock:
+        key = (id(asyncio.get_running_loop()), city_id)
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = asyncio.Lock()
+            return self._locks[key]
+
+    async def get(self, city_id: int = DEFAULT_CITY_ID) -> BrokerSession:
+        """Cached session for the city, bootstrapping a browser if missing or expired"""
+        session = self.sessions.get(city_id)
+        if session and not session.expired:
+            return session
+
+        async with self._city_lock(city_id):
+            session = self.sessions.get(city_id)
+            if session and not session.expired:
+                return session
+            if session:
+                self.stats["refreshes"] += 1
+            session = await self._bootstrap(city_id)
+            self.sessions[city_id] = session
+            return session
+
+    def get_sync(self, city_id: int = DEFAULT_CITY_ID) -> BrokerSession:
+        """get() for synchronous callers (runs the bootstrap on a helper thread)"""
+        session = self.sessions.get(city_id)
+        if session and not session.expired:
+            return session
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.get(city_id)).result()
+
+    def invalidate(self, city_id: int, session: Optional[BrokerSession] = None):
+        """
+        Drop the city's session after a challenge - the next get() bootstraps again.
+        Pass the session that was challenged so concurrent callers only drop it once.
+        """
+        current = self.sessions.get(city_id)
+        if current is None or (session is not None and current is not session):
+            return
+        self.stats["challenges"] += 1
+        self.sessions.pop(city_id, None)
+
+    async def _bootstrap(self, city_id: int) -> BrokerSession:
+        from playwright.async_api import async_playwright
+
+        print(f"[BROKER] Bootstrapping browser session for city {city_id}...")
+        self.stats["bootstraps"] += 1
+        headers = {}
+
+        async def capture_request(request):
+            if not is_api_url(request.url):
+                return
+            try:
+                for name, value in (await request.all_headers()).items():
+                    if name.lower() not in SKIP_HEADERS and not name.startswith(":") and not name.startswith("sec-"):
+                        headers[name] = value
+            except Exception:
+                pass
+
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.headless)
+            context = await browser.new_context(
+                user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+                viewport={"width": 375, "height": 812},
+                locale="zh-CN"
+            )
+            await limit_context(context)
+            await context.add_cookies([{
+                "name": "chosenCity",
+                "value": get_cookies(city_id)["chosenCity"],
+                "domain": SITE_DOMAIN,
+                "path": "/"
+            }])
+
+            page = await context.new_page()
+            page.on("request", lambda r: asyncio.create_task(capture_request(r)))
+            await page.goto(self.BOOTSTRAP_URL, timeout=30000, wait_until="domcontentloaded")
+            await asyncio.sleep(self.BOOTSTRAP_WAIT)
+
+            cookies = {c["name"]: c["value"] for c in await context.cookies()}
+            await browser.close()
+
+        cookies.update(get_cookies(city_id))
+        headers["x-city-id"] = str(city_id)
+        print(f"[BROKER] City {city_id}: {len(cookies)} cookies, {len(headers)} headers")
+        return BrokerSession(city_id=city_id, cookies=cookies, headers=headers, ttl=self.ttl)
+
+
+_broker: Optional[SessionBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> SessionBroker:
+    """Process-wide broker"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = SessionBroker()
+        return _broker
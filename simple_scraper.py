@@ -16,10 +16,14 @@ import asyncio
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional
+from config import SITE_URL, SITE_DOMAIN, is_api_url
+from rate_limiter import limit_context
 
 # Fix encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 class SimpleScraper:
@@ -49,12 +53,13 @@ class SimpleScraper:
                 viewport={"width": 375, "height": 812},
                 locale="zh-CN"
             )
+            await limit_context(context)
             
             # Set city cookie
             await context.add_cookies([{
                 "name": "chosenCity",
                 "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-                "domain": "m.aihuishou.com",
+                "domain": SITE_DOMAIN,
                 "path": "/"
             }])
             
@@ -65,7 +70,7 @@ class SimpleScraper:
             
             try:
                 # Go to category page
-                url = f"https://m.aihuishou.com/n/#/category?frontCategoryId={category_id}"
+                url = f"{SITE_URL}/n/#/category?frontCategoryId={category_id}"
                 print(f"\n[1] Loading {url}")
                 await page.goto(url, timeout=60000, wait_until="domcontentloaded")
                 await asyncio.sleep(5)
@@ -117,7 +122,7 @@ class SimpleScraper:
     
     async def _capture(self, response):
         """Capture API responses"""
-        if "dubai.aihuishou.com" not in response.url:
+        if not is_api_url(response.url):
             return
         
         try:
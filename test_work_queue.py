@@ -0,0 +1,82 @@
+"""
+SQLiteWorkQueue tests: lease, lease expiry, complete and fail
+
+Usage:
+    python -m pytest test_work_queue.py
+    python -m unittest test_work_queue
+"""
+
+import os
+import time
+import tempfile
+import unittest
+
+from work_queue import SQLiteWorkQueue, WorkQueue
+
+BRAND = {"id": 1, "name": "Apple"}
+
+
+class SQLiteWorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.queue = SQLiteWorkQueue(self.path, max_attempts=2)
+        self.queue.create_run("run", "https://m.aihuishou.com/n/#/category?frontCategoryId=1", 1)
+        self.queue.publish("run", [{"brand": BRAND}])
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_interface_is_abstract(self):
+        with self.assertRaises(TypeError):
+            WorkQueue()
+
+    def test_publish_is_idempotent(self):
+        self.assertEqual(self.queue.publish("run", [{"brand": BRAND}]), 0)
+        self.assertEqual(self.queue.progress("run")["total"], 1)
+
+    def test_lease_then_complete(self):
+        unit = self.queue.lease("w1", "run")
+        self.assertEqual((unit["brand"], unit["attempt"]), (BRAND, 1))
+        self.assertIsNone(self.queue.lease("w2", "run"))  # held by w1
+
+        self.assertTrue(self.queue.complete(unit["id"], "w1", [{"productId": 7, "productName": "iPhone"}]))
+        progress = self.queue.progress("run")
+        self.assertEqual((progress["done"], progress["products"]), (1, 1))
+        self.assertTrue(self.queue.is_drained("run"))
+        self.assertEqual(self.queue.results("run"), [{"productId": 7, "productName": "iPhone"}])
+
+    def test_expired_lease_is_released(self):
+        unit = self.queue.lease("w1", "run", lease_seconds=0.01)
+        time.sleep(0.05)
+        self.assertEqual(self.queue.progress("run")["pending"], 1)
+
+        retry = self.queue.lease("w2", "run")
+        self.assertEqual((retry["id"], retry["attempt"]), (unit["id"], 2))
+        self.assertFalse(self.queue.heartbeat(unit["id"], "w1"))
+        self.assertFalse(self.queue.complete(unit["id"], "w1", []))  # w1 lost the lease
+        self.assertTrue(self.queue.complete(retry["id"], "w2", []))
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        for _ in range(2):
+            self.queue.lease("w1", "run", lease_seconds=0.01)
+            time.sleep(0.05)
+        self.assertIsNone(self.queue.lease("w2", "run"))
+        self.assertEqual(self.queue.failures("run")[0]["error"], "lease expired")
+
+    def test_fail_retries_then_gives_up(self):
+        unit = self.queue.lease("w1", "run")
+        self.queue.fail(unit["id"], "w1", "boom")
+        self.assertEqual(self.queue.progress("run")["pending"], 1)
+
+        unit = self.queue.lease("w1", "run")
+        self.queue.fail(unit["id"], "w1", "boom again")
+        progress = self.queue.progress("run")
+        self.assertEqual((progress["pending"], progress["failed"]), (0, 1))
+        self.assertEqual(self.queue.failures("run"), [{"unit": {"brand": BRAND}, "attempts": 2, "error": "boom again"}])
+        self.assertTrue(self.queue.is_drained("run"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,10 +13,14 @@ import json
 import asyncio
 from datetime import datetime
 from typing import Dict, List, Any
+from config import SITE_DOMAIN, is_api_url
+from rate_limiter import limit_context
 
 # Fix encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if sys.stdout.encoding.lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+if sys.stderr.encoding.lower() != 'utf-8':
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 
 class UrlScraper:
@@ -42,11 +46,12 @@ class UrlScraper:
                 viewport={"width": 375, "height": 812},
                 locale="zh-CN"
             )
+            await limit_context(context)
             
             await context.add_cookies([{
                 "name": "chosenCity",
                 "value": "%7B%22id%22%3A1%2C%22name%22%3A%22%E4%B8%8A%E6%B5%B7%E5%B8%82%22%7D",
-                "domain": "m.aihuishou.com",
+                "domain": SITE_DOMAIN,
                 "path": "/"
             }])
             
@@ -75,7 +80,7 @@ class UrlScraper:
     
     async def _capture(self, response):
         """Capture all API responses from dubai.aihuishou.com"""
-        if "dubai.aihuishou.com" not in response.url:
+        if not is_api_url(response.url):
             return
         
         try:
@@ -4,14 +4,13 @@ Simple Flask web interface for the scraper
 """
 
 from flask import Flask, render_template, request, jsonify
-import asyncio
 import sys
 import os
 
 # Add the current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from scraper_browser import get_product_data
+from lookup_service import get_lookup_service
 
 app = Flask(__name__)
 
@@ -446,16 +445,18 @@ def scrape():
     if not url:
         return jsonify({"error": "URL is required"})
     
-    # Run async function
+    # HTTP first, warm browser only as fallback
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(get_product_data(url))
-        loop.close()
+        result = get_lookup_service().lookup_sync(url)
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@app.route('/api/lookup-stats', methods=['GET'])
+def lookup_stats():
+    """Which tier served the lookups, and how fast"""
+    return jsonify(get_lookup_service().summary())
+
 if __name__ == '__main__':
     print("=" * 50)
     print("  AIHUISHOU SCRAPER WEB UI")
@@ -0,0 +1,481 @@
+"""
+AIHUISHOU DISTRIBUTED WORK QUEUE
+Share one deep scrape between many worker processes / machines
+
+- Coordinator publishes DeepScraper work units (brand, or brand+collection)
+- Workers lease units, heartbeat while scraping, and write products to a common store
+- Units whose lease expires (worker died) go back to the queue, up to WORK_MAX_ATTEMPTS
+- Backend is pluggable (WorkQueue); SQLiteWorkQueue works on a shared volume
+
+Usage:
+    python work_queue.py publish <category_url> [--collections] [--city=1] [--run=ID]
+    python work_queue.py worker [--run=ID] [--concurrency=3] [--show]
+    python work_queue.py status [--run=ID]
+    python work_queue.py merge [--run=ID]
+
+    All commands accept --db=path (default: config.WORK_QUEUE_DB / AIHUISHOU_QUEUE_DB)
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import DEFAULT_CITY_ID, WORK_QUEUE_DB, WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS
+from events import EventBus, EventType
+
+
+class WorkQueue(ABC):
+    """Queue backend interface"""
+
+    @abstractmethod
+    def create_run(self, run_id: str, category_url: str, city_id: int):
+        ...
+
+    @abstractmethod
+    def get_run(self, run_id: Optional[str] = None) -> Optional[Dict]:
+        """Run metadata; latest run when run_id is None"""
+
+    @abstractmethod
+    def publish(self, run_id: str, units: List[Dict]) -> int:
+        """Add units, return how many were new"""
+
+    @abstractmethod
+    def lease(self, worker_id: str, run_id: Optional[str] = None,
+              lease_seconds: float = WORK_LEASE_SECONDS) -> Optional[Dict]:
+        """Take the next pending (or expired) unit, or None"""
+
+    @abstractmethod
+    def heartbeat(self, unit_id: int, worker_id: str, lease_seconds: float = WORK_LEASE_SECONDS) -> bool:
+        """Extend a lease; False if the worker no longer owns it"""
+
+    @abstractmethod
+    def complete(self, unit_id: int, worker_id: str, products: List[Dict]) -> bool:
+        """Store the unit's products and mark it done; False if the lease was lost"""
+
+    @abstractmethod
+    def fail(self, unit_id: int, worker_id: str, error: str):
+        """Give the unit back (retried until max_attempts, then failed)"""
+
+    @abstractmethod
+    def progress(self, run_id: str) -> Dict:
+        ...
+
+    @abstractmethod
+    def results(self, run_id: str) -> List[Dict]:
+        ...
+
+    def is_drained(self, run_id: Optional[str] = None) -> bool:
+        """No unit left to lease or waiting on a live lease"""
+        progress = self.progress(run_id)
+        return progress["pending"] == 0 and progress["leased"] == 0
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue in one SQLite file (file locking makes it safe across processes)"""
+
+    def __init__(self, path: str = WORK_QUEUE_DB, max_attempts: int = WORK_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    category_url TEXT,
+                    city_id INTEGER,
+                    created REAL
+                );
+                CREATE TABLE IF NOT EXISTS units (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT,
+                    unit_key TEXT,
+                    payload TEXT,
+                    status TEXT DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER DEFAULT 0,
+                    error TEXT,
+                    updated REAL,
+                    UNIQUE (run_id, unit_key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_units_status ON units (run_id, status);
+                CREATE TABLE IF NOT EXISTS products (
+                    run_id TEXT,
+                    product_id INTEGER,
+                    city_id INTEGER,
+                    unit_id INTEGER,
+                    data TEXT,
+                    PRIMARY KEY (run_id, product_id, city_id)
+                );
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_run(self, run_id: str, category_url: str, city_id: int):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, category_url, city_id, created) VALUES (?, ?, ?, ?)",
+                (run_id, category_url, city_id, time.time())
+            )
+
+    def get_run(self, run_id: Optional[str] = None) -> Optional[Dict]:
+        with self._connect() as conn:
+            if run_id:
+                row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            else:
+                row = conn.execute("SELECT * FROM runs ORDER BY created DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def publish(self, run_id: str, units: List[Dict]) -> int:
+        now = time.time()
+        added = 0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for unit in units:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO units (run_id, unit_key, payload, updated) VALUES (?, ?, ?, ?)",
+                    (run_id, unit_key(unit), json.dumps(unit, ensure_ascii=False), now)
+                )
+                added += cursor.rowcount
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return added
+
+    def lease(self, worker_id: str, run_id: Optional[str] = None,
+              lease_seconds: float = WORK_LEASE_SECONDS) -> Optional[Dict]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            # Expired leases that used up their attempts are failed for good
+            conn.execute(
+                "UPDATE units SET status = 'failed', error = 'lease expired', updated = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+
+            query = ("SELECT * FROM units WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                     "AND attempts < ?")
+            args = [now, self.max_attempts]
+            if run_id:
+                query += " AND run_id = ?"
+                args.append(run_id)
+            row = conn.execute(query + " ORDER BY attempts, id LIMIT 1", args).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE units SET status = 'leased', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        unit = json.loads(row["payload"])
+        unit["id"] = row["id"]
+        unit["run_id"] = row["run_id"]
+        unit["attempt"] = row["attempts"] + 1
+        return unit
+
+    def heartbeat(self, unit_id: int, worker_id: str, lease_seconds: float = WORK_LEASE_SECONDS) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE units SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + lease_seconds, now, unit_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, unit_id: int, worker_id: str, products: List[Dict]) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT run_id FROM units WHERE id = ?", (unit_id,)).fetchone()
+            run = conn.execute("SELECT city_id FROM runs WHERE run_id = ?", (row["run_id"],)).fetchone()
+
+            # Products are stored even if the lease was lost - the primary key deduplicates
+            conn.executemany(
+                "INSERT OR REPLACE INTO products (run_id, product_id, city_id, unit_id, data) VALUES (?, ?, ?, ?, ?)",
+                [(row["run_id"], p.get("productId"), p.get("cityId", run["city_id"]), unit_id,
+                  json.dumps(p, ensure_ascii=False)) for p in products]
+            )
+            cursor = conn.execute(
+                "UPDATE units SET status = 'done', lease_expires = NULL, error = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time(), unit_id, worker_id)
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return cursor.rowcount == 1
+
+    def fail(self, unit_id: int, worker_id: str, error: str):
+        """Give the unit back (retried until max_attempts, then failed)"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_expires = NULL, error = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error[:500], time.time(), unit_id, worker_id)
+            )
+
+    def progress(self, run_id: Optional[str] = None) -> Dict:
+        run = self.get_run(run_id)
+        if run is None:
+            return {"run_id": None, "total": 0, "pending": 0, "leased": 0, "done": 0, "failed": 0,
+                    "products": 0, "workers": []}
+
+        run_id = run["run_id"]
+        now = time.time()
+        with self._connect() as conn:
+            counts = {r["status"]: r["n"] for r in conn.execute(
+                "SELECT status, COUNT(*) AS n FROM units WHERE run_id = ? GROUP BY status", (run_id,))}
+            expired = conn.execute(
+                "SELECT COUNT(*) FROM units WHERE run_id = ? AND status = 'leased' AND lease_expires < ?",
+                (run_id, now)).fetchone()[0]
+            workers = [r["worker"] for r in conn.execute(
+                "SELECT DISTINCT worker FROM units WHERE run_id = ? AND status = 'leased' AND lease_expires >= ?",
+                (run_id, now))]
+            products = conn.execute("SELECT COUNT(*) FROM products WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+        return {
+            "run_id": run_id,
+            "category_url": run["category_url"],
+            "total": sum(counts.values()),
+            "pending": counts.get("pending", 0) + expired,
+            "leased": counts.get("leased", 0) - expired,
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "products": products,
+            "workers": workers,
+        }
+
+    def results(self, run_id: Optional[str] = None) -> List[Dict]:
+        run = self.get_run(run_id)
+        if run is None:
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM products WHERE run_id = ? ORDER BY unit_id, rowid", (run["run_id"],)
+            ).fetchall()
+        return [json.loads(r["data"]) for r in rows]
+
+    def failures(self, run_id: Optional[str] = None) -> List[Dict]:
+        run = self.get_run(run_id)
+        if run is None:
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload, attempts, error FROM units WHERE run_id = ? AND status = 'failed'",
+                (run["run_id"],)
+            ).fetchall()
+        return [{"unit": json.loads(r["payload"]), "attempts": r["attempts"], "error": r["error"]} for r in rows]
+
+
+def open_queue(location: Optional[str] = None) -> WorkQueue:
+    """Queue backend from a location string (sqlite:///path or a plain file path)"""
+    location = location or WORK_QUEUE_DB
+    if location.startswith("sqlite:///"):
+        location = location[len("sqlite:///"):]
+    elif "://" in location:
+        raise ValueError(f"Unsupported work queue backend: {location}")
+    return SQLiteWorkQueue(location)
+
+
+def unit_key(unit: Dict) -> str:
+    key = str(unit["brand"].get("id"))
+    if unit.get("collection"):
+        key += f":{unit['collection'].get('collectionId')}"
+    return key
+
+
+def unit_label(unit: Dict) -> str:
+    label = unit["brand"].get("name", "Unknown")
+    if unit.get("collection"):
+        label += f" / {unit['collection'].get('title', '')}"
+    return label
+
+
+# ============ COORDINATOR ============
+async def publish_run(queue: WorkQueue, category_url: str, city_id: int = DEFAULT_CITY_ID,
+                      run_id: Optional[str] = None, collections: bool = False, headless: bool = True) -> str:
+    """Discover the category hierarchy and publish its units"""
+    from deep_scraper import DeepScraper, log
+
+    run_id = run_id or f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    await asyncio.to_thread(queue.create_run, run_id, category_url, city_id)
+
+    log("INFO", f"Discovering units for {run_id}...")
+    units = await DeepScraper(city_id).discover_units(category_url, collections=collections, headless=headless)
+    added = await asyncio.to_thread(queue.publish, run_id, units)
+    log("OK", f"Published {added} units ({len(units) - added} already queued)")
+    return run_id
+
+
+# ============ WORKER ============
+async def run_worker(queue: WorkQueue, run_id: Optional[str] = None, worker_id: Optional[str] = None,
+                     concurrency: int = 3, headless: bool = True, lease_seconds: float = WORK_LEASE_SECONDS,
+                     poll_interval: float = 5.0, events: Optional[EventBus] = None) -> Dict:
+    """
+    Lease and scrape units until the run is drained. Queue calls are blocking SQLite
+    transactions (busy timeout) - they run in asyncio.to_thread, so lock contention
+    between workers never freezes the loop and its heartbeats.
+    """
+    from playwright.async_api import async_playwright
+    from deep_scraper import DeepScraper, log
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    run_id = run_id or ((await asyncio.to_thread(queue.get_run)) or {}).get("run_id")
+    stats = {"units": 0, "products": 0, "errors": 0, "lost_leases": 0}
+    log("INFO", f"Worker {worker_id} starting (x{concurrency})")
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        contexts = {}  # city_id -> BrowserContext
+        contexts_lock = asyncio.Lock()
+
+        async def get_context(city_id: int):
+            async with contexts_lock:
+                if city_id not in contexts:
+                    contexts[city_id] = await DeepScraper(city_id).new_context(browser, city_id)
+                return contexts[city_id]
+
+        async def heartbeat(unit_id: int):
+            while True:
+                await asyncio.sleep(lease_seconds / 3)
+                if not await asyncio.to_thread(queue.heartbeat, unit_id, worker_id, lease_seconds):
+                    stats["lost_leases"] += 1
+                    return
+
+        async def process(unit: Dict):
+            run = await asyncio.to_thread(queue.get_run, unit["run_id"])
+            scraper = DeepScraper(run["city_id"], events=events)
+            context = await get_context(run["city_id"])
+            log("INFO", f"[{worker_id}] {unit_label(unit)} (attempt {unit['attempt']})")
+            if unit["attempt"] > 1:
+                scraper.events.emit(EventType.RETRY, counts=stats, unit=unit_label(unit), attempt=unit["attempt"])
+
+            beat = asyncio.create_task(heartbeat(unit["id"]))
+            try:
+                products = await scraper.scrape_unit(context, unit, run["category_url"])
+            except Exception as e:
+                stats["errors"] += 1
+                await asyncio.to_thread(queue.fail, unit["id"], worker_id, str(e))
+                log("ERR", f"{unit_label(unit)}: {str(e)[:60]}", 1)
+                return
+            finally:
+                beat.cancel()
+
+            # DeepScraper logs page errors and carries on - a unit that only errored goes back for a retry
+            if not products and scraper.stats["errors"]:
+                stats["errors"] += 1
+                await asyncio.to_thread(queue.fail, unit["id"], worker_id,
+                                        f"{scraper.stats['errors']} page error(s), no products")
+                log("ERR", f"{unit_label(unit)}: {scraper.stats['errors']} page error(s), no products", 1)
+                return
+
+            await asyncio.to_thread(queue.complete, unit["id"], worker_id, products)
+            stats["units"] += 1
+            stats["products"] += len(products)
+            log("OK", f"{unit_label(unit)}: +{len(products)} products", 1)
+
+        async def slot():
+            while True:
+                unit = await asyncio.to_thread(queue.lease, worker_id, run_id, lease_seconds)
+                if unit is None:
+                    if await asyncio.to_thread(queue.is_drained, run_id):
+                        return
+                    # Other workers still hold leases - wait in case one expires
+                    await asyncio.sleep(poll_interval)
+                    continue
+                await process(unit)
+
+        await asyncio.gather(*[slot() for _ in range(concurrency)])
+        await browser.close()
+
+    log("OK", f"Worker {worker_id} done: {stats}")
+    return stats
+
+
+# ============ MAIN ============
+def print_progress(progress: Dict):
+    print("=" * 60)
+    print(f"  Run:      {progress['run_id']}")
+    print(f"  Category: {progress.get('category_url', '')[:80]}")
+    print("=" * 60)
+    total = progress["total"] or 1
+    print(f"  Units:    {progress['done']}/{progress['total']} done ({progress['done'] * 100 // total}%)")
+    print(f"  Pending:  {progress['pending']}")
+    print(f"  Leased:   {progress['leased']}")
+    print(f"  Failed:   {progress['failed']}")
+    print(f"  Products: {progress['products']}")
+    print(f"  Workers:  {', '.join(progress['workers']) or '-'}")
+    print("=" * 60)
+
+
+def _arg(name: str, default=None):
+    """Value of a --name=value command line option"""
+    for arg in sys.argv:
+        if arg.startswith(f"--{name}="):
+            return arg.split("=", 1)[1]
+    return default
+
+
+async def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("publish", "worker", "status", "merge"):
+        print(__doc__)
+        return
+
+    command = sys.argv[1]
+    queue = open_queue(_arg("db"))
+    run_id = _arg("run")
+    headless = "--show" not in sys.argv
+
+    if command == "publish":
+        args = [a for a in sys.argv[2:] if not a.startswith("--")]
+        if not args:
+            print("Usage: python work_queue.py publish <category_url> [--collections]")
+            return
+        run_id = await publish_run(queue, args[0], int(_arg("city", DEFAULT_CITY_ID)), run_id,
+                                   collections="--collections" in sys.argv, headless=headless)
+        print_progress(queue.progress(run_id))
+
+    elif command == "worker":
+        await run_worker(queue, run_id, _arg("worker"), int(_arg("concurrency", 3)), headless=headless)
+
+    elif command == "status":
+        print_progress(queue.progress(run_id))
+        for failure in queue.failures(run_id):
+            print(f"  [x] {unit_label(failure['unit'])} ({failure['attempts']} attempts): {failure['error']}")
+
+    elif command == "merge":
+        from deep_scraper import export_csv, export_json
+
+        progress = queue.progress(run_id)
+        print_progress(progress)
+        if progress["pending"] or progress["leased"]:
+            print("[WARN] Run not finished - merging partial results")
+        products = queue.results(run_id)
+        if products:
+            export_csv(products, f"{progress['run_id']}.csv")
+            export_json(products, f"{progress['run_id']}.json")
+        print(f"[DONE] {len(products)} products merged")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())